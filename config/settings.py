@@ -43,10 +43,16 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     # WhiteNoise برای سرویس فایل‌های استاتیک در پروداکشن (بسیار مهم)
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # متریک‌های Prometheus هر درخواست (بعد از WhiteNoise تا فایل‌های استاتیک شمرده نشوند)
+    "myblog.metrics.metrics_middleware",
+    # خواندن‌های درخواست‌های نوشتن و چند ثانیه پس از آن از پایگاه داده اصلی (قبل از نشست)
+    "myblog.middleware.replica_pinning_middleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # پروفایل درخواست‌های staff با ?_profile یا هدر X-Profile (بعد از احراز هویت)
+    "myblog.profiling.profiling_middleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -56,7 +62,8 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # همان موتور قالب جنگو به همراه ثبت زمان رندر در متریک‌ها
+        "BACKEND": "myblog.metrics.InstrumentedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],  # پوشه قالب‌های سراسری
         "APP_DIRS": True,
         "OPTIONS": {
@@ -91,6 +98,41 @@ else:
     # فقط برای حالت SQLite، پوشه مربوطه را در صورت عدم وجود بساز
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
+# رپلیکاهای فقط‌خواندنی (اختیاری)؛ چند آدرس با کاما از هم جدا می‌شوند
+# خواندن‌ها به رپلیکا و نوشتن‌ها به default می‌روند (myblog/routers.py)
+REPLICA_DATABASES = []
+for index, replica_url in enumerate(filter(None, os.getenv("REPLICA_DATABASE_URL", "").split(","))):
+    import dj_database_url
+    alias = "replica" if index == 0 else f"replica_{index}"
+    DATABASES[alias] = dj_database_url.parse(replica_url.strip(), conn_max_age=600)
+    # در تست‌ها رپلیکا همان پایگاه داده تست default است
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    REPLICA_DATABASES.append(alias)
+DATABASE_ROUTERS = ["myblog.routers.PrimaryReplicaRouter"]
+# مدت زمانی (ثانیه) که پس از هر نوشتن، خواندن‌های همان کاربر از پایگاه داده اصلی انجام می‌شود
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+# -----------------------------
+# کش
+# -----------------------------
+# با چند worker گانیکورن کش باید مشترک باشد (Redis)؛ در توسعه محلی کش حافظه کافی است
+# backendها همان کلاس‌های جنگو هستند که زمان هر فراخوانی را برای Server-Timing ثبت می‌کنند
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "myblog.metrics.InstrumentedRedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "myblog.metrics.InstrumentedLocMemCache",
+            "LOCATION": "myblog",
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -112,14 +154,94 @@ STATICFILES_DIRS = [BASE_DIR / "static"]  # پوشه استاتیک پروژه
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = "/tmp/media"  # در Liara فایل‌های آپلود شده در این مسیر ذخیره می شوند
+# تعداد thread های ساخت نسخه‌های تصویر پست‌ها (0 یعنی ساخت همزمان پس از commit)
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+
+# صفحات ثابت پیش‌رندر شده توسط دستور prerender_pages
+PRERENDER_ROOT = "/tmp/prerendered"
+
+# تنظیمات WhiteNoise برای بهینه‌سازی فایل‌های استاتیک در پروداکشن. نام‌های hash دار
+# manifest.json در فهرست precache فایل sw.js هم استفاده می‌شوند (myblog/pwa.py).
+# در حالت توسعه (و تست‌ها) collectstatic اجرا نشده و انبار ساده جنگو استفاده می‌شود.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "whitenoise.storage.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+
+# -----------------------------
+# جستجوی متن کامل پست‌ها
+# -----------------------------
+# خالی یعنی انتخاب خودکار: FTS5 برای SQLite و tsvector برای PostgreSQL
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "")
+# حداکثر تعداد نتایج رتبه‌بندی شده‌ای که برای صفحه‌بندی جستجو خوانده می‌شود
+SEARCH_RESULTS_LIMIT = 500
+
+# GET شرطی صفحات پست‌ها: با تغییر قالب‌ها در استقرار جدید این مقدار را عوض کنید
+PAGE_CACHE_VERSION = os.getenv("PAGE_CACHE_VERSION", "1")
+# مدت کش نسخه ناشناس صفحات در پراکسی (ثانیه)
+PAGE_CACHE_S_MAXAGE = 60
+# کش کامل صفحات کاربران ناشناس (myblog/pagecache.py): عمر هر نسخه به ثانیه؛ صفر یعنی غیرفعال
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", "600"))
+# مدتی پس از انقضا که نسخه کهنه به درخواست‌های همزمان با بازسازی داده می‌شود (ثانیه)
+PAGE_CACHE_STALE_SECONDS = 60
+# تعداد پست‌های اخیری که Service Worker برای خواندن آفلاین نگه می‌دارد
+OFFLINE_FEED_SIZE = int(os.getenv("OFFLINE_FEED_SIZE", "20"))
+
+# حداکثر تعداد عملیات در هر درخواست دسته‌ای لایک/واکنش
+REACTION_BATCH_LIMIT = 50
+# شمارنده‌های لایک و واکنش در کش جمع و با دستور flush_counters دسته‌ای نوشته می‌شوند
+# (myblog/counters.py)؛ به کش مشترک Redis بین workerها و اجرای دائمی پردازه counters در
+# Procfile (flush_counters --interval) نیاز دارد، وگرنه تغییرها هیچ‌گاه در پایگاه داده
+# نوشته نمی‌شوند. بدون این تنظیم پردازه counters با خطا خارج می‌شود و باید خاموش بماند.
+COUNTER_WRITE_BEHIND = os.getenv("COUNTER_WRITE_BEHIND", "0") == "1"
 
-# تنظیمات WhiteNoise برای بهینه‌سازی فایل‌های استاتیک در پروداکشن
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# انتقال رویدادهای شمارنده زنده (SSE) بین workerها؛ بدون Redis فقط همان پردازه
+REALTIME_BACKEND = os.getenv(
+    "REALTIME_BACKEND",
+    "myblog.realtime.RedisBackend" if REDIS_URL else "myblog.realtime.LocalBackend",
+)
+# عمر هر stream (ثانیه)؛ مرورگر دوباره وصل می‌شود و snapshot شمارنده‌ها را می‌گیرد
+REALTIME_STREAM_SECONDS = int(os.getenv("REALTIME_STREAM_SECONDS", "300"))
+
+# از این تعداد ردیف به بعد فهرست‌های ادمین به جای COUNT(*) از تخمین استفاده می‌کنند
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100_000
+
+# توکن دسترسی Prometheus به /metrics (هدر Authorization: Bearer)؛ بدون آن فقط در DEBUG باز است
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# سربرگ Server-Timing در همه پاسخ‌ها و لاگ درخواست‌های کند (اختیاری، با SERVER_TIMING=1)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+if SERVER_TIMING:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("myblog.metrics.metrics_middleware") + 1,
+        "myblog.timing.server_timing_middleware",
+    )
+# درخواست‌های طولانی‌تر از این مقدار (میلی‌ثانیه) همراه کوئری‌هایشان لاگ می‌شوند
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "500"))
+# حداکثر تعداد کوئری ذخیره شده در هر ورودی لاگ درخواست کند
+SLOW_REQUEST_MAX_QUERIES = 100
+
+# محل ذخیره پروفایل درخواست‌ها و تعداد پروفایل‌های نگهداری شده
+PROFILE_ROOT = "/tmp/profiles"
+PROFILE_KEEP = 50
 
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "post_list"
 LOGOUT_REDIRECT_URL = "post_list"
 
+# نشست فقط برای کاربران وارد شده ساخته می‌شود و در هر درخواست از کش خوانده می‌شود؛
+# پایگاه داده فقط هنگام ورود، خروج و تغییر نشست نوشته می‌شود
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+# پیام‌ها فقط در کوکی ذخیره می‌شوند تا پیام کاربران ناشناس (ورود ناموفق، نظر بدون ورود)
+# هیچ‌گاه نشست و ردیف django_session نسازد
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
 # -----------------------------
 # تنظیمات امنیتی برای پروداکشن
 # -----------------------------
@@ -139,7 +261,11 @@ else:
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
-    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    # زمان، سطح، logger و شماره پردازه برای جدا کردن لاگ workerهای گانیکورن
+    "formatters": {
+        "verbose": {"format": "%(asctime)s %(levelname)s %(name)s [pid %(process)d] %(message)s"},
+    },
+    "handlers": {"console": {"class": "logging.StreamHandler", "formatter": "verbose"}},
     "root": {"handlers": ["console"], "level": "INFO"},
 }
 
@@ -5,20 +5,31 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.generic import TemplateView
 from django.views.generic.base import RedirectView
 
+from myblog.metrics import metrics_view
+from myblog.pwa import service_worker_view
+from myblog.profiling import profile_download_view, profile_summary_view, profiles_view
+
 urlpatterns = [
+    # پروفایل درخواست‌ها در ادمین (فقط staff)
+    path('admin/profiles/', admin.site.admin_view(profiles_view), name='request_profiles'),
+    path('admin/profiles/<str:name>/', admin.site.admin_view(profile_summary_view), name='request_profile_summary'),
+    path(
+        'admin/profiles/<str:name>/download/',
+        admin.site.admin_view(profile_download_view),
+        name='request_profile_download',
+    ),
     path('admin/', admin.site.urls),
     path('', include('myblog.urls')),
     path('account/', include('django.contrib.auth.urls')),
     path('account/', include('account.urls')),
     
+    # متریک‌های Prometheus (بدون اسلش پایانی، مسیر پیش‌فرض scrape)
+    path('metrics', metrics_view, name='metrics'),
+
     # Service Worker
-    path('sw.js', TemplateView.as_view(
-        template_name='sw.js',
-        content_type='application/javascript'
-    ), name='sw.js'),
+    path('sw.js', service_worker_view, name='sw.js'),
     
     # ریدایرکت برای لوگو
     path('logo.png', RedirectView.as_view(
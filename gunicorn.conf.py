@@ -0,0 +1,20 @@
+# تنظیمات گانیکورن؛ از پوشه جاری به صورت خودکار خوانده می‌شود
+import os
+import shutil
+
+# هر worker متریک‌های Prometheus خود را در این پوشه می‌نویسد و /metrics همه را جمع می‌کند.
+# متغیر پیش از fork شدن workerها تنظیم می‌شود تا prometheus_client در همه آن‌ها حالت
+# چند پردازه‌ای را انتخاب کند.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus")
+
+
+def on_starting(server):
+    # فایل‌های اجرای قبلی پاک می‌شوند تا شمارنده‌ها از صفر شروع شوند
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,12 +1,35 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+
 from .models import Post_blog, Comment, EmojiReaction
+from .pagination import EstimatedCountPaginator
+
+# تعداد کاربران در هر صفحه فهرست لایک‌کنندگان
+LIKERS_PAGE_SIZE = 50
+
+
+class ScalableAdminMixin:
+    """
+    تنظیمات مشترک ادمین جدول‌های بزرگ: شمارش تخمینی به جای COUNT(*) کل جدول و
+    حذف شمارش دوم «نمایش همه» هنگام جستجو و فیلتر.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
 
-class Post_admin(admin.ModelAdmin):
+
+class Post_admin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('title', 'author', 'status', 'datetime_modified', 'likes_count', 'get_comments_count')
-    list_filter = ('status', 'datetime_create', 'author')
+    # فیلتر author همه کاربران را به عنوان گزینه نمایش می‌داد؛ جستجو روی نام کاربری کافی است
+    list_filter = ('status', 'datetime_create')
     search_fields = ('title', 'text', 'author__username')
     date_hierarchy = 'datetime_create'
-    readonly_fields = ('datetime_create', 'datetime_modified', 'likes_count')
+    readonly_fields = ('datetime_create', 'datetime_modified', 'likes_count', 'likers', 'comments_count')
+    autocomplete_fields = ('author',)
     fieldsets = (
         ('اطلاعات اصلی', {
             'fields': ('title', 'text', 'author', 'status')
@@ -20,43 +43,102 @@ class Post_admin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('لایک‌ها', {
-            'fields': ('likes_count', 'liked_by'),
+            # به جای ویجت M2M که همه کاربران را بارگذاری می‌کرد، فهرست صفحه‌بندی شده لایک‌کنندگان
+            'fields': ('likes_count', 'likers', 'comments_count'),
             'classes': ('collapse',)
         }),
     )
-    filter_horizontal = ('liked_by',)
-    
+    list_select_related = ('author',)
+
     def get_comments_count(self, obj):
-        return obj.comments.count()
+        # شمارنده نگهداری شده؛ برای هر ردیف کوئری جداگانه‌ای اجرا نمی‌شود
+        return obj.comments_count
     get_comments_count.short_description = 'تعداد نظرات'
+    get_comments_count.admin_order_field = 'comments_count'
+
+    def likers(self, obj):
+        if obj.pk is None:
+            return '-'
+        url = reverse('admin:myblog_post_blog_likers', args=[obj.pk])
+        return format_html('<a href="{}">مشاهده {} کاربر</a>', url, obj.likes_count)
+    likers.short_description = 'لایک‌کنندگان'
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:object_id>/likers/',
+                self.admin_site.admin_view(self.likers_view),
+                name='myblog_post_blog_likers',
+            ),
+        ] + super().get_urls()
 
-class Comment_admin(admin.ModelAdmin):
+    def likers_view(self, request, object_id):
+        """فهرست فقط‌خواندنی لایک‌کنندگان پست با صفحه‌بندی cursor روی جدول واسط"""
+        post = get_object_or_404(Post_blog.objects.only('pk', 'title', 'likes_count'), pk=object_id)
+        if not self.has_view_permission(request, post):
+            raise PermissionDenied
+
+        likes = (
+            Post_blog.liked_by.through.objects.filter(post_blog_id=post.pk)
+            .select_related('user')
+            .only('id', 'user__id', 'user__username', 'user__email')
+            .order_by('-id')
+        )
+        try:
+            before = int(request.GET.get('before', 0))
+        except ValueError:
+            before = 0
+        if before:
+            likes = likes.filter(id__lt=before)
+        page = list(likes[:LIKERS_PAGE_SIZE + 1])
+        has_next = len(page) > LIKERS_PAGE_SIZE
+        page = page[:LIKERS_PAGE_SIZE]
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'original': post,
+            'title': f'لایک‌کنندگان «{post.title}»',
+            'likers': [like.user for like in page],
+            'next_before': page[-1].id if has_next else None,
+            'is_first_page': not before,
+        }
+        return TemplateResponse(request, 'admin/myblog/post_blog/likers.html', context)
+
+
+class Comment_admin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('author', 'post', 'short_text', 'datetime_create', 'is_active')
-    list_filter = ('is_active', 'datetime_create', 'post')
+    # فیلتر post همه پست‌ها را به عنوان گزینه نمایش می‌داد
+    list_filter = ('is_active', 'datetime_create')
     search_fields = ('text', 'author__username', 'post__title')
     list_editable = ('is_active',)
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('post', 'author')
     actions = ['activate_comments', 'deactivate_comments']
-    
+
     def short_text(self, obj):
         return obj.text[:50] + '...' if len(obj.text) > 50 else obj.text
     short_text.short_description = 'متن نظر'
-    
+
     def activate_comments(self, request, queryset):
-        queryset.update(is_active=True)
+        # set_active شمارنده نظرات پست‌ها را هم در همان تراکنش به‌روز می‌کند
+        queryset.set_active(True)
         self.message_user(request, 'نظرات انتخاب شده فعال شدند.')
     activate_comments.short_description = 'فعال کردن نظرات انتخاب شده'
-    
+
     def deactivate_comments(self, request, queryset):
-        queryset.update(is_active=False)
+        queryset.set_active(False)
         self.message_user(request, 'نظرات انتخاب شده غیرفعال شدند.')
     deactivate_comments.short_description = 'غیرفعال کردن نظرات انتخاب شده'
 
-class EmojiReaction_admin(admin.ModelAdmin):
+class EmojiReaction_admin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'post', 'get_emoji_display', 'datetime_create')
     list_filter = ('emoji_type', 'datetime_create')
     search_fields = ('user__username', 'post__title')
     readonly_fields = ('datetime_create',)
-    
+    list_select_related = ('user', 'post')
+    autocomplete_fields = ('user', 'post')
+
     def get_emoji_display(self, obj):
         return obj.get_emoji_type_display()
     get_emoji_display.short_description = 'ایموجی'
@@ -64,4 +146,4 @@ class EmojiReaction_admin(admin.ModelAdmin):
 # ثبت مدل‌ها در ادمین
 admin.site.register(Post_blog, Post_admin)
 admin.site.register(Comment, Comment_admin)
-admin.site.register(EmojiReaction, EmojiReaction_admin)
\ No newline at end of file
+admin.site.register(EmojiReaction, EmojiReaction_admin)
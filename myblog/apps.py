@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MyblogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myblog'
+
+    def ready(self):
+        from . import signals  # noqa: F401
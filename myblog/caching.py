@@ -0,0 +1,96 @@
+"""
+نسخه فعالیت پست‌ها برای کش قطعه‌ای قالب‌ها.
+
+نسخه هر پست از datetime_modified و یک «نسخه فعالیت» در کش ساخته می‌شود که با هر
+تغییر نظرات، واکنش‌ها و لایک‌ها (از طریق سیگنال‌ها) عوض می‌شود. چون نسخه جزء کلید
+کش است، با تغییر آن قطعه‌های قدیمی دیگر خوانده نمی‌شوند و نیازی به حذف صریح نیست.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+ACTIVITY_KEY = 'post-activity:{}'
+# نسخه مشترک همه پست‌ها برای صفحات فهرست؛ با هر تغییر در هر پستی عوض می‌شود
+LIST_ACTIVITY_KEY = 'post-list-activity'
+# نسخه ترکیب صفحات فهرست: ایجاد، حذف، ویرایش (ترتیب) و تغییر وضعیت پست‌ها؛ لایک و نظر آن را عوض نمی‌کنند
+LIST_STRUCTURE_KEY = 'post-list-structure'
+# نسخه فعالیت باید دست‌کم به اندازه عمر قطعه‌های کش شده باقی بماند
+ACTIVITY_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def _new_version():
+    # مقدار مبتنی بر زمان: اگر کلید از کش حذف شود نسخه جدید با هیچ نسخه قبلی یکی نمی‌شود
+    return time.time_ns()
+
+
+def _version_for(key):
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, ACTIVITY_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def activity_versions(post_ids):
+    """نسخه فعالیت چند پست با یک درخواست به کش"""
+    keys = {ACTIVITY_KEY.format(pk): pk for pk in post_ids}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    missing = {key: _new_version() for key, pk in keys.items() if pk not in versions}
+    if missing:
+        for key, version in missing.items():
+            # add به جای set تا نسخه‌ای که همزمان توسط worker دیگر ثبت شده بازنویسی نشود
+            if not cache.add(key, version, ACTIVITY_TIMEOUT):
+                version = cache.get(key, version)
+            versions[keys[key]] = version
+    return versions
+
+
+def list_version():
+    """نسخه فعالیت صفحات فهرست پست‌ها"""
+    return _version_for(LIST_ACTIVITY_KEY)
+
+
+def list_structure_version():
+    """نسخه ترکیب صفحات فهرست (کدام پست‌ها و به چه ترتیبی)"""
+    return _version_for(LIST_STRUCTURE_KEY)
+
+
+def bump_list_structure():
+    """تغییر ترکیب فهرست؛ نسخه فعالیت صفحات فهرست هم همراه آن عوض می‌شود"""
+    version = _new_version()
+    cache.set_many({LIST_STRUCTURE_KEY: version, LIST_ACTIVITY_KEY: version}, ACTIVITY_TIMEOUT)
+
+
+def version_datetime(version):
+    """زمان متناظر با یک نسخه فعالیت (نسخه‌ها بر حسب نانوثانیه هستند)"""
+    return datetime.fromtimestamp(version / 1_000_000_000, tz=timezone.utc)
+
+
+def bump_activity(post_id):
+    """تغییر نسخه فعالیت پست؛ قطعه‌های کش شده قبلی آن دیگر استفاده نمی‌شوند"""
+    version = _new_version()
+    cache.set_many(
+        {ACTIVITY_KEY.format(post_id): version, LIST_ACTIVITY_KEY: version},
+        ACTIVITY_TIMEOUT,
+    )
+
+
+def forget_activity(post_id):
+    cache.delete(ACTIVITY_KEY.format(post_id))
+    cache.set(LIST_ACTIVITY_KEY, _new_version(), ACTIVITY_TIMEOUT)
+
+
+def cache_version(post, activity):
+    return f'{int(post.datetime_modified.timestamp() * 1_000_000)}.{activity}'
+
+
+def attach_cache_versions(posts):
+    """محاسبه نسخه کش همه پست‌های یک صفحه با یک درخواست get_many"""
+    posts = list(posts)
+    versions = activity_versions([post.pk for post in posts])
+    for post in posts:
+        post._cache_version = cache_version(post, versions[post.pk])
+    return posts
@@ -0,0 +1,104 @@
+"""
+GET شرطی (ETag و Last-Modified) برای صفحه جزئیات و فهرست پست‌ها.
+
+اعتبارسنج‌ها فقط از datetime_modified پست و نسخه فعالیت در کش ساخته می‌شوند، بنابراین
+برای درخواستی که نسخه فعلی را دارد پاسخ 304 بدون اجرای کوئری نظرات و واکنش‌ها و بدون
+رندر قالب برگردانده می‌شود. نسخه کاربران ناشناس برای همه یکسان است و پراکسی می‌تواند
+آن را کش کند؛ نسخه کاربران وارد شده private است.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .caching import activity_versions, list_version, version_datetime
+from .models import Post_blog
+from .prerender import is_anonymous
+
+
+def _user_tag(request):
+    # کاربر بدون کوکی نشست بدون خواندن نشست ناشناس شناخته می‌شود
+    return 'anonymous' if is_anonymous(request) else f'user:{request.user.pk}'
+
+
+def _make_etag(*parts):
+    parts = (settings.PAGE_CACHE_VERSION, *parts)
+    return hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()[:32]
+
+
+def _post_validators(request, pk):
+    # condition هر دو تابع را جداگانه صدا می‌زند؛ نتیجه یک بار برای هر درخواست محاسبه می‌شود
+    if not hasattr(request, '_post_validators'):
+        modified = Post_blog.objects.filter(pk=pk).values_list('datetime_modified', flat=True).first()
+        if modified is None:
+            # پست وجود ندارد؛ ویو پاسخ 404 را برمی‌گرداند
+            request._post_validators = (None, None)
+        else:
+            activity = activity_versions([pk])[pk]
+            request._post_validators = (
+                _make_etag('post', pk, modified.isoformat(), activity, _user_tag(request)),
+                max(modified, version_datetime(activity)),
+            )
+    return request._post_validators
+
+
+def post_etag(request, pk):
+    return _post_validators(request, pk)[0]
+
+
+def post_last_modified(request, pk):
+    return _post_validators(request, pk)[1]
+
+
+def list_etag(request, *args, **kwargs):
+    return _make_etag('list', list_version(), request.GET.urlencode(), _user_tag(request))
+
+
+def list_last_modified(request, *args, **kwargs):
+    return version_datetime(list_version())
+
+
+def patch_page_cache_headers(request, response):
+    """هدرهای کش: نسخه ناشناس قابل کش در پراکسی، نسخه کاربر فقط در مرورگر او"""
+    if is_anonymous(request):
+        patch_cache_control(response, public=True, max_age=0, s_maxage=settings.PAGE_CACHE_S_MAXAGE)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    # نسخه صفحه به کوکی نشست (کاربر وارد شده) بستگی دارد
+    patch_vary_headers(response, ('Cookie',))
+
+
+def page_cache_headers(view):
+    """هدرهای کش صفحات بدون اعتبارسنج (مثل صفحات نمایشی) مشابه conditional_page"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and response.status_code == 200:
+            patch_page_cache_headers(request, response)
+        return response
+    return wrapper
+
+
+def conditional_page(etag_func, last_modified_func):
+    """پاسخ 304 برای GET/HEAD با اعتبارسنج‌های ارزان؛ سایر متدها بدون تغییر اجرا می‌شوند"""
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            if 'messages' in request.COOKIES:
+                # پیام در انتظار (کوکی messages) باید در همین پاسخ نمایش داده شود؛ 304 آن را
+                # به صفحه بعدی منتقل می‌کند و صفحه حاوی پیام نباید در هیچ کشی بماند
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                patch_page_cache_headers(request, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,350 @@
+"""
+بافر write-behind شمارنده‌های لایک و واکنش ایموجی پست‌های پرطرفدار.
+
+با COUNTER_WRITE_BEHIND=1 هر لایک یا واکنش فقط ردیف خودش (جدول واسط لایک‌ها و
+EmojiReaction) را همزمان و در تراکنش درخواست می‌نویسد و تغییر شمارنده پس از commit با
+incr اتمی به کش مشترک اضافه می‌شود؛ درخواست‌های همزمان روی یک پست دیگر برای UPDATE ردیف
+همان پست صف نمی‌کشند. دستور flush_counters تغییرهای جمع شده را در فواصل منظم و به صورت
+دسته‌ای در پایگاه داده می‌نویسد. هنگام خواندن (صفحات، پاسخ لایک و واکنش، snapshot
+شمارنده‌های زنده) تغییرهای flush نشده به مقدار پایگاه داده اضافه می‌شوند.
+
+پست‌های دارای تغییر با یک پرچم و یک فهرست ترتیبی در کش ثبت می‌شوند تا flush بدون اسکن
+کلیدها آن‌ها را پیدا کند.
+
+رفتار در خطاها:
+- ردیف‌های لایک و واکنش منبع حقیقت هستند و هیچ‌گاه بافر نمی‌شوند؛
+- flush مقدار هر شمارنده را با decr اتمی از کش برمی‌دارد، پس تغییرهای همزمان از دست
+  نمی‌روند، و اگر نوشتن در پایگاه داده ناموفق باشد مقدار را به کش برمی‌گرداند؛
+- اگر پردازه بین commit و incr یا flush بین decr و commit از بین برود یا کش پاک شود،
+  تغییرهای بافر شده از دست می‌روند؛ reconcile (flush_counters --reconcile) شمارنده‌ها را
+  از روی ردیف‌ها برای پست‌هایی که تغییر flush نشده ندارند دوباره می‌سازد.
+- پستی که در حین شمارش مجدد reconcile تغییر بافر شده پیدا کند دوباره شمرده می‌شود و
+  مقدار «تعداد ردیف‌ها منهای تغییرهای بافر شده» (pending بلافاصله پس از شمارش) برایش
+  نوشته می‌شود تا flush بعدی آن تغییرها را دو بار حساب نکند.
+- پنجره باقی‌مانده: تغییری که ردیفش پیش از شمارش مجدد commit شده ولی incr آن پس از
+  خواندن pending انجام شود (یا ردیفش بین شمارش و خواندن pending commit و incr شود) یک
+  واحد خطا در شمارنده همان پست می‌گذارد که تا reconcile بعدی می‌ماند. این پنجره به
+  اندازه فاصله commit و incr یک درخواست (چند میلی‌ثانیه) است.
+
+کش باید بین همه workerها و دستور flush_counters مشترک باشد (Redis)؛ LocMemCache فقط
+برای توسعه محلی و تست‌ها مناسب است.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Greatest
+
+LIKES_KEY = 'counter:likes:{}'
+EMOJI_KEY = 'counter:emoji:{}:{}'
+DIRTY_FLAG_KEY = 'counter:dirty:{}'
+DIRTY_ENTRY_KEY = 'counter:dirty-entry:{}'
+DIRTY_SEQ_KEY = 'counter:dirty-seq'
+FLUSHED_SEQ_KEY = 'counter:flushed-seq'
+STALLED_SEQ_KEY = 'counter:stalled-seq'
+FLUSH_LOCK_KEY = 'counter:flush-lock'
+
+# پرچم پست پس از این مدت منقضی می‌شود تا پستی که ورودی فهرستش از دست رفته دوباره ثبت شود
+DIRTY_FLAG_TIMEOUT = 600
+# flush ای که در این مدت تمام نشده باشد (پردازه از بین رفته) قفل را نگه نمی‌دارد
+FLUSH_LOCK_TIMEOUT = 60
+RECONCILE_LOCK_TIMEOUT = 600
+# حداکثر انتظار recount برای پایان flush در حال اجرا (ثانیه)
+RECOUNT_WAIT_SECONDS = 5
+POLL_SECONDS = 0.05
+
+
+def enabled():
+    return settings.COUNTER_WRITE_BEHIND
+
+
+def _emoji_types():
+    # models همین ماژول را وارد می‌کند
+    from .models import EmojiReaction
+
+    return [emoji_type for emoji_type, _ in EmojiReaction.EMOJI_CHOICES]
+
+
+def _incr(key, delta):
+    cache.add(key, 0, None)
+    return cache.incr(key, delta)
+
+
+def _mark_dirty(post_id):
+    # فقط اولین تغییر پست پس از هر flush آن را در فهرست ثبت می‌کند
+    if cache.add(DIRTY_FLAG_KEY.format(post_id), 1, DIRTY_FLAG_TIMEOUT):
+        seq = _incr(DIRTY_SEQ_KEY, 1)
+        cache.set(DIRTY_ENTRY_KEY.format(seq), post_id, None)
+
+
+def add(post_id, likes=0, emoji=None):
+    """افزودن تغییر شمارنده‌های یک پست به کش (likes و emoji به صورت {نوع: تغییر})"""
+    deltas = {LIKES_KEY.format(post_id): likes} if likes else {}
+    deltas.update({EMOJI_KEY.format(post_id, emoji_type): delta for emoji_type, delta in (emoji or {}).items() if delta})
+    if not deltas:
+        return
+    for key, delta in deltas.items():
+        _incr(key, delta)
+    _mark_dirty(post_id)
+
+
+def buffer(post_id, using=None, likes=0, emoji=None):
+    """
+    افزودن تغییر شمارنده‌ها پس از commit تراکنش جاری؛ تراکنش برگردانده شده چیزی به کش
+    اضافه نمی‌کند و خطای کش درخواست را ناموفق نمی‌کند (reconcile آن را جبران می‌کند).
+    """
+    transaction.on_commit(lambda: add(post_id, likes, emoji), using=using, robust=True)
+
+
+def _keys(post_ids):
+    keys = {}
+    emoji_types = _emoji_types()
+    for post_id in post_ids:
+        keys[LIKES_KEY.format(post_id)] = (post_id, None)
+        for emoji_type in emoji_types:
+            keys[EMOJI_KEY.format(post_id, emoji_type)] = (post_id, emoji_type)
+    return keys
+
+
+def _group(keys, values):
+    changes = {}
+    for key, value in values.items():
+        if not value:
+            continue
+        post_id, emoji_type = keys[key]
+        counts = changes.setdefault(post_id, {'likes': 0, 'emoji': {}})
+        if emoji_type is None:
+            counts['likes'] = value
+        else:
+            counts['emoji'][emoji_type] = value
+    return changes
+
+
+def pending(post_ids):
+    """تغییرهای flush نشده با یک get_many: {شناسه پست: {'likes': تغییر، 'emoji': {نوع: تغییر}}}"""
+    if not enabled() or not post_ids:
+        return {}
+    keys = _keys(post_ids)
+    return _group(keys, cache.get_many(keys))
+
+
+async def apending(post_ids):
+    """نسخه ناهمزمان pending"""
+    if not enabled() or not post_ids:
+        return {}
+    keys = _keys(post_ids)
+    return _group(keys, await cache.aget_many(keys))
+
+
+def merge_emoji(summary, changes):
+    """افزودن تغییرهای flush نشده به خلاصه {نوع: تعداد} ایموجی‌های یک پست"""
+    for emoji_type, delta in changes.get('emoji', {}).items():
+        count = max(0, summary.get(emoji_type, 0) + delta)
+        if count:
+            summary[emoji_type] = count
+        else:
+            summary.pop(emoji_type, None)
+    return summary
+
+
+def apply_pending(posts):
+    """
+    افزودن تغییرهای flush نشده به likes_count و شمارنده‌های ایموجی (annotation های
+    with_user_state) پست‌های بارگذاری شده؛ بدون write-behind کاری انجام نمی‌دهد.
+    """
+    posts = list(posts)
+    changes = pending([post.pk for post in posts])
+    for post in posts:
+        counts = changes.get(post.pk)
+        if counts is None:
+            continue
+        post.likes_count = max(0, post.likes_count + counts['likes'])
+        for emoji_type, delta in counts['emoji'].items():
+            attribute = f'emoji_{emoji_type}_count'
+            if hasattr(post, attribute):
+                setattr(post, attribute, max(0, getattr(post, attribute) + delta))
+    return posts
+
+
+def _dirty_batch(batch_size):
+    """
+    (شناسه پست‌ها، آخرین شماره پردازش شده، کلید ورودی‌ها) از فهرست تغییرها. ورودی‌ای که
+    شماره‌اش گرفته شده ولی هنوز نوشته نشده است تا flush بعدی منتظر می‌ماند و اگر آن زمان
+    هم نباشد (پردازه نویسنده از بین رفته) رد می‌شود.
+    """
+    flushed = cache.get(FLUSHED_SEQ_KEY, 0)
+    last = min(cache.get(DIRTY_SEQ_KEY, 0), flushed + batch_size)
+    entry_keys = [DIRTY_ENTRY_KEY.format(seq) for seq in range(flushed + 1, last + 1)]
+    entries = cache.get_many(entry_keys)
+    post_ids = []
+    for seq, key in enumerate(entry_keys, flushed + 1):
+        if key not in entries:
+            if cache.get(STALLED_SEQ_KEY) != seq:
+                cache.set(STALLED_SEQ_KEY, seq, None)
+                return list(dict.fromkeys(post_ids)), seq - 1, entry_keys[:seq - flushed - 1]
+            continue
+        post_ids.append(entries[key])
+    return list(dict.fromkeys(post_ids)), last, entry_keys
+
+
+def dirty_post_ids():
+    """پست‌هایی که تغییر flush نشده در فهرست دارند"""
+    flushed = cache.get(FLUSHED_SEQ_KEY, 0)
+    last = cache.get(DIRTY_SEQ_KEY, 0)
+    entry_keys = [DIRTY_ENTRY_KEY.format(seq) for seq in range(flushed + 1, last + 1)]
+    return set(cache.get_many(entry_keys).values())
+
+
+def _write(changes):
+    from .models import EmojiReactionCount, Post_blog
+
+    existing = set(Post_blog.objects.filter(pk__in=changes).values_list('pk', flat=True))
+    likes = {post_id: counts['likes'] for post_id, counts in changes.items() if counts['likes'] and post_id in existing}
+    if likes:
+        # یک UPDATE برای لایک‌های همه پست‌های دسته؛ شمارنده هیچ‌گاه منفی نمی‌شود
+        delta = Case(*(When(pk=post_id, then=Value(value)) for post_id, value in likes.items()), default=Value(0))
+        Post_blog.objects.filter(pk__in=likes).update(likes_count=Greatest(F('likes_count') + delta, Value(0)))
+    for post_id, counts in changes.items():
+        if post_id in existing:
+            for emoji_type, value in counts['emoji'].items():
+                EmojiReactionCount.bump(post_id, emoji_type, value)
+
+
+@contextmanager
+def _flush_lock(timeout):
+    acquired = cache.add(FLUSH_LOCK_KEY, 1, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(FLUSH_LOCK_KEY)
+
+
+def _flush_batch(batch_size):
+    post_ids, last, entry_keys = _dirty_batch(batch_size)
+    if post_ids:
+        # تغییر بعدی هر پست پس از حذف پرچم دوباره آن را در فهرست ثبت می‌کند
+        cache.delete_many([DIRTY_FLAG_KEY.format(post_id) for post_id in post_ids])
+        keys = _keys(post_ids)
+        taken = {}
+        for key, value in cache.get_many(keys).items():
+            if value:
+                cache.decr(key, value)
+                taken[key] = value
+        try:
+            with transaction.atomic():
+                _write(_group(keys, taken))
+        except Exception:
+            # مقدارها برمی‌گردند و ورودی‌های فهرست در flush بعدی دوباره خوانده می‌شوند
+            for key, value in taken.items():
+                _incr(key, value)
+            raise
+    cache.set(FLUSHED_SEQ_KEY, last, None)
+    cache.delete_many(entry_keys)
+    return len(post_ids)
+
+
+def _flush_pending(batch_size):
+    total = 0
+    while True:
+        start = cache.get(FLUSHED_SEQ_KEY, 0)
+        total += _flush_batch(batch_size)
+        flushed = cache.get(FLUSHED_SEQ_KEY, 0)
+        # پایان فهرست یا ورودی‌ای که هنوز نوشته نشده است
+        if flushed >= cache.get(DIRTY_SEQ_KEY, 0) or flushed < start + batch_size:
+            return total
+
+
+def flush(batch_size=500):
+    """
+    نوشتن همه تغییرهای بافر شده در پایگاه داده، هر batch_size ورودی فهرست در یک تراکنش.
+    تعداد پست‌های flush شده یا None (flush دیگری در حال اجراست) برگردانده می‌شود.
+    """
+    with _flush_lock(FLUSH_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return None
+        return _flush_pending(batch_size)
+
+
+def reconcile(batch_size=1000):
+    """
+    flush همه تغییرها و سپس محاسبه مجدد شمارنده‌ها از روی ردیف‌های لایک و واکنش برای
+    پست‌هایی که تغییر flush نشده ندارند (شمارنده بقیه با flush بعدی درست می‌شود). پست‌هایی
+    که در حین شمارش تغییر بافر شده پیدا کنند با _recount دوباره شمرده می‌شوند. در این
+    مدت flush دیگری اجرا نمی‌شود. (تعداد شمارنده‌های لایک اصلاح شده، تعداد ردیف‌های
+    شمارنده ایموجی ساخته شده) یا None برگردانده می‌شود.
+    """
+    from .models import EmojiReactionCount, Post_blog
+
+    with _flush_lock(RECONCILE_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            return None
+        _flush_pending(batch_size)
+        skip = dirty_post_ids()
+        fixed = Post_blog.reconcile_like_counts(batch_size=batch_size, exclude=skip)
+        created = EmojiReactionCount.rebuild(batch_size=batch_size, exclude=skip)
+        # تغییرهای این پست‌ها پس از شمارش مجدد در کش اضافه شده‌اند و شاید در آن هم شمرده شده باشند
+        changed = list(dirty_post_ids() - skip)
+        for start in range(0, len(changed), batch_size):
+            batch_fixed, batch_created = _recount(changed[start:start + batch_size])
+            fixed += batch_fixed
+            created += batch_created
+        return fixed, created
+
+
+def recount(post_ids):
+    """
+    شمارش مجدد شمارنده‌های چند پست با حفظ تغییرهای بافر شده آن‌ها (به جای ساخت مجدد از
+    روی ردیف‌ها که آن تغییرها را در flush بعدی دو بار حساب می‌کند). تا پایان flush در
+    حال اجرا منتظر می‌ماند؛ اگر قفل به موقع آزاد نشود None برمی‌گردد و reconcile بعدی
+    شمارنده‌ها را درست می‌کند.
+    """
+    deadline = time.monotonic() + RECOUNT_WAIT_SECONDS
+    while True:
+        with _flush_lock(FLUSH_LOCK_TIMEOUT) as acquired:
+            if acquired:
+                return _recount(post_ids)
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(POLL_SECONDS)
+
+
+def _recount(post_ids):
+    """
+    نوشتن تعداد ردیف‌های لایک و واکنش منهای تغییرهای بافر شده برای پست‌ها، تا flush بعدی
+    شمارنده را دقیقا به تعداد ردیف‌ها برساند. (تعداد شمارنده‌های لایک نوشته شده، تعداد
+    ردیف‌های شمارنده ایموجی ساخته شده)
+    """
+    from .models import EmojiReaction, EmojiReactionCount, Post_blog
+
+    with transaction.atomic():
+        likes = dict.fromkeys(Post_blog.objects.filter(pk__in=post_ids).values_list('pk', flat=True), 0)
+        likes.update(
+            Post_blog.liked_by.through.objects.filter(post_blog_id__in=likes).order_by()
+            .values('post_blog_id').annotate(total=Count('pk')).values_list('post_blog_id', 'total')
+        )
+        emoji = {
+            (post_id, emoji_type): total
+            for post_id, emoji_type, total in EmojiReaction.objects.filter(post_id__in=likes).order_by()
+            .values('post_id', 'emoji_type').annotate(total=Count('pk')).values_list('post_id', 'emoji_type', 'total')
+        }
+        # بلافاصله پس از شمارش تا فاصله این دو خواندن کوتاه بماند
+        changes = pending(list(likes))
+        for post_id, counts in changes.items():
+            likes[post_id] -= counts['likes']
+            for emoji_type, delta in counts['emoji'].items():
+                emoji[post_id, emoji_type] = emoji.get((post_id, emoji_type), 0) - delta
+
+        fixed = 0
+        if likes:
+            stored = Case(*(When(pk=post_id, then=Value(max(0, total))) for post_id, total in likes.items()))
+            fixed = Post_blog.objects.filter(pk__in=likes).update(likes_count=stored)
+        EmojiReactionCount.objects.filter(post_id__in=likes).delete()
+        created = EmojiReactionCount.objects.bulk_create(
+            EmojiReactionCount(post_id=post_id, emoji_type=emoji_type, count=total)
+            for (post_id, emoji_type), total in emoji.items() if total > 0
+        )
+    return fixed, len(created)
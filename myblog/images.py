@@ -0,0 +1,157 @@
+"""
+ساخت نسخه‌های واکنش‌گرا (responsive) از تصویر پست‌ها.
+
+از هر تصویر آپلود شده سه اندازه thumb، card و full در دو قالب WebP و JPEG و بدون
+فراداده (EXIF و ...) ساخته می‌شود. ابعاد تصویر اصلی و هر نسخه در پست ذخیره می‌شود تا
+قالب‌ها width و height را بدون باز کردن فایل بنویسند. ساخت نسخه‌ها پس از commit و در
+یک thread pool انجام می‌شود تا درخواست آپلود منتظر پردازش تصویر نماند.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from PIL import Image, ImageOps
+
+from .caching import bump_activity
+from .models import Post_blog
+from .routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'blog_images/variants'
+
+# نام نسخه -> حداکثر عرض (تصویر هیچ‌گاه بزرگ‌تر از اصل ساخته نمی‌شود)
+VARIANT_WIDTHS = {'thumb': 320, 'card': 640, 'full': 1280}
+
+# پسوند -> (قالب Pillow، تنظیمات ذخیره)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            thread_name_prefix='image-variants',
+        )
+    return _executor
+
+
+def schedule_variants(post_id, using=None):
+    """ساخت نسخه‌های تصویر پس از commit؛ با IMAGE_VARIANT_WORKERS=0 همان‌جا اجرا می‌شود"""
+    def submit():
+        if settings.IMAGE_VARIANT_WORKERS:
+            _get_executor().submit(_build_in_worker, post_id)
+        else:
+            build_variants(post_id)
+    transaction.on_commit(submit, using=using)
+
+
+def _build_in_worker(post_id):
+    close_old_connections()
+    try:
+        build_variants(post_id)
+    except Exception:
+        logger.exception('ساخت نسخه‌های تصویر پست %s ناموفق بود', post_id)
+    finally:
+        # اتصال پایگاه داده هر thread جداست و باید همین‌جا بسته شود
+        connection.close()
+
+
+def _flatten(image, extension):
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    if not has_alpha:
+        return image.convert('RGB')
+    rgba = image.convert('RGBA')
+    if extension == 'webp':
+        return rgba
+    # JPEG شفافیت ندارد؛ تصویر روی زمینه سفید قرار می‌گیرد
+    background = Image.new('RGB', rgba.size, 'white')
+    background.paste(rgba, mask=rgba.getchannel('A'))
+    return background
+
+
+def _encode(image, extension):
+    pil_format, options = FORMATS[extension]
+    buffer = BytesIO()
+    # exif و icc_profile داده نمی‌شوند، پس فراداده تصویر اصلی در نسخه‌ها ذخیره نمی‌شود
+    _flatten(image, extension).save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def variant_files(variants):
+    return {
+        path
+        for entry in (variants or {}).values()
+        for extension in FORMATS
+        if (path := entry.get(extension))
+    }
+
+
+def render_variants(post_id, file, storage, stem):
+    """ساخت و ذخیره نسخه‌ها از فایل تصویر؛ (نسخه‌ها، عرض، ارتفاع) برگردانده می‌شود"""
+    with Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    width, height = image.size
+
+    variants = {}
+    for name, max_width in VARIANT_WIDTHS.items():
+        target_width = min(max_width, width)
+        target_height = max(1, round(height * target_width / width))
+        if (target_width, target_height) == image.size:
+            resized = image
+        else:
+            resized = image.resize((target_width, target_height), Image.Resampling.LANCZOS)
+
+        entry = {'width': target_width, 'height': target_height}
+        for extension in FORMATS:
+            path = f'{VARIANTS_DIR}/{post_id}/{stem}-{name}.{extension}'
+            if storage.exists(path):
+                storage.delete(path)
+            entry[extension] = storage.save(path, ContentFile(_encode(resized, extension)))
+        variants[name] = entry
+    return variants, width, height
+
+
+def build_variants(post_id):
+    """ساخت نسخه‌های تصویر یک پست و ذخیره آن‌ها؛ پست به‌روز شده برگردانده می‌شود"""
+    # پست تازه ذخیره شده ممکن است هنوز به رپلیکا نرسیده باشد
+    with use_primary():
+        post = Post_blog.objects.filter(pk=post_id).only('image', 'image_variants').first()
+    if post is None:
+        return None
+
+    name = post.image.name or ''
+    storage = post.image.storage
+    if name:
+        with storage.open(name) as file:
+            variants, width, height = render_variants(
+                post_id, file, storage, PurePosixPath(name).stem,
+            )
+    else:
+        variants, width, height = {}, None, None
+
+    new_files = variant_files(variants)
+    # اگر تصویر در این فاصله دوباره عوض شده باشد، کار جدیدتر نتیجه را ثبت می‌کند
+    updated = Post_blog.objects.filter(pk=post_id, image=post.image.name).update(
+        image_variants=variants, image_width=width, image_height=height,
+    )
+    stale = new_files if not updated else variant_files(post.image_variants) - new_files
+    for path in stale:
+        storage.delete(path)
+    if updated:
+        bump_activity(post_id)
+        post.image_variants, post.image_width, post.image_height = variants, width, height
+    return post
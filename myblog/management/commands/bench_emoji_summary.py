@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from myblog.benchmarks import create_users, format_timing, measure, rollback_afterwards
+from myblog.models import EmojiReaction, EmojiReactionCount, Post_blog
+
+
+def legacy_emojis_summary(post):
+    """پیاده‌سازی قبلی: شمارش همه واکنش‌های پست در پایتون"""
+    emojis = {}
+    for reaction in post.emoji_reactions.all():
+        emojis[reaction.emoji_type] = emojis.get(reaction.emoji_type, 0) + 1
+    return emojis
+
+
+class Command(BaseCommand):
+    help = 'مقایسه خلاصه ایموجی از روی شمارنده‌ها با شمارش همه واکنش‌ها (داده‌ها در پایان حذف می‌شوند)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reactions', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        reactions = options['reactions']
+        repeat = options['repeat']
+        emoji_types = [choice for choice, _ in EmojiReaction.EMOJI_CHOICES]
+
+        with rollback_afterwards():
+            users = create_users(reactions, prefix='bench-emoji-')
+            post = Post_blog.objects.create(
+                title='بنچمارک ایموجی', text='پست آزمایشی بنچمارک', status='pub', author=users[0]
+            )
+            EmojiReaction.objects.bulk_create(
+                (
+                    EmojiReaction(post=post, user=user, emoji_type=emoji_types[i % len(emoji_types)])
+                    for i, user in enumerate(users)
+                ),
+                batch_size=5000,
+            )
+            EmojiReactionCount.rebuild(post_ids=[post.pk])
+            assert legacy_emojis_summary(post) == post.get_emojis_summary()
+
+            self.stdout.write(f'{reactions} واکنش روی یک پست، {repeat} تکرار:')
+            legacy = measure(lambda: legacy_emojis_summary(post), repeat=repeat)
+            counters = measure(post.get_emojis_summary, repeat=repeat)
+            self.stdout.write(format_timing('legacy python loop', legacy))
+            self.stdout.write(format_timing('denormalized counters', counters))
+            self.stdout.write(self.style.SUCCESS(
+                f"speedup (median): {legacy['median'] / counters['median']:.1f}x"
+            ))
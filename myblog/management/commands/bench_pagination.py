@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from myblog.benchmarks import create_users, format_timing, measure, rollback_afterwards
+from myblog.models import Post_blog
+from myblog.pagination import ORDERING, encode_cursor, keyset_page
+
+
+class Command(BaseCommand):
+    help = 'مقایسه صفحه‌بندی OFFSET با صفحه‌بندی cursor در عمق‌های مختلف (داده‌ها در پایان حذف می‌شوند)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        total_pages = options['posts'] // page_size
+
+        with rollback_afterwards():
+            author = create_users(1, prefix='bench-pagination-')[0]
+            Post_blog.objects.bulk_create(
+                (
+                    Post_blog(title=f'پست {i}', text='متن', status='pub', author=author)
+                    for i in range(options['posts'])
+                ),
+                batch_size=5000,
+            )
+            # تاریخ‌های متفاوت برای پست‌ها؛ بدون update() همه پست‌ها زمان یکسان دارند
+            now = timezone.now()
+            for post_id in Post_blog.objects.values_list('pk', flat=True)[::1000]:
+                Post_blog.objects.filter(pk__gte=post_id, pk__lt=post_id + 1000).update(
+                    datetime_modified=now - timedelta(minutes=post_id)
+                )
+
+            published = Post_blog.objects.filter(status='pub')
+            self.stdout.write(f"{options['posts']} پست، {page_size} پست در هر صفحه:")
+            for page in (1, 10, 100, 1000, total_pages - 1):
+                if page < 1 or page > total_pages:
+                    continue
+                offset = (page - 1) * page_size
+                ordered = published.order_by(*ORDERING)
+                previous = ordered[offset - 1] if offset else None
+                cursor = encode_cursor(previous) if previous else None
+
+                def offset_page():
+                    # مسیر فعلی ListView: COUNT(*) و سپس LIMIT/OFFSET
+                    published.count()
+                    list(ordered[offset:offset + page_size])
+
+                self.stdout.write(f'page {page}:')
+                self.stdout.write(format_timing('  offset + count', measure(offset_page, options['repeat'])))
+                self.stdout.write(format_timing(
+                    '  keyset cursor',
+                    measure(lambda: keyset_page(published, cursor, page_size), options['repeat']),
+                ))
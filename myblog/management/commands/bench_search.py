@@ -0,0 +1,83 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from myblog.benchmarks import create_users, format_timing, measure, rollback_afterwards
+from myblog.models import Post_blog
+from myblog.search import get_search_backend, indexable_rows
+
+LETTERS = 'ابپتثجچحخدذرزژسشصضطظعغفقکگلمنوهی'
+
+
+def build_vocabulary(rng, size):
+    """واژگان مصنوعی فارسی؛ فراوانی کلمات از توزیع زیپف پیروی می‌کند"""
+    words = {''.join(rng.choice(LETTERS) for _ in range(rng.randint(3, 8))) for _ in range(size * 2)}
+    words = sorted(words)[:size]
+    rng.shuffle(words)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    return words, weights
+
+
+def random_text(rng, vocabulary, count):
+    words, weights = vocabulary
+    return ' '.join(rng.choices(words, weights=weights, k=count))
+
+
+class Command(BaseCommand):
+    help = 'مقایسه جستجوی icontains قبلی با بک‌اند متن کامل (داده‌ها در پایان حذف می‌شوند)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=50_000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        repeat = options['repeat']
+        vocabulary = build_vocabulary(rng, 20_000)
+        words = vocabulary[0]
+        # کلمه پرتکرار، کلمه با تکرار متوسط، کلمه کم‌تکرار و عبارت دو کلمه‌ای
+        queries = [words[2], words[200], words[5000], f'{words[10]} {words[50]}']
+
+        with rollback_afterwards():
+            authors = create_users(50, prefix='bench-search-')
+            Post_blog.objects.bulk_create(
+                (
+                    Post_blog(
+                        title=random_text(rng, vocabulary, 6),
+                        text=random_text(rng, vocabulary, 150),
+                        status='pub',
+                        author=rng.choice(authors),
+                    )
+                    for _ in range(options['posts'])
+                ),
+                batch_size=2000,
+            )
+            backend = get_search_backend()
+            backend.rebuild(indexable_rows(Post_blog.objects.all()))
+            self.stdout.write(
+                f"{options['posts']} پست، بک‌اند {type(backend).__name__}، {repeat} تکرار:"
+            )
+            published = Post_blog.objects.filter(status='pub')
+
+            for query in queries:
+                def icontains_page():
+                    # مسیر قبلی: COUNT برای صفحه‌بندی و سپس صفحه اول
+                    matches = published.filter(
+                        Q(title__icontains=query) |
+                        Q(text__icontains=query) |
+                        Q(author__username__icontains=query)
+                    )
+                    matches.count()
+                    list(matches.order_by('-datetime_modified').values_list('pk', flat=True)[:6])
+
+                def full_text_page():
+                    hits = backend.search(query, 500)
+                    page = [hit.post_id for hit in hits[:6]]
+                    list(published.filter(pk__in=page).values_list('pk', flat=True))
+                    backend.snippets(query, page)
+
+                self.stdout.write(f'query: {query}')
+                self.stdout.write(format_timing('  icontains + count', measure(icontains_page, repeat)))
+                self.stdout.write(format_timing('  ranked full-text', measure(full_text_page, repeat)))
@@ -0,0 +1,107 @@
+import random
+from itertools import cycle
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from myblog import prerender
+from myblog.benchmarks import rollback_afterwards, seed_blog
+from myblog.models import Post_blog
+
+# تنظیمات نشست و پیام قبل از مسیر بدون نشست کاربران ناشناس
+LEGACY_SETTINGS = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+}
+# زمان هش رمز عبور در ورودهای ناموفق بخشی از این بنچمارک نیست
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class Command(BaseCommand):
+    help = (
+        'شمارش نوشتن‌های پایگاه داده و کوئری‌های جدول نشست به ازای هر ۱۰۰۰ بازدید '
+        '(فهرست، جزئیات و صفحات ثابت) کاربران ناشناس و وارد شده با تنظیمات قبلی و فعلی '
+        'نشست و پیام‌ها (داده‌های آزمایشی در پایان برگردانده می‌شوند)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', type=int, default=1000)
+        parser.add_argument('--readers', type=int, default=50)
+        parser.add_argument(
+            '--noisy', type=float, default=0.2,
+            help='سهم خوانندگانی که پیش از خواندن چند بار ورود ناموفق و یک نظر بدون ورود دارند',
+        )
+        parser.add_argument('--failed-logins', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        with rollback_afterwards(), override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+            users, _ = seed_blog(
+                random.Random(options['seed']), users=options['readers'], posts=60,
+                comments=300, likes=300, reactions=150,
+            )
+            paths = self.read_paths()
+            for label, overrides in (('before', LEGACY_SETTINGS), ('after', {})):
+                with override_settings(**overrides):
+                    self.report(f'{label} / ناشناس', self.replay(paths, options, self.anonymous_readers(paths, options)))
+                    self.report(f'{label} / وارد شده', self.replay(paths, options, self.logged_in_readers(users)))
+
+    def report(self, label, result):
+        per_thousand = 1000 / result['views']
+        self.stdout.write(
+            f"{label:<20} {result['views']} بازدید   "
+            f"نوشتن {result['writes']} ({result['writes'] * per_thousand:.1f} در هر ۱۰۰۰)   "
+            f"کوئری نشست {result['session']} ({result['session'] * per_thousand:.1f} در هر ۱۰۰۰)   "
+            f"پاسخ با Set-Cookie {result['cookies']}"
+        )
+
+    def read_paths(self):
+        posts = list(Post_blog.objects.filter(status='pub').order_by('-pk').values_list('pk', flat=True)[:20])
+        paths = [reverse('post_list'), reverse('post_list') + '?page=2']
+        paths += [reverse('blog_detail', args=[pk]) for pk in posts]
+        paths += [reverse(name) for name in sorted(prerender.STATIC_PAGES)]
+        return paths
+
+    def anonymous_readers(self, paths, options):
+        """خوانندگان ناشناس؛ درخواست‌های پیام‌دار آن‌ها هم در شمارش حساب می‌شوند"""
+        rng = random.Random(options['seed'])
+        detail = next(path for path in paths if '/post/' in path)
+        for _ in range(options['readers']):
+            client = Client()
+            if rng.random() < options['noisy']:
+                # پیام‌های این درخواست‌ها هرگز نمایش داده نمی‌شوند و روی هم جمع می‌شوند
+                for _ in range(options['failed_logins']):
+                    client.post(reverse('login'), {'username': 'nobody', 'password': 'wrong'})
+                client.post(detail, {'comment_submit': '1', 'text': 'نظر'})
+            yield client
+
+    def logged_in_readers(self, users):
+        clients = []
+        # ساخت نشست‌ها (ورود) خارج از شمارش است
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+        return iter(clients)
+
+    def replay(self, paths, options, readers):
+        result = {'views': 0, 'writes': 0, 'session': 0, 'cookies': 0}
+
+        def count(execute, sql, params, many, context):
+            statement = sql.lstrip().upper()
+            result['writes'] += statement.startswith(WRITE_PREFIXES)
+            result['session'] += 'DJANGO_SESSION' in statement
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            readers = list(readers)
+            pages = cycle(paths)
+            for index in range(options['views']):
+                response = readers[index % len(readers)].get(next(pages))
+                result['views'] += 1
+                result['cookies'] += bool(response.cookies)
+        return result
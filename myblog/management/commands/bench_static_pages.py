@@ -0,0 +1,46 @@
+import tempfile
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from myblog import prerender
+from myblog.benchmarks import format_timing, measure
+
+
+class Command(BaseCommand):
+    help = 'مقایسه سرعت رندر عادی صفحات ثابت با سرو نسخه پیش‌رندر شده'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        client = Client(HTTP_ACCEPT_ENCODING='gzip, br')
+
+        with tempfile.TemporaryDirectory() as root, override_settings(PRERENDER_ROOT=root):
+            paths = [reverse(name) for name in sorted(prerender.STATIC_PAGES)]
+            # قبل از اجرای prerender_pages هیچ manifestی وجود ندارد و ویو اصلی اجرا می‌شود
+            rendered = {path: self.timed(lambda: client.get(path), repeat) for path in paths}
+
+            call_command('prerender_pages', stdout=self.stdout)
+            for path in paths:
+                etag = client.get(path)['ETag']
+                self.stdout.write(f'{path}:')
+                self.report('  render', rendered[path], repeat)
+                self.report('  prerendered', self.timed(lambda: client.get(path), repeat), repeat)
+                self.report(
+                    '  304 revalidation',
+                    self.timed(lambda: client.get(path, HTTP_IF_NONE_MATCH=etag), repeat),
+                    repeat,
+                )
+
+    def timed(self, func, repeat):
+        started = time.perf_counter()
+        return measure(func, repeat), time.perf_counter() - started
+
+    def report(self, label, result, repeat):
+        timing, elapsed = result
+        self.stdout.write(f'{format_timing(label, timing)}   {repeat / elapsed:7.0f} req/s')
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from myblog.images import build_variants
+from myblog.models import Post_blog
+
+
+class Command(BaseCommand):
+    help = 'ساخت نسخه‌های WebP و JPEG تصویر پست‌هایی که هنوز نسخه ندارند'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'post_ids', nargs='*', type=int,
+            help='شناسه پست‌ها؛ در صورت خالی بودن همه پست‌های دارای تصویر بررسی می‌شوند'
+        )
+        parser.add_argument('--force', action='store_true', help='ساخت مجدد حتی اگر نسخه‌ها وجود داشته باشند')
+
+    def handle(self, *args, **options):
+        posts = Post_blog.objects.exclude(image='').exclude(image__isnull=True)
+        if options['post_ids']:
+            posts = posts.filter(pk__in=options['post_ids'])
+        if not options['force']:
+            posts = posts.filter(image_variants={})
+
+        built = original_bytes = card_bytes = 0
+        for post_id in posts.order_by('pk').values_list('pk', flat=True).iterator():
+            try:
+                post = build_variants(post_id)
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f'پست {post_id}: {exc}')
+                continue
+            if post is None or not post.image_variants:
+                continue
+            built += 1
+            storage = post.image.storage
+            original_bytes += storage.size(post.image.name)
+            card_bytes += storage.size(post.image_variants['card']['webp'])
+
+        self.stdout.write(self.style.SUCCESS(f'نسخه‌های تصویر {built} پست ساخته شد.'))
+        if built:
+            self.stdout.write(
+                f'حجم تصاویر اصلی {original_bytes} بایت، نسخه card (WebP) {card_bytes} بایت '
+                f'({original_bytes / max(card_bytes, 1):.1f} برابر کمتر)'
+            )
@@ -0,0 +1,32 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from myblog.transfer import dump_record, export_records, open_jsonl
+
+
+class Command(BaseCommand):
+    help = (
+        'خروجی JSONL کاربران، پست‌ها، نظرات، واکنش‌ها و لایک‌ها با حافظه ثابت '
+        '(برای ورود با import_blog؛ فایل‌های تصویر جداگانه منتقل می‌شوند)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='مسیر فایل خروجی (.gz برای فشرده‌سازی، - برای stdout)')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='تعداد ردیف‌هایی که در هر بار از پایگاه داده خوانده می‌شوند',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = Counter()
+        with open_jsonl(options['output'], 'w') as output:
+            for record in export_records(batch_size=options['batch_size']):
+                output.write(dump_record(record))
+                counts[record['type']] += 1
+        # با خروجی stdout گزارش نباید داخل فایل JSONL نوشته شود
+        report = self.stderr if options['output'] == '-' else self.stdout
+        summary = ', '.join(f'{kind}={counts[kind]}' for kind in ('user', 'post', 'comment', 'reaction', 'like'))
+        report.write(self.style.SUCCESS(f'{summary} در {time.perf_counter() - start:.1f} ثانیه خروجی گرفته شد.'))
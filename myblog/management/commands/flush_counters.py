@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from myblog import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'نوشتن تغییرهای بافر شده شمارنده‌های لایک و واکنش (COUNTER_WRITE_BEHIND) در پایگاه داده؛ '
+        'با --interval به صورت دائمی در فواصل منظم اجرا می‌شود'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='فاصله flush ها به ثانیه؛ صفر یعنی فقط یک بار',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='تعداد پست‌هایی که در هر تراکنش نوشته می‌شوند',
+        )
+        parser.add_argument(
+            '--reconcile', action='store_true',
+            help='پس از flush شمارنده‌ها را از روی جدول لایک‌ها و واکنش‌ها دوباره بسازد',
+        )
+
+    def handle(self, *args, **options):
+        if not counters.enabled():
+            raise CommandError('COUNTER_WRITE_BEHIND فعال نیست.')
+        if options['reconcile']:
+            result = counters.reconcile()
+            if result is None:
+                raise CommandError('flush دیگری در حال اجراست.')
+            fixed, created = result
+            self.stdout.write(self.style.SUCCESS(
+                f'{fixed} شمارنده لایک اصلاح و {created} ردیف شمارنده ایموجی ساخته شد.'
+            ))
+            return
+
+        while True:
+            flushed = counters.flush(options['batch_size'])
+            if flushed:
+                self.stdout.write(f'{flushed} پست flush شد.')
+            if not options['interval']:
+                return
+            # اتصال پایگاه داده بین flush ها مثل پایان یک درخواست مدیریت می‌شود
+            close_old_connections()
+            time.sleep(options['interval'])
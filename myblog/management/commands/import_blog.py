@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from myblog.routers import use_primary
+from myblog.transfer import BlogImporter, InvalidExport, open_jsonl
+
+
+class Command(BaseCommand):
+    help = (
+        'ورود فایل JSONL دستور export_blog با bulk_create دسته‌ای و شناسه‌های جدید؛ '
+        'اجرای دوباره همان فایل پس از قطع شدن از آخرین دسته commit شده ادامه می‌دهد'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='مسیر فایل خروجی export_blog (.gz یا - برای stdin)')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='تعداد رکوردهایی که در هر تراکنش وارد می‌شوند',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size باید حداقل ۱ باشد')
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # نگاشت شناسه پست‌ها به شناسه‌های برگردانده شده از bulk_create نیاز دارد
+            raise CommandError('این پایگاه داده شناسه ردیف‌های bulk_create را برنمی‌گرداند.')
+        importer = BlogImporter(batch_size=options['batch_size'])
+        start = time.perf_counter()
+        # نقاط بازیابی و کاربران موجود باید از پایگاه داده اصلی خوانده شوند
+        with use_primary(), open_jsonl(options['input'], 'r') as lines:
+            try:
+                counts = importer.run(lines)
+            except InvalidExport as error:
+                raise CommandError(f'{error} (دسته‌های قبلی commit شده‌اند و اجرای بعدی ادامه می‌دهد)')
+        if counts is None:
+            self.stdout.write(f'خروجی {importer.export_id} قبلا کامل وارد شده است.')
+            return
+        if importer.resumed_after:
+            self.stdout.write(f'ادامه ورود از خط {importer.resumed_after + 1}')
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        summary = ', '.join(f'{kind}={counts[kind]}' for kind in ('user', 'post', 'comment', 'reaction', 'like'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{summary} در {elapsed:.1f} ثانیه وارد شد ({total / max(elapsed, 0.001):.0f} رکورد در ثانیه).'
+        ))
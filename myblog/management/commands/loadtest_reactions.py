@@ -0,0 +1,215 @@
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.middleware.csrf import _get_new_csrf_string
+from django.urls import reverse
+
+from myblog import counters
+from myblog.benchmarks import create_users
+from myblog.models import Post_blog
+
+# نحوه اجرای هر استقرار؛ {port} و {workers} جایگزین می‌شوند
+SERVERS = {
+    'gunicorn': [
+        'gunicorn', 'config.wsgi:application', '--bind', '127.0.0.1:{port}',
+        '--workers', '{workers}', '--timeout', '120',
+    ],
+    'asgi': [
+        'gunicorn', 'config.asgi:application', '-k', 'uvicorn_worker.UvicornWorker',
+        '--bind', '127.0.0.1:{port}', '--workers', '{workers}', '--timeout', '120',
+    ],
+}
+
+# حالت‌های نوشتن شمارنده‌ها (مقدار COUNTER_WRITE_BEHIND سرور)
+COUNTER_MODES = {'direct': '0', 'write-behind': '1'}
+
+
+class Command(BaseCommand):
+    help = (
+        'آزمون بار endpoint های لایک و واکنش: مقایسه throughput و تاخیر p99 در gunicorn '
+        'همزمان و استقرار ASGI؛ با --hot همه کاربران یک پست را لایک می‌کنند و نوشتن مستقیم '
+        'شمارنده با write-behind مقایسه می‌شود (داده‌های آزمایشی در پایان حذف می‌شوند)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default='gunicorn,asgi', help='از بین: ' + ', '.join(SERVERS))
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=3)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--hot', action='store_true',
+            help='همه کاربران همزمان یک پست مشترک را لایک کنند (لایک پایدار روی یک پست پرطرفدار)',
+        )
+        parser.add_argument('--counters', default='direct', help='از بین: ' + ', '.join(COUNTER_MODES))
+
+    def handle(self, *args, **options):
+        servers = [name.strip() for name in options['servers'].split(',') if name.strip()]
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f'سرور نامعتبر: {", ".join(sorted(unknown))}')
+        modes = [name.strip() for name in options['counters'].split(',') if name.strip()]
+        unknown = set(modes) - set(COUNTER_MODES)
+        if unknown:
+            raise CommandError(f'حالت شمارنده نامعتبر: {", ".join(sorted(unknown))}')
+        if 'write-behind' in modes and not settings.REDIS_URL:
+            # workerها و همین دستور (برای flush) باید یک کش مشترک داشته باشند
+            raise CommandError('حالت write-behind به REDIS_URL نیاز دارد.')
+
+        concurrency = options['concurrency']
+        prefix = f'loadtest-{os.getpid()}-'
+        # هر کاربر همزمان نشست و پست خودش را دارد تا قفل یک ردیف نتیجه را تعیین نکند
+        users = create_users(concurrency, prefix=prefix)
+        posts = Post_blog.objects.bulk_create(
+            Post_blog(title=f'{prefix}{i}', text='load test', status='drf', author=users[0])
+            for i in range(concurrency)
+        )
+        if posts and posts[0].pk is None:
+            posts = list(Post_blog.objects.filter(title__startswith=prefix).order_by('pk'))
+        sessions = []
+        try:
+            clients = []
+            targets = [posts[0]] * len(posts) if options['hot'] else posts
+            for user, post in zip(users, targets):
+                session = SessionStore()
+                session[SESSION_KEY] = str(user.pk)
+                session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+                session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+                session.create()
+                sessions.append(session)
+                clients.append((session.session_key, _get_new_csrf_string(), post.pk))
+
+            endpoints = [('  toggle_like', 'toggle_like', '')]
+            if not options['hot']:
+                endpoints.append(('  add_emoji_reaction', 'add_emoji_reaction', 'emoji_type=love'))
+            for name in servers:
+                for mode in modes:
+                    self.stdout.write(
+                        f'{name} / {mode} ({options["workers"]} worker، {concurrency} کاربر همزمان):'
+                    )
+                    env = {'COUNTER_WRITE_BEHIND': COUNTER_MODES[mode]}
+                    with self.server(name, options['port'], options['workers'], env):
+                        for label, url_name, body in endpoints:
+                            self.stdout.write(self.format_result(label, self.load(
+                                options['port'], clients, url_name, body, options['requests'],
+                            )))
+                    if mode == 'write-behind':
+                        self.stdout.write(self.check_counters(targets))
+        finally:
+            for session in sessions:
+                session.delete()
+            Post_blog.objects.filter(pk__in=[post.pk for post in posts]).delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def server(self, name, port, workers, env=None):
+        command = [sys.executable, '-m'] + [part.format(port=port, workers=workers) for part in SERVERS[name]]
+        return _Server(command, port, env)
+
+    def check_counters(self, posts):
+        """flush تغییرهای بافر شده و مقایسه شمارنده با تعداد واقعی لایک‌ها"""
+        started = time.perf_counter()
+        counters.flush()
+        elapsed = (time.perf_counter() - started) * 1000
+        likes = Post_blog.liked_by.through.objects
+        drift = sum(
+            abs(post.likes_count - likes.filter(post_blog_id=post.pk).count())
+            for post in Post_blog.objects.filter(pk__in={post.pk for post in posts})
+        )
+        return f'  flush {elapsed:.1f} ms   اختلاف شمارنده با جدول لایک‌ها: {drift}'
+
+
+    def load(self, port, clients, url_name, body, total):
+        remaining = iter(range(total))
+        lock = threading.Lock()
+
+        def worker(client):
+            session_key, csrf, post_id = client
+            path = reverse(url_name, args=[post_id])
+            headers = {
+                'Cookie': f'{settings.SESSION_COOKIE_NAME}={session_key}; {settings.CSRF_COOKIE_NAME}={csrf}',
+                'X-CSRFToken': csrf,
+                'Content-Type': 'application/x-www-form-urlencoded',
+            }
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+            latencies, errors = [], 0
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                start = time.perf_counter()
+                try:
+                    connection.request('POST', path, body=body, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+                    ok = False
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += not ok
+            connection.close()
+            return latencies, errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            results = list(executor.map(worker, clients))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for result, _ in results for latency in result)
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': latencies[len(latencies) // 2],
+            'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+            'errors': sum(errors for _, errors in results),
+        }
+
+    def format_result(self, label, result):
+        return (
+            f"{label:<24} {result['throughput']:8.1f} req/s   p50 {result['p50']:8.1f} ms   "
+            f"p99 {result['p99']:8.1f} ms   errors {result['errors']}"
+        )
+
+
+class _Server:
+    """اجرای سرور در پردازه جدا و انتظار تا آماده شدن پورت"""
+
+    def __init__(self, command, port, env=None):
+        self.command = command
+        self.port = port
+        self.env = env or {}
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            self.command, env={**os.environ, **self.env, 'PYTHONUNBUFFERED': '1'},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f'اجرای {" ".join(self.command)} ناموفق بود')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError('سرور در زمان مقرر آماده نشد')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
@@ -0,0 +1,376 @@
+import json
+import logging
+import random
+import statistics
+import tempfile
+import time
+import warnings
+from collections import namedtuple
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.template.backends.django import Template as DjangoTemplate
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from myblog.benchmarks import rollback_afterwards, seed_blog
+from myblog.models import Post_blog
+from myblog.pagination import keyset_page
+from myblog.pwa import offline_feed
+from myblog.views import COMMENTS_PAGE_SIZE, PostListView
+
+BUDGETS_PATH = Path(__file__).resolve().parents[2] / 'perf_budgets.json'
+
+# ماژول‌های url که هر مسیر آن‌ها باید حداقل یک سناریو داشته باشد
+COVERED_URLCONFS = ('myblog.urls', 'account.urls')
+
+# معیارهایی که بودجه دارند؛ تعداد کوئری دقیق و بقیه با tolerance فایل بودجه مقایسه می‌شوند
+COUNT_METRICS = ('queries_cold', 'queries')
+TIMING_METRICS = ('db_ms', 'render_ms', 'total_ms')
+
+# user: یکی از anonymous، member (نویسنده نظر و صاحب لایک/واکنش)، author (نویسنده پست) یا staff
+Scenario = namedtuple(
+    'Scenario', 'name url_name args method user data content_type status headers',
+    defaults=((), 'get', 'anonymous', None, None, 200, None),
+)
+
+
+def build_scenarios(data):
+    post, comment = data['post'], data['comment']
+    return [
+        Scenario('post_list', 'post_list'),
+        Scenario('post_list:member', 'post_list', user='member'),
+        Scenario('post_list:search', 'post_list', data={'q': 'django'}),
+        Scenario('post_feed', 'post_feed', data={'cursor': data['feed_cursor']}),
+        Scenario('offline_feed', 'offline_feed'),
+        Scenario('offline_feed:delta', 'offline_feed', data={'since': data['offline_version']}),
+        Scenario('blog_detail', 'blog_detail', (post,)),
+        Scenario('blog_detail:member', 'blog_detail', (post,), user='member'),
+        Scenario(
+            'blog_detail:comment', 'blog_detail', (post,), 'post', 'member',
+            {'comment_submit': '1', 'text': 'نظر جدید'}, status=302,
+        ),
+        Scenario('post_comments', 'post_comments', (post,), data={'cursor': data['comments_cursor']}),
+        Scenario('toggle_like', 'toggle_like', (post,), 'post', 'member'),
+        Scenario('add_emoji_reaction', 'add_emoji_reaction', (post,), 'post', 'member', {'emoji_type': 'wow'}),
+        Scenario('remove_emoji_reaction', 'remove_emoji_reaction', (post,), 'post', 'member'),
+        # stream های SSE در بنچمارک بلافاصله پس از پیام‌های اولیه بسته می‌شوند
+        Scenario('post_events', 'post_events', data={'ids': ','.join(map(str, data['batch_posts']))}),
+        Scenario(
+            'reactions_batch', 'reactions_batch', method='post', user='member',
+            data=json.dumps({'operations': [
+                {'post': post_id, 'action': 'like'} for post_id in data['batch_posts']
+            ]}),
+            content_type='application/json',
+        ),
+        Scenario('post_create', 'post_create', user='staff'),
+        Scenario('post_update', 'post_update', (post,), user='author'),
+        Scenario('post_delete', 'post_delete', (post,), user='author'),
+        Scenario('delete_comment', 'delete_comment', (comment,), user='member', status=302),
+        Scenario('access_denied', 'access_denied', status=403),
+        Scenario('about_me', 'about_me'),
+        Scenario('projects', 'projects'),
+        Scenario('computer_vision_codes', 'computer_vision_codes'),
+        Scenario('computer_python', 'computer_python'),
+        Scenario('coputer_djngo', 'coputer_djngo'),
+        Scenario('offline', 'offline'),
+        Scenario('signup', 'signup'),
+        Scenario('login', 'login'),
+        Scenario('logout', 'logout', method='post', user='member', status=302),
+    ]
+
+
+def url_names(urlconf):
+    names = set()
+    for pattern in get_resolver(urlconf).url_patterns:
+        if isinstance(pattern, URLResolver):
+            names |= url_names(pattern.urlconf_module)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def _consume(response):
+    if not response.streaming:
+        return response.content
+    # Client همزمان باید iterator ناهمزمان stream را کامل بخواند (هشدار جنگو مورد انتظار است)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return b''.join(response)
+
+
+class _Probe:
+    """شمارش کوئری‌ها، زمان پایگاه داده و زمان رندر قالب (بدون کوئری‌های داخل آن) در یک درخواست"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self._rendering = False
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - start
+
+    def wrap_render(self, render):
+        probe = self
+
+        def timed_render(template, context=None, request=None):
+            # قالب‌های تو در تو (include و render_to_string داخل رندر) یک بار شمرده می‌شوند
+            if probe._rendering:
+                return render(template, context, request)
+            probe._rendering = True
+            start, db_before = time.perf_counter(), probe.db
+            try:
+                return render(template, context, request)
+            finally:
+                probe._rendering = False
+                probe.render += (time.perf_counter() - start) - (probe.db - db_before)
+        return timed_render
+
+
+class Command(BaseCommand):
+    help = (
+        'بنچمارک همه مسیرهای myblog و account روی داده آزمایشی بزرگ و مقایسه تعداد کوئری، '
+        'زمان پایگاه داده، زمان رندر و حجم پاسخ با بودجه‌های perf_budgets.json '
+        '(داده‌ها در پایان حذف می‌شوند؛ در صورت پسرفت با خطا خارج می‌شود)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--posts', type=int, default=3000)
+        parser.add_argument('--comments', type=int, default=20_000)
+        parser.add_argument('--likes', type=int, default=30_000)
+        parser.add_argument('--reactions', type=int, default=15_000)
+        parser.add_argument('--repeat', type=int, default=5, help='تعداد اجرای هر سناریو؛ اجرای اول با کش خالی')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--only', default='', help='نام سناریوها با کاما')
+        parser.add_argument('--budgets', default=str(BUDGETS_PATH))
+        parser.add_argument('--json', dest='json_path', help='مسیر خروجی JSON نتایج (- برای stdout)')
+        parser.add_argument(
+            '--queries-only', action='store_true',
+            help='فقط تعداد کوئری و حجم پاسخ بررسی شود (برای ماشین‌های با زمان‌سنجی ناپایدار)',
+        )
+        parser.add_argument('--update-budgets', action='store_true', help='ذخیره نتایج به عنوان بودجه جدید')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat باید حداقل ۱ باشد')
+        only = {name.strip() for name in options['only'].split(',') if name.strip()}
+        budgets_path = Path(options['budgets'])
+        budgets = json.loads(budgets_path.read_text(encoding='utf-8')) if budgets_path.exists() else {}
+
+        # کش و صفحات پیش‌رندر جدا تا نتیجه به وضعیت سرور بستگی نداشته باشد و کش واقعی آلوده نشود
+        with tempfile.TemporaryDirectory() as prerender_root, override_settings(
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'perf-budget',
+            }},
+            PRERENDER_ROOT=prerender_root,
+            REALTIME_STREAM_SECONDS=0,
+            # کش کامل صفحات ناشناس کوئری‌های خود ویوها را در اجراهای گرم پنهان می‌کند
+            PAGE_CACHE_TIMEOUT=0,
+        ), rollback_afterwards():
+            data = self.seed(options)
+            scenarios = build_scenarios(data)
+            missing = set().union(*map(url_names, COVERED_URLCONFS)) - {s.url_name for s in scenarios}
+            if only:
+                scenarios = [scenario for scenario in scenarios if scenario.name in only]
+
+            results = {}
+            original_render = DjangoTemplate.render
+            # هشدارهای 4xx سناریوهای مورد انتظار (مثل access_denied) خروجی را شلوغ نکنند
+            request_logger = logging.getLogger('django.request')
+            previous_level = request_logger.level
+            request_logger.setLevel(logging.ERROR)
+            try:
+                for scenario in scenarios:
+                    results[scenario.name] = self.run_scenario(scenario, data, options['repeat'], original_render)
+            finally:
+                DjangoTemplate.render = original_render
+                request_logger.setLevel(previous_level)
+
+        if options['update_budgets']:
+            budgets = self.update_budgets(budgets_path, budgets, results)
+        regressions = self.compare(results, budgets, options['queries_only'])
+        regressions += [
+            {'view': name, 'metric': 'scenario', 'value': None, 'budget': None} for name in sorted(missing)
+        ]
+        for name, result in results.items():
+            if result['status'] != result['expected_status']:
+                regressions.append({
+                    'view': name, 'metric': 'status',
+                    'value': result['status'], 'budget': result['expected_status'],
+                })
+
+        self.report(results, regressions)
+        if options['json_path']:
+            self.write_json(options['json_path'], {
+                'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'database': connection.vendor,
+                'dataset': {key: options[key] for key in ('users', 'posts', 'comments', 'likes', 'reactions', 'seed')},
+                'repeat': options['repeat'],
+                'views': results,
+                'regressions': regressions,
+            })
+        if regressions:
+            raise CommandError(f'{len(regressions)} مورد خارج از بودجه کارایی')
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        people, posts = seed_blog(
+            rng, users=options['users'], posts=options['posts'], comments=options['comments'],
+            likes=options['likes'], reactions=options['reactions'], prefix='perf-budget',
+        )
+        post = next(post for post in posts if post.status == 'pub')
+        member = people[1] if people[1] != post.author else people[2]
+        staff = User.objects.create(username='perf-budget-staff', password='!', is_staff=True)
+
+        # member این پست را لایک کرده، واکنش داده و آخرین نظر را نوشته است
+        post.set_like(member, True)
+        post.set_emoji_reaction(member, 'love')
+        # شمارنده wow از قبل وجود دارد تا تعداد کوئری add_emoji_reaction به اندازه داده بستگی نداشته باشد
+        post.set_emoji_reaction(next(user for user in people if user not in (member, post.author)), 'wow')
+        comment = post.comments.create(author=member, text='نظر آزمایشی member')
+
+        _, feed_cursor = keyset_page(
+            Post_blog.objects.filter(status='pub'), page_size=PostListView.paginate_by,
+        )
+        _, comments_cursor = keyset_page(
+            post.get_active_comments(), page_size=COMMENTS_PAGE_SIZE, field='datetime_create',
+        )
+        return {
+            'post': post.pk,
+            'comment': comment.pk,
+            'users': {'member': member, 'author': post.author, 'staff': staff},
+            'feed_cursor': feed_cursor,
+            'comments_cursor': comments_cursor,
+            'batch_posts': [item.pk for item in posts if item.status == 'pub'][:10],
+            # نسخه فعلی فید آفلاین؛ درخواست delta فقط شناسه‌ها را برمی‌گرداند
+            'offline_version': offline_feed(None)['version'],
+        }
+
+    def run_scenario(self, scenario, data, repeat, original_render):
+        path = reverse(scenario.url_name, args=scenario.args)
+        user = data['users'].get(scenario.user)
+        runs = []
+        for _ in range(repeat):
+            # هر اجرا در savepoint جدا تا سناریوهای تغییردهنده داده روی اجرای بعدی اثر نگذارند
+            with transaction.atomic():
+                client = Client()
+                if user is not None:
+                    client.force_login(user)
+                probe = _Probe()
+                DjangoTemplate.render = probe.wrap_render(original_render)
+                try:
+                    extra = {'content_type': scenario.content_type} if scenario.content_type else {}
+                    if scenario.headers:
+                        extra['headers'] = scenario.headers
+                    with connection.execute_wrapper(probe.execute):
+                        start = time.perf_counter()
+                        response = getattr(client, scenario.method)(path, scenario.data, **extra)
+                        content = _consume(response)
+                        total = time.perf_counter() - start
+                finally:
+                    DjangoTemplate.render = original_render
+                transaction.set_rollback(True)
+            runs.append({
+                'queries': probe.queries,
+                'db_ms': probe.db * 1000,
+                'render_ms': probe.render * 1000,
+                'total_ms': total * 1000,
+                'response_bytes': len(content),
+                'status': response.status_code,
+            })
+
+        # اجرای اول با کش خالی است؛ بقیه اجراها وضعیت پایدار (کش گرم) را نشان می‌دهند
+        warm = runs[1:] or runs
+        return {
+            'path': path,
+            'method': scenario.method.upper(),
+            'user': scenario.user,
+            'status': runs[0]['status'],
+            'expected_status': scenario.status,
+            'queries_cold': runs[0]['queries'],
+            'queries': max(run['queries'] for run in warm),
+            **{
+                metric: round(statistics.median(run[metric] for run in warm), 3)
+                for metric in TIMING_METRICS
+            },
+            'response_bytes': max(run['response_bytes'] for run in runs),
+        }
+
+    def compare(self, results, budgets, queries_only):
+        tolerance = budgets.get('tolerance', {})
+        views = budgets.get('views', {})
+        regressions = []
+        for name, result in results.items():
+            budget = views.get(name)
+            if budget is None:
+                regressions.append({'view': name, 'metric': 'budget', 'value': None, 'budget': None})
+                continue
+            limits = {metric: budget[metric] for metric in COUNT_METRICS}
+            limits['response_bytes'] = budget['response_bytes'] * (1 + tolerance.get('response_bytes', 0))
+            if not queries_only:
+                for metric in TIMING_METRICS:
+                    limits[metric] = budget[metric] * (1 + tolerance.get('ms', 0)) + tolerance.get('min_ms', 0)
+            for metric, limit in limits.items():
+                if result[metric] > limit:
+                    regressions.append({
+                        'view': name, 'metric': metric, 'value': result[metric], 'budget': round(limit, 3),
+                    })
+        return regressions
+
+    def report(self, results, regressions):
+        failed = {(item['view'], item['metric']) for item in regressions}
+        self.stdout.write(
+            f"{'view':<24} {'status':>6} {'queries':>9} {'db ms':>8} {'render ms':>10} "
+            f"{'total ms':>9} {'bytes':>8}"
+        )
+        for name, result in results.items():
+            mark = ' *' if any(view == name for view, _ in failed) else ''
+            self.stdout.write(
+                f"{name:<24} {result['status']:>6} {result['queries_cold']:>4}/{result['queries']:<4} "
+                f"{result['db_ms']:>8.2f} {result['render_ms']:>10.2f} {result['total_ms']:>9.2f} "
+                f"{result['response_bytes']:>8}{mark}"
+            )
+        for item in regressions:
+            if item['metric'] == 'scenario':
+                message = f"مسیر {item['view']} سناریوی بنچمارک ندارد"
+            elif item['metric'] == 'budget':
+                message = f"سناریوی {item['view']} در فایل بودجه نیست (--update-budgets)"
+            else:
+                message = f"{item['view']}: {item['metric']} = {item['value']} (بودجه {item['budget']})"
+            self.stdout.write(self.style.ERROR(message))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('همه مسیرها در محدوده بودجه هستند.'))
+
+    def write_json(self, path, payload):
+        output = json.dumps(payload, ensure_ascii=False, indent=2)
+        if path == '-':
+            self.stdout.write(output)
+        else:
+            Path(path).write_text(output + '\n', encoding='utf-8')
+
+    def update_budgets(self, path, budgets, results):
+        views = budgets.setdefault('views', {})
+        for name, result in results.items():
+            views[name] = {
+                metric: result[metric]
+                for metric in (*COUNT_METRICS, *TIMING_METRICS, 'response_bytes')
+            }
+        budgets = {
+            # زمان‌ها تا دو برابر بودجه به اضافه min_ms و حجم پاسخ تا ۱۰٪ بیشتر مجاز است
+            'tolerance': budgets.get('tolerance', {'ms': 1.0, 'min_ms': 5.0, 'response_bytes': 0.1}),
+            'views': dict(sorted(views.items())),
+        }
+        path.write_text(json.dumps(budgets, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'بودجه {len(results)} سناریو در {path} ذخیره شد.'))
+        return budgets
@@ -0,0 +1,32 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from myblog import prerender
+
+
+class Command(BaseCommand):
+    help = 'پیش‌رندر صفحات ثابت همراه نسخه‌های gzip و brotli برای سرو بدون رندر قالب'
+
+    def handle(self, *args, **options):
+        # ثبت ویوها با import شدن urlconf انجام می‌شود
+        resolve('/')
+        factory = RequestFactory()
+        pages = {}
+        for url_name, view in sorted(prerender.STATIC_PAGES.items()):
+            path = reverse(url_name)
+            request = factory.get(path)
+            request.user = AnonymousUser()
+            request.resolver_match = resolve(path)
+            response = view(request)
+            if response.status_code != 200:
+                raise CommandError(f'{url_name}: وضعیت {response.status_code}')
+            pages[url_name] = entry = prerender.write_page(url_name, response.content)
+            sizes = ', '.join(f'{encoding}={size}' for encoding, size in entry['size'].items())
+            self.stdout.write(f'{path} -> {sizes}')
+
+        prerender.write_manifest(pages)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(pages)} صفحه در {prerender.prerender_root()} پیش‌رندر شد.'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myblog import counters
+from myblog.models import EmojiReactionCount
+
+
+class Command(BaseCommand):
+    help = 'ساخت مجدد شمارنده‌های ایموجی از روی جدول واکنش‌ها'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'post_ids', nargs='*', type=int,
+            help='شناسه پست‌ها؛ در صورت خالی بودن شمارنده همه پست‌ها ساخته می‌شود'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if counters.enabled():
+            # تغییرهای flush نشده دو بار شمرده می‌شوند
+            raise CommandError('با COUNTER_WRITE_BEHIND از flush_counters --reconcile استفاده کنید.')
+        created = EmojiReactionCount.rebuild(
+            post_ids=options['post_ids'] or None,
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{created} ردیف شمارنده ایموجی ساخته شد.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myblog.models import Post_blog
+from myblog.search import ContainsSearchBackend, get_search_backend, indexable_rows, reset_availability_cache
+
+
+class Command(BaseCommand):
+    help = 'ساخت مجدد کامل ایندکس جستجوی متن کامل پست‌های منتشر شده'
+
+    def handle(self, *args, **options):
+        # جدول ایندکس ممکن است پس از آخرین بررسی این پردازه ساخته شده باشد
+        reset_availability_cache()
+        backend = get_search_backend()
+        if isinstance(backend, ContainsSearchBackend):
+            raise CommandError('ایندکس جستجو برای این پایگاه داده در دسترس نیست؛ ابتدا migrate را اجرا کنید.')
+        indexed = backend.rebuild(indexable_rows(Post_blog.objects.all()))
+        self.stdout.write(self.style.SUCCESS(
+            f'{indexed} پست با {type(backend).__name__} ایندکس شد.'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myblog import counters
+from myblog.models import Post_blog
+
+
+class Command(BaseCommand):
+    help = 'محاسبه مجدد شمارنده لایک پست‌هایی که با جدول لایک‌ها همخوانی ندارند'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='تعداد پست‌هایی که در هر دستور UPDATE اصلاح می‌شوند'
+        )
+
+    def handle(self, *args, **options):
+        if counters.enabled():
+            # تغییرهای flush نشده دو بار شمرده می‌شوند
+            raise CommandError('با COUNTER_WRITE_BEHIND از flush_counters --reconcile استفاده کنید.')
+        fixed = Post_blog.reconcile_like_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{fixed} شمارنده لایک اصلاح شد.'))
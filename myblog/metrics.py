@@ -0,0 +1,252 @@
+"""
+متریک‌های Prometheus درخواست‌ها: تاخیر، تعداد و زمان کوئری‌ها، زمان رندر قالب، حجم
+پاسخ و خطاها به تفکیک نام url. زمان کش هم برای Server-Timing (myblog/timing.py) در
+آمار درخواست جمع می‌شود.
+
+با چند worker گانیکورن هر پردازه متریک‌های خودش را در فایل‌های PROMETHEUS_MULTIPROC_DIR
+می‌نویسد و endpoint /metrics همه آن‌ها را با هم جمع می‌کند؛ بدون این متغیر محیطی (توسعه
+محلی و تست‌ها) متریک‌ها فقط در حافظه همان پردازه نگهداری می‌شوند.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+# درخواست‌هایی که به هیچ url ای نرسیده‌اند (404 مسیریابی) یک برچسب مشترک دارند
+UNRESOLVED = '<unresolved>'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    'django_request_latency_seconds', 'زمان کامل پاسخ به درخواست',
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter('django_requests', 'تعداد درخواست‌ها بر اساس کد وضعیت', ['view', 'method', 'status'])
+EXCEPTIONS = Counter('django_request_exceptions', 'خطاهای مدیریت نشده ویوها', ['view', 'exception'])
+DB_QUERIES = Histogram(
+    'django_db_queries_per_request', 'تعداد کوئری‌های SQL هر درخواست',
+    ['view'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_TIME = Histogram(
+    'django_db_time_seconds', 'زمان کل کوئری‌های SQL هر درخواست', ['view'], buckets=LATENCY_BUCKETS,
+)
+TEMPLATE_TIME = Histogram(
+    'django_template_render_seconds', 'زمان رندر قالب‌های هر درخواست بدون کوئری‌های داخل آن',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'django_response_size_bytes', 'حجم بدنه پاسخ',
+    ['view'], buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+    """
+    آمار درخواست جاری. sql به صورت پیش‌فرض None است و فقط وقتی لیست باشد (لاگ درخواست‌های
+    کند) متن کوئری‌ها و زمان هر کدام تا سقف max_sql ذخیره می‌شود.
+    """
+    __slots__ = (
+        'queries', 'db_time', 'render_time', 'rendering',
+        'cache_calls', 'cache_time', 'in_cache', 'sql', 'max_sql',
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.rendering = False
+        self.cache_calls = 0
+        self.cache_time = 0.0
+        self.in_cache = False
+        self.sql = None
+        self.max_sql = 0
+
+
+@contextmanager
+def request_stats():
+    """آمار درخواست جاری؛ middlewareهای تو در تو (متریک‌ها و Server-Timing) یک شیء مشترک دارند"""
+    stats = _current.get()
+    if stats is not None:
+        yield stats
+        return
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        stats.queries += 1
+        stats.db_time += duration
+        if stats.sql is not None and len(stats.sql) < stats.max_sql:
+            stats.sql.append((sql, duration))
+
+
+def install_query_recorder(connection):
+    # wrapper دائمی روی هر اتصال؛ خارج از درخواست (دستورات و threadها) فقط اجرا را پاس می‌دهد
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        # include و render_to_string داخل یک رندر دیگر یک بار شمرده می‌شوند
+        if stats is None or stats.rendering:
+            return self._template.render(context, request)
+        stats.rendering = True
+        start, db_before = time.perf_counter(), stats.db_time
+        try:
+            return self._template.render(context, request)
+        finally:
+            stats.rendering = False
+            stats.render_time += (time.perf_counter() - start) - (stats.db_time - db_before)
+
+
+def _timed_cache_method(method):
+    @wraps(method)
+    def timed(self, *args, **kwargs):
+        stats = _current.get()
+        # get_or_set و ... خودشان متدهای دیگر کش را صدا می‌زنند؛ فقط بیرونی‌ترین شمرده می‌شود
+        if stats is None or stats.in_cache:
+            return method(self, *args, **kwargs)
+        stats.in_cache = True
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            stats.in_cache = False
+            stats.cache_calls += 1
+            stats.cache_time += time.perf_counter() - start
+    return timed
+
+
+CACHE_METHODS = (
+    'add', 'get', 'set', 'touch', 'delete', 'get_many', 'get_or_set', 'has_key',
+    'incr', 'decr', 'set_many', 'delete_many', 'clear',
+)
+
+
+def _instrument_cache(backend_class):
+    """زیرکلاس backend کش که زمان هر فراخوانی را در آمار درخواست جاری ثبت می‌کند"""
+    namespace = {name: _timed_cache_method(getattr(backend_class, name)) for name in CACHE_METHODS}
+    namespace['__module__'] = __name__
+    return type(f'Instrumented{backend_class.__name__}', (backend_class,), namespace)
+
+
+InstrumentedLocMemCache = _instrument_cache(LocMemCache)
+InstrumentedRedisCache = _instrument_cache(RedisCache)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """موتور قالب جنگو که زمان رندر را در متریک‌های درخواست جاری ثبت می‌کند"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED
+    return match.view_name
+
+
+def _response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+def _observe(request, response, stats, started):
+    view = view_name(request)
+    REQUEST_LATENCY.labels(view, request.method).observe(time.perf_counter() - started)
+    REQUESTS.labels(view, request.method, str(response.status_code)).inc()
+    DB_QUERIES.labels(view).observe(stats.queries)
+    DB_TIME.labels(view).observe(stats.db_time)
+    if stats.render_time:
+        TEMPLATE_TIME.labels(view).observe(stats.render_time)
+    size = _response_size(response)
+    if size is not None:
+        RESPONSE_SIZE.labels(view).observe(size)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """ثبت متریک‌های هر درخواست؛ خطاهای ویو در process_exception شمرده می‌شوند"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            with request_stats() as stats:
+                response = await get_response(request)
+            _observe(request, response, stats, started)
+            return response
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            with request_stats() as stats:
+                response = get_response(request)
+            _observe(request, response, stats, started)
+            return response
+
+    def process_exception(request, exception):
+        EXCEPTIONS.labels(view_name(request), type(exception).__name__).inc()
+
+    middleware.process_exception = process_exception
+    return middleware
+
+
+def collect():
+    """متن متریک‌ها؛ در حالت چند پردازه‌ای از فایل‌های همه workerها جمع می‌شود"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def metrics_view(request):
+    # بدون METRICS_TOKEN فقط در حالت DEBUG در دسترس است
+    token = settings.METRICS_TOKEN
+    if token:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not constant_time_compare(header, f'Bearer {token}'):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(collect(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,60 @@
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .routers import pin_to_primary, unpin
+
+# مقدار کوکی زمان پایان (unix) بازه‌ای است که خواندن‌ها باید از primary انجام شوند
+REPLICA_PIN_COOKIE = 'db_pin'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def _should_pin(request):
+    if request.method not in SAFE_METHODS:
+        return True
+    try:
+        return float(request.COOKIES.get(REPLICA_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _remember_write(request, response):
+    if request.method in SAFE_METHODS or not settings.REPLICA_DATABASES:
+        return response
+    seconds = settings.REPLICA_PIN_SECONDS
+    response.set_cookie(
+        REPLICA_PIN_COOKIE, str(int(time.time() + seconds)),
+        max_age=seconds, httponly=True, samesite='Lax',
+        secure=settings.SESSION_COOKIE_SECURE,
+    )
+    return response
+
+
+@sync_and_async_middleware
+def replica_pinning_middleware(get_response):
+    """
+    خواندن درخواست‌های نوشتن و درخواست‌های چند ثانیه بعد از آن به primary می‌روند
+    تا کاربر تغییر خودش را ببیند، حتی اگر رپلیکا هنوز به‌روز نشده باشد.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = pin_to_primary() if _should_pin(request) else None
+            try:
+                response = await get_response(request)
+            finally:
+                if token is not None:
+                    unpin(token)
+            return _remember_write(request, response)
+    else:
+        def middleware(request):
+            token = pin_to_primary() if _should_pin(request) else None
+            try:
+                response = get_response(request)
+            finally:
+                if token is not None:
+                    unpin(token)
+            return _remember_write(request, response)
+    return middleware
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_emoji_counts(apps, schema_editor):
+    EmojiReaction = apps.get_model('myblog', 'EmojiReaction')
+    EmojiReactionCount = apps.get_model('myblog', 'EmojiReactionCount')
+    totals = (
+        EmojiReaction.objects.order_by()
+        .values('post_id', 'emoji_type')
+        .annotate(total=Count('pk'))
+    )
+    EmojiReactionCount.objects.bulk_create(
+        [EmojiReactionCount(post_id=row['post_id'], emoji_type=row['emoji_type'], count=row['total'])
+         for row in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myblog', '0004_comment_emojireaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmojiReactionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('emoji_type', models.CharField(choices=[('like', '👍'), ('love', '❤️'), ('laugh', '😂'), ('wow', '😮'), ('sad', '😢'), ('angry', '😠')], max_length=10, verbose_name='نوع ایموجی')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='تعداد')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='emoji_counts', to='myblog.post_blog')),
+            ],
+            options={
+                'verbose_name': 'شمارنده ایموجی',
+                'verbose_name_plural': 'شمارنده\u200cهای ایموجی',
+                'unique_together': {('post', 'emoji_type')},
+            },
+        ),
+        migrations.RunPython(populate_emoji_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import OperationalError, migrations
+
+from myblog.search import BACKENDS
+
+
+def create_search_index(apps, schema_editor):
+    backend_class = BACKENDS.get(schema_editor.connection.vendor)
+    if backend_class is None:
+        return
+    backend = backend_class(schema_editor.connection)
+    try:
+        backend.create_index()
+    except OperationalError:
+        # SQLite بدون ماژول FTS5 کامپایل شده است؛ جستجو به icontains برمی‌گردد
+        return
+    Post_blog = apps.get_model('myblog', 'Post_blog')
+    backend.rebuild(
+        Post_blog.objects.filter(status='pub')
+        .values_list('pk', 'title', 'text', 'author__username')
+        .iterator()
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    backend_class = BACKENDS.get(schema_editor.connection.vendor)
+    if backend_class is not None:
+        backend_class(schema_editor.connection).drop_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myblog', '0005_emojireactioncount'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
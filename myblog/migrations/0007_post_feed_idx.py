@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myblog', '0006_post_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post_blog',
+            index=models.Index(fields=['status', '-datetime_modified', '-id'], name='post_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_comments_count(apps, schema_editor):
+    Comment = apps.get_model('myblog', 'Comment')
+    Post_blog = apps.get_model('myblog', 'Post_blog')
+    active = (
+        Comment.objects.filter(post=OuterRef('pk'), is_active=True)
+        .order_by().values('post').annotate(total=Count('pk')).values('total')
+    )
+    Post_blog.objects.update(comments_count=Coalesce(Subquery(active[:1]), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myblog', '0008_post_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post_blog',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد نظرات'),
+        ),
+        migrations.RunPython(populate_comments_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'is_active', '-datetime_create', '-id'], name='comment_post_active_idx'),
+        ),
+    ]
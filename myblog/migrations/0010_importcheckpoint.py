@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myblog', '0009_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_id', models.CharField(db_index=True, max_length=64, verbose_name='شناسه خروجی')),
+                ('line', models.PositiveBigIntegerField(verbose_name='آخرین خط وارد شده')),
+                ('post_ids', models.JSONField(blank=True, default=dict)),
+                ('finished', models.BooleanField(default=False, verbose_name='پایان ورود')),
+                ('datetime_create', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+            ],
+            options={
+                'verbose_name': 'نقطه بازیابی ورود',
+                'verbose_name_plural': 'نقاط بازیابی ورود',
+            },
+        ),
+    ]
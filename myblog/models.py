@@ -1,7 +1,57 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, IntegrityError, models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.urls import reverse
 
+from . import counters
+from .caching import attach_cache_versions, bump_activity
+from .realtime import publish_counts
+
+
+def _count_subquery(queryset, field='post'):
+    """زیرکوئری شمارش ردیف‌های مرتبط با هر پست (بدون JOIN و ضرب ردیف‌ها)"""
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts[:1]), 0)
+
+
+class PostQuerySet(models.QuerySet):
+
+    def with_user_state(self, user):
+        """
+        افزودن وضعیت لایک و ایموجی کاربر جاری و تعداد هر ایموجی به صورت annotation؛
+        تعداد کوئری‌ها به تعداد پست‌ها وابسته نیست.
+        """
+        annotations = {}
+        for emoji_type, _ in EmojiReaction.EMOJI_CHOICES:
+            counter = EmojiReactionCount.objects.filter(
+                post=OuterRef('pk'), emoji_type=emoji_type
+            ).values('count')[:1]
+            annotations[f'emoji_{emoji_type}_count'] = Coalesce(Subquery(counter), 0)
+
+        if user is not None and user.is_authenticated:
+            likes = Post_blog.liked_by.through.objects.filter(
+                post_blog=OuterRef('pk'), user=user.pk
+            )
+            user_reaction = EmojiReaction.objects.filter(
+                post=OuterRef('pk'), user=user.pk
+            ).values('emoji_type')[:1]
+            annotations['user_has_liked'] = Exists(likes)
+            annotations['user_emoji'] = Subquery(user_reaction)
+        else:
+            annotations['user_has_liked'] = Value(False, output_field=models.BooleanField())
+            annotations['user_emoji'] = Value(None, output_field=models.CharField())
+
+        return self.annotate(**annotations)
+
+
 class Post_blog(models.Model):
     STATUS_CHOICES = (
         ('pub', 'published'),
@@ -11,6 +61,10 @@ class Post_blog(models.Model):
     title = models.CharField(max_length=250)
     text = models.TextField()
     image = models.ImageField(upload_to='blog_images/', blank=True, null=True, verbose_name='تصویر پست')
+    # ابعاد تصویر اصلی و نسخه‌های تغییر اندازه داده شده (توسط myblog.images ساخته می‌شوند)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     datetime_create = models.DateTimeField(auto_now_add=True)
     datetime_modified = models.DateTimeField(auto_now=True)
     status = models.CharField(choices=STATUS_CHOICES, max_length=4)
@@ -18,54 +72,285 @@ class Post_blog(models.Model):
     
     # فیلدهای جدید برای لایک عمومی
     likes_count = models.PositiveIntegerField(default=0)
+    # تعداد نظرات فعال؛ توسط سیگنال‌های Comment و CommentQuerySet.set_active به‌روز می‌شود
+    comments_count = models.PositiveIntegerField(default=0, verbose_name='تعداد نظرات')
     liked_by = models.ManyToManyField(User, related_name='liked_posts', blank=True)
 
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # ایندکس صفحه‌بندی keyset لیست پست‌های منتشر شده
+            models.Index(fields=['status', '-datetime_modified', '-id'], name='post_feed_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
     def get_absolute_url(self):
         return reverse('blog_detail', kwargs={'pk': self.pk})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # نگهداری نام تصویر بارگذاری شده تا نسخه‌های تصویر فقط با تغییر آن دوباره ساخته شوند
+        if 'image' in field_names:
+            instance._loaded_image = instance.image.name
+        return instance
+
+    @property
+    def cache_version(self):
+        """نسخه کش قطعه‌های قالب این پست (معمولا به صورت دسته‌ای با attach_cache_versions پر می‌شود)"""
+        if not hasattr(self, '_cache_version'):
+            attach_cache_versions([self])
+        return self._cache_version
+
     def toggle_like(self, user):
-        """تغییر وضعیت لایک توسط کاربر"""
-        if user in self.liked_by.all():
-            self.liked_by.remove(user)
-            self.likes_count -= 1
-            is_liked = False
-        else:
-            self.liked_by.add(user)
-            self.likes_count += 1
-            is_liked = True
-        self.save()
+        """
+        تغییر وضعیت لایک توسط کاربر به صورت تراکنشی.
+        حذف از جدول واسط خودش بررسی وجود لایک است و شمارنده با F() به‌روز می‌شود،
+        بنابراین درخواست‌های همزمان به‌روزرسانی‌های یکدیگر را از دست نمی‌دهند.
+        """
+        with transaction.atomic():
+            is_liked = not self._remove_like(user)
+            delta = -1
+            if is_liked:
+                delta = 1 if self._add_like(user) else 0
+            self._refresh_likes_count(delta)
         return is_liked, self.likes_count
 
-    def is_liked_by_user(self, user):
-        """بررسی آیا کاربر این پست را لایک کرده است"""
-        if user.is_authenticated:
-            return self.liked_by.filter(id=user.id).exists()
-        return False
+    def set_like(self, user, liked):
+        """ثبت یا حذف لایک کاربر (تکرار آن نتیجه را تغییر نمی‌دهد)"""
+        with transaction.atomic():
+            if liked:
+                delta = 1 if self._add_like(user) else 0
+            else:
+                delta = -1 if self._remove_like(user) else 0
+            self._refresh_likes_count(delta)
+        return liked, self.likes_count
+
+    def _remove_like(self, user):
+        likes = Post_blog.liked_by.through.objects
+        removed, _ = likes.filter(post_blog_id=self.pk, user_id=user.pk).delete()
+        if removed and not counters.enabled():
+            Post_blog.objects.filter(pk=self.pk, likes_count__gt=0).update(likes_count=F('likes_count') - 1)
+        return bool(removed)
+
+    def _add_like(self, user):
+        try:
+            with transaction.atomic():
+                Post_blog.liked_by.through.objects.create(post_blog_id=self.pk, user_id=user.pk)
+        except IntegrityError:
+            # درخواست همزمان دیگری از همین کاربر زودتر لایک را ثبت کرده است
+            return False
+        if not counters.enabled():
+            Post_blog.objects.filter(pk=self.pk).update(likes_count=F('likes_count') + 1)
+        return True
+
+    def _refresh_likes_count(self, delta):
+        self.likes_count = Post_blog.objects.filter(pk=self.pk).values_list('likes_count', flat=True).get()
+        if counters.enabled():
+            # در حالت write-behind ردیف پست به‌روز نمی‌شود؛ تغییر همین تراکنش پس از commit
+            # به کش اضافه می‌شود و تا آن زمان در تغییرهای flush نشده نیست
+            pending = counters.pending([self.pk]).get(self.pk, {}).get('likes', 0)
+            self.likes_count = max(0, self.likes_count + pending + delta)
+            if delta:
+                counters.buffer(self.pk, likes=delta)
+        transaction.on_commit(lambda: bump_activity(self.pk))
+        if delta:
+            # مقدار کل هم ارسال می‌شود تا صفحه کاربری که خودش لایک کرده آن را دو بار نشمارد
+            publish_counts(self.pk, likes=delta, likes_total=self.likes_count)
+
+    @classmethod
+    def reconcile_like_counts(cls, batch_size=1000, exclude=()):
+        """
+        محاسبه مجدد likes_count از روی جدول واسط برای پست‌هایی که شمارنده آن‌ها
+        با تعداد واقعی لایک‌ها یکی نیست (به جز پست‌های exclude). تعداد پست‌های اصلاح شده
+        برگردانده می‌شود.
+        """
+        actual = _count_subquery(cls.liked_by.through.objects.all(), field='post_blog')
+        drifted = (
+            cls.objects.order_by()
+            .annotate(actual_likes=actual)
+            .exclude(likes_count=F('actual_likes'))
+            .exclude(pk__in=exclude)
+            .values_list('pk', flat=True)
+        )
+        drifted_ids = list(drifted)
+        fixed = 0
+        for start in range(0, len(drifted_ids), batch_size):
+            batch = drifted_ids[start:start + batch_size]
+            fixed += cls.objects.filter(pk__in=batch).update(likes_count=actual)
+        return fixed
+
+    @classmethod
+    def bump_comments_count(cls, post_id, delta):
+        """تغییر اتمی شمارنده نظرات فعال با F()؛ شمارنده هیچ‌گاه منفی نمی‌شود"""
+        posts = cls.objects.filter(pk=post_id)
+        if delta < 0:
+            posts = posts.filter(comments_count__gte=-delta)
+        posts.update(comments_count=F('comments_count') + delta)
+
+    @classmethod
+    def refresh_comments_count(cls, post_ids=None):
+        """محاسبه مجدد شمارنده نظرات فعال از روی جدول نظرات با یک UPDATE"""
+        posts = cls.objects.all() if post_ids is None else cls.objects.filter(pk__in=post_ids)
+        return posts.update(comments_count=_count_subquery(Comment.objects.filter(is_active=True)))
+
+    @classmethod
+    def refresh_like_counts(cls, post_ids):
+        """محاسبه مجدد likes_count پست‌های داده شده از روی جدول لایک‌ها با یک UPDATE"""
+        actual = _count_subquery(cls.liked_by.through.objects.all(), field='post_blog')
+        return cls.objects.filter(pk__in=post_ids).update(likes_count=actual)
 
     def get_active_comments(self):
         """دریافت نظرات فعال مرتبط با پست"""
-        return self.comments.filter(is_active=True).order_by('-datetime_create')
+        return self.comments.filter(is_active=True).select_related('author').order_by('-datetime_create')
 
     def get_emojis_summary(self):
         """دریافت خلاصه ایموجی‌های پست"""
-        emojis = {}
-        for reaction in self.emoji_reactions.all():
-            if reaction.emoji_type in emojis:
-                emojis[reaction.emoji_type] += 1
-            else:
-                emojis[reaction.emoji_type] = 1
-        return emojis
-
-    def get_user_emoji(self, user):
-        """دریافت ایموجی انتخاب شده توسط کاربر"""
-        if user.is_authenticated:
-            reaction = self.emoji_reactions.filter(user=user).first()
-            return reaction.emoji_type if reaction else None
+        # اگر پست از طریق with_user_state بارگذاری شده باشد، کوئری اضافه لازم نیست
+        # (تغییرهای flush نشده write-behind را counters.apply_pending به annotation ها اضافه می‌کند)
+        if hasattr(self, 'emoji_like_count'):
+            return {
+                emoji_type: getattr(self, f'emoji_{emoji_type}_count')
+                for emoji_type, _ in EmojiReaction.EMOJI_CHOICES
+                if getattr(self, f'emoji_{emoji_type}_count')
+            }
+        # خواندن حداکثر شش ردیف از شمارنده‌های غیرنرمال‌شده به جای شمارش همه واکنش‌ها
+        summary = dict(self.emoji_counts.filter(count__gt=0).values_list('emoji_type', 'count'))
+        return counters.merge_emoji(summary, counters.pending([self.pk]).get(self.pk, {}))
+
+    async def aget_emojis_summary(self):
+        """نسخه ناهمزمان get_emojis_summary با ORM ناهمزمان"""
+        summary = {
+            emoji_type: count
+            async for emoji_type, count in self.emoji_counts.filter(count__gt=0).values_list('emoji_type', 'count')
+        }
+        return counters.merge_emoji(summary, (await counters.apending([self.pk])).get(self.pk, {}))
+
+    def set_emoji_reaction(self, user, emoji_type):
+        """ثبت یا تغییر واکنش ایموجی کاربر؛ شمارنده‌ها در همان تراکنش به‌روز می‌شوند"""
+        with transaction.atomic():
+            reaction = (
+                EmojiReaction.objects.select_for_update()
+                .filter(post_id=self.pk, user_id=user.pk)
+                .first()
+            )
+            if reaction is None:
+                # select_for_update روی ردیفی که هنوز وجود ندارد قفلی نمی‌گیرد؛ اگر درخواست
+                # همزمانی زودتر ثبت کرده باشد همان ردیف قفل و به‌روز می‌شود
+                try:
+                    with transaction.atomic():
+                        EmojiReaction.objects.create(post_id=self.pk, user_id=user.pk, emoji_type=emoji_type)
+                    return
+                except IntegrityError:
+                    reaction = EmojiReaction.objects.select_for_update().get(post_id=self.pk, user_id=user.pk)
+            if reaction.emoji_type != emoji_type:
+                reaction.emoji_type = emoji_type
+                reaction.save(update_fields=['emoji_type'])
+
+    def remove_emoji_reaction(self, user):
+        """حذف واکنش ایموجی کاربر؛ در صورت وجود واکنش True برمی‌گرداند"""
+        with transaction.atomic():
+            deleted, _ = EmojiReaction.objects.filter(post_id=self.pk, user_id=user.pk).delete()
+        return deleted > 0
+
+    # عملیات قابل ارسال به endpoint دسته‌ای واکنش‌ها
+    REACTION_ACTIONS = ('like', 'unlike', 'toggle_like', 'emoji', 'remove_emoji')
+
+    @classmethod
+    def apply_reactions(cls, user, operations):
+        """
+        اجرای دسته‌ای و به ترتیب عملیات لایک و واکنش کاربر در یک تراکنش.
+        هر عملیات در savepoint خودش اجرا می‌شود و خطای یک مورد بقیه را برنمی‌گرداند.
+        نتیجه هر عملیات و وضعیت نهایی پست‌های تغییر کرده برگردانده می‌شود.
+        """
+        post_ids = {
+            operation.get('post') for operation in operations
+            if isinstance(operation, dict) and type(operation.get('post')) is int
+        }
+        results, affected = [], set()
+        with transaction.atomic():
+            posts = cls.objects.only('pk').in_bulk(post_ids)
+            for operation in operations:
+                post_id = operation.get('post') if isinstance(operation, dict) else None
+                error = cls._reaction_error(operation, posts)
+                if error is None:
+                    try:
+                        cls._apply_reaction(posts[post_id], user, operation)
+                    except DatabaseError:
+                        error = 'خطای پایگاه داده'
+                if error is None:
+                    affected.add(post_id)
+                    results.append({'post': post_id, 'ok': True})
+                else:
+                    results.append({'post': post_id, 'ok': False, 'error': error})
+
+        # وضعیت نهایی پس از commit خوانده می‌شود تا تغییرهای write-behind همین دسته را هم شامل شود
+        posts = counters.apply_pending(cls.objects.filter(pk__in=affected).with_user_state(user))
+        states = {
+            post.pk: {
+                'likes_count': post.likes_count,
+                'is_liked': post.user_has_liked,
+                'user_emoji': post.user_emoji,
+                'emojis_summary': post.get_emojis_summary(),
+            }
+            for post in posts
+        }
+        return results, states
+
+    @staticmethod
+    def _reaction_error(operation, posts):
+        if not isinstance(operation, dict) or operation.get('action') not in Post_blog.REACTION_ACTIONS:
+            return 'عملیات نامعتبر'
+        if type(operation.get('post')) is not int or operation['post'] not in posts:
+            return 'پست یافت نشد'
+        if operation['action'] == 'emoji' and operation.get('emoji_type') not in dict(EmojiReaction.EMOJI_CHOICES):
+            return 'ایموجی نامعتبر'
         return None
 
+    @staticmethod
+    def _apply_reaction(post, user, operation):
+        action = operation['action']
+        if action == 'toggle_like':
+            post.toggle_like(user)
+        elif action in ('like', 'unlike'):
+            post.set_like(user, action == 'like')
+        elif action == 'emoji':
+            post.set_emoji_reaction(user, operation['emoji_type'])
+        else:
+            post.remove_emoji_reaction(user)
+
+    # نسخه‌های ناهمزمان برای ویوهای async. تراکنش‌ها و سیگنال‌ها در ORM ناهمزمان پشتیبانی
+    # نمی‌شوند، پس متدهای تراکنشی بالا به صورت کامل در thread همزمان جنگو اجرا می‌شوند.
+    async def atoggle_like(self, user):
+        return await sync_to_async(self.toggle_like)(user)
+
+    async def aset_emoji_reaction(self, user, emoji_type):
+        return await sync_to_async(self.set_emoji_reaction)(user, emoji_type)
+
+    async def aremove_emoji_reaction(self, user):
+        return await sync_to_async(self.remove_emoji_reaction)(user)
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def set_active(self, is_active):
+        """
+        فعال یا غیرفعال کردن دسته‌ای نظرات (مثلا از اکشن‌های ادمین) همراه با
+        به‌روزرسانی شمارنده نظرات پست‌های مربوط در همان تراکنش.
+        """
+        with transaction.atomic(using=self.db):
+            changing = self.exclude(is_active=is_active)
+            post_ids = set(changing.values_list('post_id', flat=True))
+            changed = changing.update(is_active=is_active)
+            if post_ids:
+                Post_blog.refresh_comments_count(post_ids)
+                for post_id in post_ids:
+                    transaction.on_commit(lambda post_id=post_id: bump_activity(post_id), using=self.db)
+        return changed
+
 
 class Comment(models.Model):
     """مدل برای نظرات پست‌ها"""
@@ -75,15 +360,34 @@ class Comment(models.Model):
     datetime_create = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
     datetime_modified = models.DateTimeField(auto_now=True, verbose_name='تاریخ ویرایش')
     is_active = models.BooleanField(default=True, verbose_name='فعال/غیرفعال')
+
+    objects = CommentQuerySet.as_manager()
     
     class Meta:
         ordering = ['datetime_create']
         verbose_name = 'نظر'
         verbose_name_plural = 'نظرات'
+        indexes = [
+            # ایندکس صفحه‌بندی cursor نظرات فعال هر پست
+            models.Index(fields=['post', 'is_active', '-datetime_create', '-id'], name='comment_post_active_idx'),
+        ]
 
     def __str__(self):
         return f'نظر {self.author} روی {self.post.title}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # وضعیت بارگذاری شده برای اصلاح شمارنده نظرات پست هنگام تغییر آن
+        if 'post_id' in field_names and 'is_active' in field_names:
+            instance._loaded_state = (instance.post_id, instance.is_active)
+        return instance
+
+    def save(self, *args, **kwargs):
+        # سیگنال post_save شمارنده نظرات پست را در همین تراکنش به‌روز می‌کند
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
 
 class EmojiReaction(models.Model):
     """مدل برای واکنش‌های ایموجی کاربران"""
@@ -107,4 +411,91 @@ class EmojiReaction(models.Model):
         verbose_name_plural = 'واکنش‌های ایموجی'
     
     def __str__(self):
-        return f'{self.user.username} - {self.get_emoji_type_display()} روی {self.post.title}'
\ No newline at end of file
+        return f'{self.user.username} - {self.get_emoji_type_display()} روی {self.post.title}'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # نگهداری نوع ایموجی بارگذاری شده برای اصلاح شمارنده‌ها هنگام تغییر آن
+        if 'emoji_type' in field_names:
+            instance._loaded_emoji_type = instance.emoji_type
+        return instance
+
+    def save(self, *args, **kwargs):
+        # سیگنال post_save شمارنده‌ها را به‌روز می‌کند؛ هر دو در یک تراکنش انجام می‌شوند
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class EmojiReactionCount(models.Model):
+    """شمارنده غیرنرمال‌شده تعداد هر ایموجی در هر پست"""
+    post = models.ForeignKey(Post_blog, on_delete=models.CASCADE, related_name='emoji_counts')
+    emoji_type = models.CharField(max_length=10, choices=EmojiReaction.EMOJI_CHOICES, verbose_name='نوع ایموجی')
+    count = models.PositiveIntegerField(default=0, verbose_name='تعداد')
+
+    class Meta:
+        unique_together = ['post', 'emoji_type']
+        verbose_name = 'شمارنده ایموجی'
+        verbose_name_plural = 'شمارنده‌های ایموجی'
+
+    def __str__(self):
+        return f'{self.get_emoji_type_display()} × {self.count} روی پست {self.post_id}'
+
+    @classmethod
+    def bump(cls, post_id, emoji_type, delta):
+        """افزایش یا کاهش اتمیک شمارنده یک ایموجی"""
+        counters = cls.objects.filter(post_id=post_id, emoji_type=emoji_type)
+        if delta < 0:
+            counters.filter(count__gte=-delta).update(count=F('count') + delta)
+            return
+        if counters.update(count=F('count') + delta):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(post_id=post_id, emoji_type=emoji_type, count=delta)
+        except IntegrityError:
+            # ردیف شمارنده همزمان توسط درخواست دیگری ساخته شده است
+            counters.update(count=F('count') + delta)
+
+    @classmethod
+    def rebuild(cls, post_ids=None, batch_size=1000, exclude=()):
+        """
+        ساخت مجدد شمارنده‌ها از روی جدول واکنش‌ها (به جز پست‌های exclude)؛ تعداد ردیف‌های
+        ساخته شده را برمی‌گرداند
+        """
+        reactions = EmojiReaction.objects.order_by().exclude(post_id__in=exclude)
+        counters = cls.objects.exclude(post_id__in=exclude)
+        if post_ids is not None:
+            reactions = reactions.filter(post_id__in=post_ids)
+            counters = counters.filter(post_id__in=post_ids)
+        totals = reactions.values('post_id', 'emoji_type').annotate(total=Count('pk'))
+        with transaction.atomic():
+            counters.delete()
+            created = cls.objects.bulk_create(
+                (
+                    cls(post_id=row['post_id'], emoji_type=row['emoji_type'], count=row['total'])
+                    for row in totals.iterator(chunk_size=batch_size)
+                ),
+                batch_size=batch_size,
+            )
+        return len(created)
+
+
+class ImportCheckpoint(models.Model):
+    """
+    پیشرفت دستور import_blog: هر دسته رکورد وارد شده همراه یک ردیف در همان تراکنش commit
+    می‌شود تا ورود قطع شده از همان جا ادامه پیدا کند (myblog/transfer.py)
+    """
+    export_id = models.CharField(max_length=64, db_index=True, verbose_name='شناسه خروجی')
+    line = models.PositiveBigIntegerField(verbose_name='آخرین خط وارد شده')
+    # نگاشت شناسه پست‌های فایل به شناسه‌های جدید برای پست‌های همین دسته
+    post_ids = models.JSONField(default=dict, blank=True)
+    finished = models.BooleanField(default=False, verbose_name='پایان ورود')
+    datetime_create = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
+
+    class Meta:
+        verbose_name = 'نقطه بازیابی ورود'
+        verbose_name_plural = 'نقاط بازیابی ورود'
+
+    def __str__(self):
+        return f'{self.export_id} تا خط {self.line}'
@@ -0,0 +1,163 @@
+"""
+کش کامل صفحات برای کاربران ناشناس.
+
+صفحات فهرست و جزئیات پست‌ها و صفحات نمایشی برای همه کاربران ناشناس یکسان هستند. پاسخ
+رندر شده آن‌ها با کلیدی از مسیر، query string (از جمله q و page)، زبان و
+PAGE_CACHE_VERSION در کش نگه داشته می‌شود و درخواست بعدی بدون کوئری‌های صفحه و رندر
+قالب پاسخ داده می‌شود.
+
+پاک شدن دقیق: هر ورودی نسخه فعالیت پست‌هایی را که نمایش داده است (depends_on) و برای
+صفحات فهرست نسخه ترکیب فهرست را همراه دارد. لایک، نظر، واکنش و ویرایش یک پست نسخه
+فعالیت همان پست را عوض می‌کند (signals.py)، پس فقط صفحه جزئیات آن و صفحات فهرستی که آن
+را نشان می‌دهند کهنه می‌شوند. ایجاد، حذف و ویرایش پست‌ها نسخه ترکیب و در نتیجه همه
+صفحات فهرست را عوض می‌کند.
+
+جلوگیری از هجوم: وقتی ورودی کهنه یا منقضی شده باشد فقط درخواستی که قفل بازسازی را با
+cache.add بگیرد صفحه را دوباره رندر می‌کند. بقیه تا PAGE_CACHE_STALE_SECONDS همان نسخه
+کهنه را می‌گیرند و اگر نسخه‌ای نباشد تا پایان بازسازی منتظر می‌مانند.
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.translation import get_language
+
+from .caching import ACTIVITY_KEY, LIST_STRUCTURE_KEY, activity_versions, list_structure_version
+from .prerender import is_anonymous
+
+PAGE_KEY = 'page:{}'
+LOCK_KEY = 'page-lock:{}'
+# وضعیت کش در هر پاسخ: hit، stale یا miss
+CACHE_HEADER = 'X-Page-Cache'
+
+# بازسازی‌ای که در این مدت تمام نشود قفل را نگه نمی‌دارد (ثانیه)
+LOCK_TIMEOUT = 30
+# حداکثر انتظار درخواست‌های همزمان برای صفحه‌ای که هیچ نسخه‌ای از آن در کش نیست
+WAIT_SECONDS = 5
+POLL_SECONDS = 0.05
+
+
+def page_key(request):
+    # ترتیب پارامترهای query string در کلید اثری ندارد
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    raw = f'{settings.PAGE_CACHE_VERSION}|{get_language()}|{request.scheme}://{request.get_host()}{request.path}?{query}'
+    return PAGE_KEY.format(hashlib.sha256(raw.encode()).hexdigest())
+
+
+def depends_on(request, post_ids, listing=False):
+    """
+    ثبت پست‌هایی که صفحه در حال ساخت نمایش می‌دهد (و برای صفحات فهرست وابستگی به ترکیب
+    فهرست)؛ خارج از ساخت نسخه کش کاری انجام نمی‌دهد.
+    """
+    if getattr(request, '_page_cache_build', False):
+        request._page_dependencies = (
+            activity_versions(post_ids),
+            list_structure_version() if listing else None,
+        )
+
+
+def _unchanged(posts, structure):
+    """آیا نسخه‌های ثبت شده هنوز نسخه فعلی هستند (یک get_many)"""
+    expected = {ACTIVITY_KEY.format(pk): version for pk, version in posts.items()}
+    if structure is not None:
+        expected[LIST_STRUCTURE_KEY] = structure
+    return not expected or cache.get_many(list(expected)) == expected
+
+
+def _is_current(entry):
+    if time.time() - entry['built'] > settings.PAGE_CACHE_TIMEOUT:
+        return False
+    return _unchanged(entry['posts'], entry['structure'])
+
+
+def _cacheable(response):
+    cache_control = response.get('Cache-Control', '')
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and 'private' not in cache_control
+        and 'no-store' not in cache_control
+    )
+
+
+def _response(entry, state):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    # نسخه کش شده فقط برای کاربران ناشناس (بدون کوکی نشست) است
+    patch_vary_headers(response, ('Cookie',))
+    response[CACHE_HEADER] = state
+    return response
+
+
+def _build(request, key, view, args, kwargs):
+    request._page_cache_build = True
+    request._page_dependencies = ({}, None)
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    posts, structure = request._page_dependencies
+    # نوشتنی که در حین رندر commit شده باشد یعنی صفحه ممکن است داده قدیمی داشته باشد
+    if _cacheable(response) and _unchanged(posts, structure):
+        entry = {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'posts': posts,
+            'structure': structure,
+            'built': time.time(),
+        }
+        cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT + settings.PAGE_CACHE_STALE_SECONDS)
+    patch_vary_headers(response, ('Cookie',))
+    response[CACHE_HEADER] = 'miss'
+    return response
+
+
+def _wait_for(key, lock_key):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        found = cache.get_many([key, lock_key])
+        if key in found or lock_key not in found:
+            return found.get(key)
+    return None
+
+
+def _cached_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.PAGE_CACHE_TIMEOUT
+        and is_anonymous(request)
+        # پیام‌های در انتظار (کوکی messages) باید در رندر همین درخواست نمایش داده شوند
+        and 'messages' not in request.COOKIES
+    )
+
+
+def anonymous_page_cache(view):
+    """کش کامل پاسخ GET/HEAD کاربران ناشناس؛ سایر درخواست‌ها بدون تغییر اجرا می‌شوند"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cached_request(request):
+            return view(request, *args, **kwargs)
+        key = page_key(request)
+        entry = cache.get(key)
+        if entry is not None and _is_current(entry):
+            return _response(entry, 'hit')
+
+        lock_key = LOCK_KEY.format(key)
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            # درخواست دیگری همین حالا این صفحه را بازسازی می‌کند
+            if entry is not None:
+                return _response(entry, 'stale')
+            entry = _wait_for(key, lock_key)
+            if entry is not None:
+                return _response(entry, 'hit')
+            return view(request, *args, **kwargs)
+        try:
+            return _build(request, key, view, args, kwargs)
+        finally:
+            cache.delete(lock_key)
+    return wrapper
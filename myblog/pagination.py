@@ -0,0 +1,93 @@
+"""
+صفحه‌بندی مبتنی بر cursor (keyset) روی (datetime_modified, id).
+
+به جای OFFSET که با عمیق‌تر شدن صفحه کندتر می‌شود، هر صفحه با شرط «قدیمی‌تر از
+آخرین پست صفحه قبل» خوانده می‌شود و به COUNT(*) هم نیازی ندارد. فیلد زمان قابل
+تغییر است (مثلا datetime_create برای نظرات).
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+ORDERING = ('-datetime_modified', '-id')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(obj, field='datetime_modified'):
+    raw = f'{getattr(obj, field).isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def keyset_page(queryset, cursor=None, page_size=6, field='datetime_modified'):
+    """
+    برگرداندن ردیف‌های صفحه بعد از cursor (به ترتیب نزولی field و id) و cursor
+    صفحه بعدی (در صورت نبودن صفحه بعد None).
+    """
+    queryset = queryset.order_by(f'-{field}', '-id')
+    if cursor:
+        moment, pk = decode_cursor(cursor)
+        # شرط lte اضافی به پایگاه داده اجازه می‌دهد مستقیما از ایندکس به محل cursor برود
+        queryset = queryset.filter(**{f'{field}__lte': moment}).filter(
+            Q(**{f'{field}__lt': moment}) | Q(**{field: moment, 'pk__lt': pk})
+        )
+    # یک ردیف اضافه خوانده می‌شود تا وجود صفحه بعد بدون COUNT مشخص شود
+    rows = list(queryset[:page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(rows[-1], field) if has_next else None
+    return rows, next_cursor
+
+
+def estimated_count(queryset):
+    """
+    تخمین ارزان تعداد ردیف‌های جدول مدل (بدون فیلتر)؛ در صورت نبود روش تخمین None.
+    PostgreSQL از آمار pg_class و SQLite از بزرگ‌ترین rowid استفاده می‌کند.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples پیش از اولین ANALYZE منفی است
+        return row[0] if row and row[0] >= 0 else None
+    if connection.vendor == 'sqlite':
+        return queryset.model._base_manager.using(queryset.db).aggregate(last=Max('pk'))['last'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    صفحه‌بند ادمین برای جدول‌های بزرگ: برای فهرست بدون فیلتر به جای COUNT(*) روی کل
+    جدول از تخمین پایگاه داده استفاده می‌کند (فقط وقتی تخمین از آستانه بزرگ‌تر باشد).
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
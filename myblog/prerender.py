@@ -0,0 +1,159 @@
+"""
+پیش‌رندر صفحات ثابت (صفحات نمایش کد و پروژه‌ها).
+
+ویوهایی که با static_page ثبت می‌شوند توسط دستور prerender_pages یک بار برای کاربر
+ناشناس رندر شده و همراه نسخه‌های gzip و brotli و ETag قوی در PRERENDER_ROOT ذخیره
+می‌شوند. درخواست کاربران ناشناس بدون هیچ کار قالب یا پایگاه داده از همین فایل‌ها
+پاسخ داده می‌شود و در صورت نبودن فایل‌ها ویو به روش عادی اجرا می‌شود.
+"""
+import gzip
+import hashlib
+import json
+import os
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli اختیاری است؛ بدون آن فقط نسخه gzip ساخته می‌شود
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+
+# نام url صفحه -> تابع اصلی ویو (بدون سرو پیش‌رندر)
+STATIC_PAGES = {}
+
+# انواع فشرده‌سازی به ترتیب اولویت: (نام در Accept-Encoding، پسوند فایل)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest_cache = {'mtime': None, 'pages': {}}
+
+
+def static_page(url_name):
+    """ثبت ویو به عنوان صفحه ثابت و سرو نسخه پیش‌رندر شده آن برای کاربران ناشناس"""
+    def decorator(view):
+        STATIC_PAGES[url_name] = view
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in ('GET', 'HEAD') and is_anonymous(request):
+                response = serve_prerendered(request, url_name)
+                if response is not None:
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def is_anonymous(request):
+    # بدون کوکی نشست کاربر قطعا ناشناس است و نیازی به خواندن نشست نیست
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return not request.user.is_authenticated
+
+
+def prerender_root():
+    return Path(settings.PRERENDER_ROOT)
+
+
+def load_manifest():
+    """خواندن manifest صفحات پیش‌رندر شده؛ فقط در صورت تغییر فایل دوباره خوانده می‌شود"""
+    path = prerender_root() / MANIFEST_NAME
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _manifest_cache['mtime'] != mtime:
+        with open(path, encoding='utf-8') as manifest:
+            pages = json.load(manifest)
+        for entry in pages.values():
+            # محتوای فایل‌ها یک بار در حافظه هر worker نگهداری می‌شود
+            entry['bodies'] = {}
+            for encoding, filename in entry['files'].items():
+                entry['bodies'][encoding] = (prerender_root() / filename).read_bytes()
+        _manifest_cache.update(mtime=mtime, pages=pages)
+    return _manifest_cache['pages']
+
+
+def accepted_encodings(request):
+    """کدگذاری‌های قابل قبول کلاینت از هدر Accept-Encoding (به جز موارد با q=0)"""
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.partition(';')
+        quality = params.strip().removeprefix('q=')
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def serve_prerendered(request, url_name):
+    entry = load_manifest().get(url_name)
+    if entry is None:
+        return None
+
+    accepted = accepted_encodings(request)
+    encoding = next(
+        (name for name, _ in ENCODINGS if name in accepted and name in entry['bodies']),
+        'identity',
+    )
+    etag = entry['etags'][encoding]
+
+    if_none_match = parse_if_none_match(request)
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['bodies'][encoding], content_type='text/html; charset=utf-8')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+    return response
+
+
+def parse_if_none_match(request):
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return {tag.strip().removeprefix('W/') for tag in header.split(',') if tag.strip()}
+
+
+def write_page(url_name, html):
+    """ذخیره HTML یک صفحه و نسخه‌های فشرده آن؛ ورودی manifest برگردانده می‌شود"""
+    root = prerender_root()
+    digest = hashlib.sha256(html).hexdigest()[:32]
+    variants = {'identity': html, 'gzip': gzip.compress(html, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(html, mode=brotli.MODE_TEXT)
+
+    suffixes = dict(ENCODINGS)
+    entry = {'files': {}, 'etags': {}, 'size': {}}
+    for encoding, body in variants.items():
+        filename = f'{url_name}.html{suffixes.get(encoding, "")}'
+        _atomic_write(root / filename, body)
+        entry['files'][encoding] = filename
+        # ETag قوی برای هر نمایش (representation) متفاوت است
+        entry['etags'][encoding] = f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+        entry['size'][encoding] = len(body)
+    return entry
+
+
+def write_manifest(pages):
+    _atomic_write(
+        prerender_root() / MANIFEST_NAME,
+        json.dumps(pages, ensure_ascii=False, indent=2).encode('utf-8'),
+    )
+
+
+def _atomic_write(path, data):
+    # نوشتن در فایل موقت و جایگزینی، تا worker در حال اجرا فایل نیمه‌کاره نخواند
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    temporary.write_bytes(data)
+    os.replace(temporary, path)
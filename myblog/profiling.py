@@ -0,0 +1,208 @@
+"""
+پروفایل درخواست به درخواست برای کاربران staff.
+
+درخواستی که پارامتر ?_profile یا هدر X-Profile داشته باشد و کاربر آن staff باشد با
+cProfile اجرا می‌شود و نتیجه (فایل pstats، قابل باز کردن با snakeviz یا pstats) در
+PROFILE_ROOT ذخیره می‌شود. نام فایل در هدر X-Profile-Id پاسخ برگردانده می‌شود. برای
+بقیه درخواست‌ها فقط وجود پارامتر و هدر بررسی می‌شود.
+
+در هر پردازه فقط یک درخواست در یک زمان پروفایل می‌شود؛ درخواست staff دیگری که در این
+مدت ?_profile داشته باشد بدون پروفایل اجرا می‌شود. از پایتون 3.12 cProfile با
+sys.monitoring همه threadها را می‌بیند و فقط یک پروفایلر در کل مفسر می‌تواند فعال باشد،
+پس یک پروفایلر کافی است. در نسخه‌های قبلی پروفایلر فقط thread خودش را می‌بیند؛ زیر ASGI
+ویوهای همزمان در thread جداگانه اجرا می‌شوند، به همین دلیل یک پروفایلر در thread حلقه
+رویداد و یکی در thread همزمان همان درخواست فعال و نتیجه آن‌ها ادغام می‌شود. در حالت
+ASGI پروفایل ممکن است کارهای درخواست‌های دیگر همان worker را هم شامل شود.
+"""
+import cProfile
+import io
+import pstats
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.text import slugify
+
+from .metrics import view_name
+
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+# فقط فایل‌هایی که همین ماژول ساخته است قابل دانلود هستند
+PROFILE_NAME = re.compile(r'^[\w.-]+\.prof$')
+
+# ترتیب‌های قابل انتخاب در خلاصه متنی پروفایل
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+# از 3.12 یک پروفایلر همه threadها را می‌بیند و پروفایلر دوم قابل فعال شدن نیست
+SINGLE_PROFILER = sys.version_info >= (3, 12)
+
+# درخواست‌های پروفایل شده هر پردازه یکی یکی اجرا می‌شوند
+_profile_lock = threading.Lock()
+
+
+def profile_root():
+    return Path(settings.PROFILE_ROOT)
+
+
+def _requested(request):
+    return PROFILE_QUERY_PARAM in request.GET or PROFILE_HEADER in request.META
+
+
+def _allowed(user):
+    return user.is_active and user.is_staff
+
+
+def save_profile(request, stats, elapsed):
+    """ذخیره نتیجه پروفایل و حذف پروفایل‌های قدیمی‌تر از PROFILE_KEEP؛ نام فایل برگردانده می‌شود"""
+    root = profile_root()
+    root.mkdir(parents=True, exist_ok=True)
+    label = slugify(view_name(request).replace(':', '-')) or 'request'
+    name = f'{datetime.now():%Y%m%d-%H%M%S-%f}-{label}-{round(elapsed * 1000)}ms.prof'
+    stats.dump_stats(root / name)
+    for old in list_profiles()[settings.PROFILE_KEEP:]:
+        (root / old['name']).unlink(missing_ok=True)
+    return name
+
+
+def list_profiles():
+    root = profile_root()
+    if not root.is_dir():
+        return []
+    profiles = []
+    for path in root.iterdir():
+        if PROFILE_NAME.match(path.name):
+            stat = path.stat()
+            profiles.append({
+                'name': path.name,
+                'size': stat.st_size,
+                'created': datetime.fromtimestamp(stat.st_mtime),
+            })
+    return sorted(profiles, key=lambda profile: profile['name'], reverse=True)
+
+
+def _finish(request, response, profilers, started):
+    stats = pstats.Stats(*profilers)
+    response['X-Profile-Id'] = save_profile(request, stats, time.perf_counter() - started)
+    return response
+
+
+@sync_and_async_middleware
+def profiling_middleware(get_response):
+    """اجرای درخواست‌های staff دارای ?_profile یا X-Profile زیر cProfile (بعد از AuthenticationMiddleware)"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not _requested(request) or not _allowed(await request.auser()):
+                return await get_response(request)
+            if not _profile_lock.acquire(blocking=False):
+                # درخواست پروفایل شده دیگری همین حالا در این پردازه اجرا می‌شود
+                return await get_response(request)
+            profilers = []
+            try:
+                try:
+                    await _enable(profilers)
+                except BaseException as error:
+                    await _disable(profilers)
+                    if not isinstance(error, ValueError):
+                        raise
+                    # ابزار پروفایل دیگری (مثلا coverage یا debugger) فعال است
+                    return await get_response(request)
+                started = time.perf_counter()
+                try:
+                    response = await get_response(request)
+                finally:
+                    await _disable(profilers)
+            finally:
+                _profile_lock.release()
+            return _finish(request, response, profilers, started)
+    else:
+        def middleware(request):
+            if not _requested(request) or not _allowed(request.user):
+                return get_response(request)
+            if not _profile_lock.acquire(blocking=False):
+                return get_response(request)
+            try:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    return get_response(request)
+                started = time.perf_counter()
+                try:
+                    response = get_response(request)
+                finally:
+                    profiler.disable()
+            finally:
+                _profile_lock.release()
+            return _finish(request, response, [profiler], started)
+    return middleware
+
+
+async def _enable(profilers):
+    """فعال کردن پروفایلرها؛ هر پروفایلر فقط پس از فعال شدن به profilers اضافه می‌شود"""
+    loop_profiler = cProfile.Profile()
+    loop_profiler.enable()
+    profilers.append(loop_profiler)
+    if not SINGLE_PROFILER:
+        # thread همزمان این درخواست همان threadی است که ویوهای همزمان در آن اجرا می‌شوند
+        thread_profiler = cProfile.Profile()
+        await sync_to_async(thread_profiler.enable)()
+        profilers.append(thread_profiler)
+
+
+async def _disable(profilers):
+    """غیرفعال کردن پروفایلرهای فعال شده؛ پروفایلر thread همزمان در همان thread"""
+    if profilers:
+        profilers[0].disable()
+    for profiler in profilers[1:]:
+        await sync_to_async(profiler.disable)()
+
+
+def profiles_view(request):
+    """فهرست پروفایل‌های اخیر در ادمین"""
+    context = {
+        **admin.site.each_context(request),
+        'title': 'پروفایل درخواست‌ها',
+        'profiles': list_profiles(),
+        'query_param': PROFILE_QUERY_PARAM,
+    }
+    return TemplateResponse(request, 'admin/request_profiles.html', context)
+
+
+def _profile_path(name):
+    path = profile_root() / name
+    if not PROFILE_NAME.match(name) or not path.is_file():
+        raise Http404
+    return path
+
+
+def profile_download_view(request, name):
+    return FileResponse(_profile_path(name).open('rb'), as_attachment=True, filename=name)
+
+
+def profile_summary_view(request, name):
+    """پرهزینه‌ترین توابع پروفایل بر اساس زمان تجمعی به صورت متن"""
+    output = io.StringIO()
+    stats = pstats.Stats(str(_profile_path(name)), stream=output)
+    sort = request.GET.get('sort')
+    if sort not in SORT_KEYS:
+        sort = SORT_KEYS[0]
+    stats.strip_dirs().sort_stats(sort).print_stats(60)
+    context = {
+        **admin.site.each_context(request),
+        'title': name,
+        'name': name,
+        'summary': output.getvalue(),
+        'sort': sort,
+        'sort_keys': SORT_KEYS,
+    }
+    return TemplateResponse(request, 'admin/request_profile_summary.html', context)
@@ -0,0 +1,216 @@
+"""
+Service Worker سایت که از manifest دستور collectstatic ساخته می‌شود.
+
+فهرست precache از نام‌های hash دار فایل‌های استاتیک (manifest.json انبار
+CompressedManifestStaticFilesStorage) ساخته می‌شود؛ هر تغییر در محتوای یک فایل نام آن
+را عوض می‌کند. نسخه sw.js هم hash همین فهرست است، پس مرورگر فقط وقتی Service Worker
+جدید نصب می‌کند که چیزی واقعا تغییر کرده باشد و در نصب فقط فایل‌های جدید را دانلود
+می‌کند. بدون manifest (توسعه محلی و تست‌ها) hash محتوای فایل‌ها به صورت ?v= به آدرس
+اضافه می‌شود.
+
+فید آفلاین (offline_feed_view) OFFLINE_FEED_SIZE پست اخیر را با HTML رندر شده و
+آدرس تصویر کوچک برمی‌گرداند تا Service Worker آن‌ها را برای خواندن بدون اینترنت نگه
+دارد. کلاینت نسخه قبلی را در ?since= می‌فرستد و فقط پست‌های جدید یا ویرایش شده و
+شناسه پست‌های حذف شده از فید را دریافت می‌کند.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.template.response import TemplateResponse
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .caching import list_structure_version
+from .conditional import _make_etag
+from .models import Post_blog
+from .pagination import ORDERING
+
+# فقط فایل‌هایی که صفحات سایت لازم دارند؛ فایل‌های ادمین و source map ها precache نمی‌شوند
+PRECACHE_EXTENSIONS = ('.css', '.js', '.ico', '.png', '.jpg', '.jpeg', '.svg', '.webp', '.woff', '.woff2')
+PRECACHE_EXCLUDE_PREFIXES = ('admin/',)
+
+
+def uncached_pages():
+    """
+    الگوی مسیر صفحاتی که Service Worker هرگز ذخیره نمی‌کند: حساب کاربری، ادمین و فرم‌های
+    ایجاد، ویرایش و حذف پست
+    """
+    prefixes = [reverse('login').rsplit('/', 2)[0] + '/', reverse('admin:index'), reverse('post_create')]
+    patterns = ['^' + re.escape(prefix) for prefix in prefixes]
+    for name in ('post_update', 'post_delete'):
+        patterns.append('^' + re.escape(reverse(name, args=[0])).replace('/0/', r'/\d+/') + '$')
+    return patterns
+
+
+def _precached(name):
+    return name.endswith(PRECACHE_EXTENSIONS) and not name.startswith(PRECACHE_EXCLUDE_PREFIXES)
+
+
+def _manifest_urls():
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', None)
+    if not hashed_files:
+        return None
+    return [staticfiles_storage.url(name) for name in sorted(hashed_files) if _precached(name)]
+
+
+def _finder_urls():
+    # بدون collectstatic فایل‌ها مستقیما از finderها خوانده و hash می‌شوند
+    urls = {}
+    for finder in finders.get_finders():
+        for name, storage in finder.list([]):
+            name = name.replace('\\', '/')
+            if name in urls or not _precached(name):
+                continue
+            with storage.open(name) as file:
+                digest = hashlib.md5(file.read(), usedforsecurity=False).hexdigest()[:12]
+            urls[name] = f'{static(name)}?v={digest}'
+    return [urls[name] for name in sorted(urls)]
+
+
+def precache_manifest():
+    """فهرست آدرس‌های precache و نسخه آن‌ها؛ هر آدرس با تغییر محتوا عوض می‌شود"""
+    urls = _manifest_urls()
+    if urls is None:
+        urls = _finder_urls()
+    # صفحه آفلاین با نسخه قالب‌ها (PAGE_CACHE_VERSION) تازه می‌شود
+    offline_url = f"{reverse('offline')}?v={settings.PAGE_CACHE_VERSION}"
+    urls.append(offline_url)
+    version = hashlib.sha256('\n'.join(urls).encode()).hexdigest()[:16]
+    return {'version': version, 'urls': urls, 'offline_url': offline_url}
+
+
+def _cached_manifest(request):
+    # condition و خود ویو هر دو به manifest نیاز دارند؛ یک بار برای هر درخواست ساخته می‌شود
+    if not hasattr(request, '_precache_manifest'):
+        request._precache_manifest = precache_manifest()
+    return request._precache_manifest
+
+
+def _service_worker_etag(request):
+    return _cached_manifest(request)['version']
+
+
+@condition(etag_func=_service_worker_etag)
+def service_worker_view(request):
+    """sw.js از ریشه سایت سرو می‌شود تا scope آن کل سایت باشد"""
+    manifest = _cached_manifest(request)
+    context = {
+        'version': manifest['version'],
+        'precache_urls': json.dumps(manifest['urls'], indent=4),
+        'offline_url': json.dumps(manifest['offline_url']),
+        'offline_feed_url': json.dumps(reverse('offline_feed')),
+        'uncached_pages': json.dumps(uncached_pages()),
+        'media_url': json.dumps(settings.MEDIA_URL),
+        'static_url': json.dumps(settings.STATIC_URL),
+    }
+    response = TemplateResponse(request, 'sw.js', context, content_type='application/javascript')
+    # مرورگر هر بار نسخه sw.js را با ETag بررسی می‌کند
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def encode_feed_version(modified, ids):
+    """
+    نسخه فید: نسخه قالب‌ها، زمان آخرین ویرایش و شناسه پست‌های فید. برای فید بدون تغییر
+    همیشه همان مقدار ساخته می‌شود.
+    """
+    raw = f"{settings.PAGE_CACHE_VERSION}|{modified}|{','.join(map(str, ids))}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_feed_version(version):
+    """(زمان آخرین ویرایش، شناسه‌ها) یا None برای نسخه نامعتبر یا نسخه قالب قدیمی"""
+    try:
+        padded = version + '=' * (-len(version) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        page_version, modified, ids = raw.rsplit('|', 2)
+        ids = {int(pk) for pk in ids.split(',') if pk}
+        modified = int(modified)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if page_version != settings.PAGE_CACHE_VERSION:
+        return None
+    return modified, ids
+
+
+def _timestamp(moment):
+    return int(moment.timestamp() * 1_000_000)
+
+
+def _thumbnail_url(post):
+    if not post.image:
+        return None
+    variant = (post.image_variants or {}).get('thumb')
+    if variant:
+        return post.image.storage.url(variant['webp'])
+    return post.image.url
+
+
+def _feed_entry(post, request):
+    return {
+        'id': post.pk,
+        'title': post.title,
+        'url': post.get_absolute_url(),
+        'author': post.author.get_full_name() or post.author.username,
+        'modified': post.datetime_modified.isoformat(),
+        'thumbnail': _thumbnail_url(post),
+        'html': render_to_string('myblog/_offline_post.html', {'post': post}, request=request),
+    }
+
+
+def offline_feed(request, since=None):
+    """
+    پست‌های اخیر فید آفلاین. با since معتبر فقط پست‌هایی که کلاینت ندارد یا پس از آن
+    ویرایش شده‌اند کامل خوانده و رندر می‌شوند؛ در غیر این صورت reset یعنی کلاینت باید
+    همه پست‌های قبلی را دور بریزد.
+    """
+    recent = list(
+        Post_blog.objects.filter(status='pub')
+        .order_by(*ORDERING)
+        .values_list('pk', 'datetime_modified')[:settings.OFFLINE_FEED_SIZE]
+    )
+    ids = [pk for pk, _ in recent]
+    latest = max((_timestamp(modified) for _, modified in recent), default=0)
+    previous = decode_feed_version(since) if since else None
+    if previous is None:
+        changed, removed = ids, []
+    else:
+        modified_since, known = previous
+        changed = [pk for pk, modified in recent if pk not in known or _timestamp(modified) > modified_since]
+        removed = sorted(known.difference(ids))
+
+    posts = []
+    if changed:
+        rows = Post_blog.objects.filter(pk__in=changed).select_related('author').in_bulk()
+        posts = [_feed_entry(rows[pk], request) for pk in changed if pk in rows]
+    return {
+        'version': encode_feed_version(latest, ids),
+        'reset': previous is None,
+        'ids': ids,
+        'posts': posts,
+        'removed': removed,
+    }
+
+
+def _offline_feed_etag(request):
+    # فقط انتشار، ویرایش و حذف پست‌ها نسخه ترکیب فهرست را عوض می‌کنند (لایک و نظر نه)، پس
+    # درخواست تکراری در سایت پرترافیک هم بدون کوئری 304 می‌گیرد
+    return _make_etag('offline-feed', list_structure_version(), request.GET.get('since', ''))
+
+
+@condition(etag_func=_offline_feed_etag)
+def offline_feed_view(request):
+    """فید JSON پست‌های اخیر برای خواندن آفلاین (با ?since= فقط تغییرات)"""
+    response = JsonResponse(offline_feed(request, request.GET.get('since')))
+    patch_cache_control(response, public=True, max_age=0)
+    return response
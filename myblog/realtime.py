@@ -0,0 +1,274 @@
+"""
+شمارنده‌های زنده لایک، واکنش‌ها و نظرات پست‌ها با Server-Sent Events.
+
+مسیرهای نوشتن (لایک، سیگنال‌های واکنش و نظر) پس از commit تغییر شمارنده‌ها را با
+publish_counts به broker می‌دهند. broker هر رویداد را یک بار به متن SSE تبدیل می‌کند و
+همان متن را در صف همه اتصال‌های باز آن پست می‌گذارد؛ هیچ اتصالی برای رویدادها کوئری
+اجرا نمی‌کند. backend مشخص می‌کند رویداد چطور به workerهای دیگر برسد: LocalBackend فقط
+همین پردازه و RedisBackend با PUBLISH/PSUBSCRIBE همه workerها.
+
+هر اتصال بلافاصله پس از subscribe یک snapshot از شمارنده‌های فعلی می‌گیرد (دو کوئری
+برای هر اتصال و هیچ کوئری برای رویدادها)، چون تغییرهای بین رندر صفحه (یا قطع اتصال
+قبلی) و subscribe رویدادی برای این اتصال ندارند. اتصالی که صفش پر شود هم دوباره
+snapshot می‌گیرد. هر stream پس از REALTIME_STREAM_SECONDS بسته
+می‌شود و EventSource خودش دوباره وصل می‌شود.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# حداکثر تعداد پست‌های یک stream (کارت‌های صفحه فهرست)
+MAX_STREAM_POSTS = 50
+# رویدادهای در صف هر اتصال؛ اتصال کندتر از این snapshot می‌گیرد
+QUEUE_SIZE = 100
+# فاصله پیام‌های keepalive تا پراکسی‌ها اتصال بی‌کار را نبندند (ثانیه)
+KEEPALIVE_SECONDS = 15
+# فاصله اتصال مجدد EventSource (میلی‌ثانیه)
+RETRY_MS = 3000
+
+REDIS_CHANNEL_PREFIX = 'myblog:events:'
+
+
+def post_channel(post_id):
+    return f'post:{post_id}'
+
+
+class Subscription:
+    """صف رویدادهای یک اتصال SSE روی حلقه رویداد همان اتصال"""
+
+    def __init__(self, channels):
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.lagged = False
+
+    def put(self, chunk):
+        try:
+            self.queue.put_nowait(chunk)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+    def drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.lagged = False
+
+
+class Broker:
+    """پخش رویدادها بین اتصال‌های باز همین پردازه؛ انتقال بین workerها با backend است"""
+
+    def __init__(self, backend_class):
+        self.backend = backend_class(self)
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._event_ids = itertools.count(1)
+
+    async def subscribe(self, channels):
+        subscription = Subscription(channels)
+        with self._lock:
+            for channel in channels:
+                self._subscribers[channel].add(subscription)
+        await self.backend.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, channel, event):
+        """ارسال رویداد از هر thread (معمولا در on_commit مسیرهای نوشتن)"""
+        self.backend.publish(channel, json.dumps(event, separators=(',', ':')))
+
+    def deliver(self, channel, payload):
+        """رساندن رویداد دریافتی از backend به همه اتصال‌های باز کانال"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        if not subscribers:
+            return
+        chunk = sse_event('counts', payload, next(self._event_ids))
+        # برای هر حلقه رویداد فقط یک callback؛ صف‌ها روی همان حلقه پر می‌شوند
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_put_all, group, chunk)
+            except RuntimeError:
+                # حلقه بسته شده است (پایان تست یا خاموش شدن worker)
+                pass
+
+
+def _put_all(subscriptions, chunk):
+    for subscription in subscriptions:
+        subscription.put(chunk)
+
+
+class LocalBackend:
+    """رویدادها فقط به اتصال‌های همین پردازه می‌رسند (توسعه محلی و یک worker)"""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def start(self):
+        pass
+
+    def publish(self, channel, payload):
+        self.broker.deliver(channel, payload)
+
+
+class RedisBackend:
+    """
+    انتشار رویدادها در Redis. هر worker یک اتصال PSUBSCRIBE دارد که با اولین stream
+    همان worker ساخته می‌شود و رویدادها را به اتصال‌های خودش می‌رساند. رویدادهای زمان
+    قطع بودن Redis از دست می‌روند و با snapshot اتصال مجدد بعدی جبران می‌شوند.
+    """
+
+    def __init__(self, broker):
+        import redis
+
+        self.broker = broker
+        self.url = settings.REDIS_URL
+        self.client = redis.Redis.from_url(self.url)
+        self._listener = None
+
+    async def start(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        from redis import asyncio as aioredis
+
+        prefix = len(REDIS_CHANNEL_PREFIX)
+        while True:
+            try:
+                async with aioredis.Redis.from_url(self.url) as client, client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f'{REDIS_CHANNEL_PREFIX}*')
+                    async for message in pubsub.listen():
+                        if message['type'] == 'pmessage':
+                            self.broker.deliver(message['channel'].decode()[prefix:], message['data'].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Realtime Redis subscription failed; reconnecting')
+                await asyncio.sleep(1)
+
+    def publish(self, channel, payload):
+        try:
+            self.client.publish(f'{REDIS_CHANNEL_PREFIX}{channel}', payload)
+        except Exception:
+            # از دست رفتن یک رویداد نباید درخواست نوشتن را با خطا مواجه کند
+            logger.exception('Realtime event publish failed')
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = Broker(import_string(settings.REALTIME_BACKEND))
+    return _broker
+
+
+def publish_counts(post_id, using=None, **deltas):
+    """
+    ارسال تغییر شمارنده‌های پست (likes، comments یا emoji به صورت {نوع: تغییر} و در صورت
+    معلوم بودن likes_total) پس از commit تراکنش جاری؛ اگر تراکنش برگردانده شود چیزی
+    ارسال نمی‌شود.
+    """
+    event = {'post': post_id, **deltas}
+    transaction.on_commit(
+        lambda: get_broker().publish(post_channel(post_id), event), using=using, robust=True,
+    )
+
+
+def sse_event(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {data}']
+    return '\n'.join(lines) + '\n\n'
+
+
+async def snapshot(post_ids):
+    """شمارنده‌های فعلی پست‌ها برای شروع اتصال و اتصال‌هایی که رویدادی را از دست داده‌اند"""
+    # models همین ماژول را برای publish_counts وارد می‌کند
+    from .counters import apending, merge_emoji
+    from .models import EmojiReactionCount, Post_blog
+
+    posts = {
+        pk: {'post': pk, 'likes': likes, 'comments': comments, 'emoji': {}}
+        async for pk, likes, comments in Post_blog.objects.filter(pk__in=post_ids).values_list(
+            'pk', 'likes_count', 'comments_count',
+        )
+    }
+    async for post_id, emoji_type, count in EmojiReactionCount.objects.filter(
+        post_id__in=list(posts), count__gt=0,
+    ).values_list('post_id', 'emoji_type', 'count'):
+        posts[post_id]['emoji'][emoji_type] = count
+    # تغییرهای flush نشده شمارنده‌ها در حالت write-behind
+    for post_id, changes in (await apending(list(posts))).items():
+        posts[post_id]['likes'] = max(0, posts[post_id]['likes'] + changes['likes'])
+        merge_emoji(posts[post_id]['emoji'], changes)
+    return sse_event('snapshot', json.dumps(list(posts.values()), separators=(',', ':')))
+
+
+async def event_stream(post_ids):
+    broker = get_broker()
+    subscription = await broker.subscribe([post_channel(pk) for pk in post_ids])
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.REALTIME_STREAM_SECONDS
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        # snapshot بعد از subscribe است تا هیچ تغییری بین این دو گم نشود
+        yield await snapshot(post_ids)
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                chunk = await asyncio.wait_for(subscription.queue.get(), min(KEEPALIVE_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if subscription.lagged:
+                subscription.drain()
+                yield await snapshot(post_ids)
+                continue
+            yield chunk
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def _post_ids(value):
+    try:
+        ids = list(dict.fromkeys(int(pk) for pk in value.split(',') if pk))
+    except ValueError:
+        return None
+    if not ids or len(ids) > MAX_STREAM_POSTS:
+        return None
+    return ids
+
+
+async def post_events_view(request):
+    """stream رویدادهای شمارنده پست‌های ?ids=1,2,3 (صفحه جزئیات یا کارت‌های صفحه فهرست)"""
+    post_ids = _post_ids(request.GET.get('ids', ''))
+    if post_ids is None:
+        return HttpResponseBadRequest('ids نامعتبر')
+    response = StreamingHttpResponse(event_stream(post_ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx و پراکسی‌های مشابه پاسخ را بافر نکنند
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,68 @@
+"""
+مسیریابی پایگاه داده بین سرور اصلی (primary) و رپلیکاهای فقط‌خواندنی.
+
+خواندن‌ها به یکی از REPLICA_DATABASES و همه نوشتن‌ها به default می‌روند. خواندن در
+این حالت‌ها به default برمی‌گردد تا کاربر نوشته خودش را ببیند:
+  - درخواست‌هایی که پس از یک نوشتن (مثلا لایک یا نظر) در بازه REPLICA_PIN_SECONDS
+    ارسال شده‌اند (middleware کوکی کوتاه‌مدت می‌گذارد)،
+  - خود درخواست نوشتن (POST و ...) و کدهایی که داخل use_primary اجرا می‌شوند،
+  - خواندن داخل تراکنش باز روی default (مثلا select_for_update و سیگنال‌ها).
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# True یعنی خواندن‌های این درخواست/thread از پایگاه داده اصلی انجام شود
+_pinned = ContextVar('replica_pinned', default=False)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def pin_to_primary():
+    """خواندن‌های باقی‌مانده همین context به default می‌روند؛ توکن برای reset برگردانده می‌شود"""
+    return _pinned.set(True)
+
+
+def unpin(token):
+    _pinned.reset(token)
+
+
+@contextmanager
+def use_primary():
+    token = pin_to_primary()
+    try:
+        yield
+    finally:
+        unpin(token)
+
+
+class PrimaryReplicaRouter:
+    def _replicas(self):
+        return getattr(settings, 'REPLICA_DATABASES', ())
+
+    def db_for_read(self, model, **hints):
+        replicas = self._replicas()
+        if not replicas or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # همه aliasها نسخه‌ای از یک پایگاه داده هستند
+        databases = {DEFAULT_DB_ALIAS, *self._replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # جدول‌های رپلیکا از طریق replication از primary ساخته می‌شوند
+        if db in self._replicas():
+            return False
+        return None
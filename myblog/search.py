@@ -0,0 +1,423 @@
+"""
+موتور جستجوی متن کامل پست‌ها.
+
+بک‌اند بر اساس پایگاه داده انتخاب می‌شود: FTS5 برای SQLite و tsvector + GIN برای
+PostgreSQL. در هر دو حالت یک جدول ایندکس جداگانه با متن نرمال‌شده نگهداری می‌شود
+که با ذخیره و حذف هر پست به‌روز می‌شود. اگر هیچ‌کدام در دسترس نباشد جستجوی
+icontains قبلی استفاده می‌شود.
+
+متن نرمال‌شده فقط برای تطبیق است. snippet نتایج از متن اصلی پست ساخته می‌شود: متن
+حرف به حرف نرمال می‌شود و محل کلمات یافت شده به محل همان حروف در متن اصلی برگردانده
+می‌شود، پس خواننده حروف بزرگ، نیم‌فاصله و اعراب متن را همان‌طور که نوشته شده می‌بیند.
+"""
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+INDEX_TABLE = 'myblog_post_search'
+
+# نشانگرهای موقت ابتدا و انتهای عبارت یافت شده در snippet (قبل از escape کردن HTML)
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_CHARACTER_MAP = str.maketrans({
+    'ي': 'ی',  # ی عربی
+    'ى': 'ی',  # الف مقصوره
+    'ئ': 'ی',
+    'ك': 'ک',  # ک عربی
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'ٱ': 'ا',
+    '‌': '',  # نیم‌فاصله (ZWNJ)
+    '‍': '',  # ZWJ
+    'ـ': '',  # کشیده (تطویل)
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},  # ارقام فارسی
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # ارقام عربی
+})
+
+_WORD_RE = re.compile(r'\w+')
+
+# طول تقریبی snippet و فاصله شروع آن قبل از اولین کلمه یافت شده (کاراکتر)
+SNIPPET_LENGTH = 160
+SNIPPET_CONTEXT = 40
+
+
+def normalize_text(text):
+    """
+    نرمال‌سازی متن فارسی برای ایندکس و جستجو: یکسان‌سازی ی و ک عربی و فارسی،
+    حذف نیم‌فاصله و کشیده، حذف اعراب و تبدیل ارقام فارسی و عربی به لاتین.
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text).translate(_CHARACTER_MAP)
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    return text.casefold()
+
+
+def query_terms(query):
+    """تقسیم عبارت جستجو به کلمات نرمال‌شده"""
+    return _WORD_RE.findall(normalize_text(query))
+
+
+@lru_cache(maxsize=4096)
+def _normalize_char(char):
+    return normalize_text(char)
+
+
+def _normalized_with_offsets(text):
+    """متن نرمال‌شده و محل هر حرف آن در متن اصلی"""
+    chars, offsets = [], []
+    for index, char in enumerate(text):
+        normalized = _normalize_char(char)
+        chars.append(normalized)
+        offsets.extend([index] * len(normalized))
+    return ''.join(chars), offsets
+
+
+def _match_end(text, position):
+    # اعراب و نیم‌فاصله بعد از آخرین حرف کلمه هم جزو همان کلمه هایلایت می‌شوند
+    while position < len(text) and not _normalize_char(text[position]):
+        position += 1
+    return position
+
+
+def _boundary(text, position, forward):
+    """نزدیک‌ترین فاصله بین کلمات تا snippet کلمه‌ای را نصفه نبرد"""
+    if forward:
+        found = text.find(' ', position)
+        return len(text) if found == -1 else found
+    found = text.rfind(' ', 0, position)
+    return 0 if found == -1 else found + 1
+
+
+def build_snippet(text, terms):
+    """
+    بخشی از متن اصلی اطراف اولین کلمه یافت شده با نشانگر کلماتی که با یکی از terms
+    (نرمال‌شده) شروع می‌شوند؛ خروجی هنوز escape نشده است
+    """
+    # متن NFC از نظر ظاهری همان متن اصلی است و حروف ترکیبی آن یک کاراکتر هستند
+    text = unicodedata.normalize('NFC', text or '')
+    normalized, offsets = _normalized_with_offsets(text)
+    pattern = re.compile(r'(?<!\w)(?:' + '|'.join(map(re.escape, terms)) + r')\w*')
+    matches = [
+        (offsets[match.start()], _match_end(text, offsets[match.end() - 1] + 1))
+        for match in pattern.finditer(normalized) if match.end() > match.start()
+    ] if terms else []
+
+    start = _boundary(text, matches[0][0] - SNIPPET_CONTEXT, False) if matches and matches[0][0] > SNIPPET_CONTEXT else 0
+    end = _boundary(text, start + SNIPPET_LENGTH, True) if start + SNIPPET_LENGTH < len(text) else len(text)
+    parts, position = [], start
+    for match_start, match_end in matches:
+        if match_start < position or match_end > end:
+            continue
+        parts += [text[position:match_start], _MARK_START, text[match_start:match_end], _MARK_END]
+        position = match_end
+    parts.append(text[position:end])
+    return ('…' if start > 0 else '') + ''.join(parts) + ('…' if end < len(text) else '')
+
+
+def highlight(snippet):
+    """escape کردن snippet و تبدیل نشانگرهای موقت به تگ mark"""
+    return (
+        escape(snippet)
+        .replace(_MARK_START, '<mark>')
+        .replace(_MARK_END, '</mark>')
+    )
+
+
+@dataclass
+class SearchHit:
+    post_id: int
+    rank: float
+
+
+class BaseSearchBackend:
+    """رابط مشترک بک‌اندهای جستجو"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def is_available(self):
+        return True
+
+    def search(self, query, limit):
+        """برگرداندن حداکثر limit نتیجه مرتب شده بر اساس ارتباط"""
+        raise NotImplementedError
+
+    def snippets(self, query, post_ids, texts=None):
+        """
+        قطعه متن هایلایت شده از متن اصلی پست‌های داده شده (فقط پست‌های صفحه جاری، چون
+        ساخت snippet گران‌ترین بخش جستجو است). texts نگاشت شناسه به متن پست‌هایی است که
+        از قبل خوانده شده‌اند؛ بقیه از پایگاه داده خوانده می‌شوند.
+        """
+        terms = query_terms(query)
+        post_ids = [int(pk) for pk in post_ids]
+        if not terms or not post_ids:
+            return {}
+        texts = dict(texts or {})
+        missing = [pk for pk in post_ids if pk not in texts]
+        if missing:
+            from .models import Post_blog
+
+            texts.update(Post_blog.objects.filter(pk__in=missing).values_list('pk', 'text'))
+        return {pk: highlight(build_snippet(texts[pk], terms)) for pk in post_ids if pk in texts}
+
+    def index_post(self, post):
+        """افزودن یا به‌روزرسانی یک پست؛ پست‌های منتشر نشده از ایندکس حذف می‌شوند"""
+        if post.status != 'pub':
+            self.remove_post(post.pk)
+            return
+        self.upsert(post.pk, post.title, post.text, post.author.username)
+
+    def upsert(self, post_id, title, text, author):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def rebuild(self, rows):
+        """
+        ساخت مجدد کامل ایندکس از روی rows شامل (id, title, text, author_username)
+        برای پست‌های منتشر شده. تعداد پست‌های ایندکس شده برگردانده می‌شود.
+        """
+        return 0
+
+    def table_exists(self):
+        with self.connection.cursor() as cursor:
+            return INDEX_TABLE in self.connection.introspection.table_names(cursor)
+
+
+class ContainsSearchBackend(BaseSearchBackend):
+    """جستجوی قدیمی icontains بدون ایندکس و رتبه‌بندی (برای پایگاه‌های داده دیگر)"""
+
+    def search(self, query, limit):
+        from django.db.models import Q
+        from .models import Post_blog
+
+        ids = (
+            Post_blog.objects.filter(status='pub')
+            .filter(
+                Q(title__icontains=query) |
+                Q(text__icontains=query) |
+                Q(author__username__icontains=query)
+            )
+            .order_by('-datetime_modified')
+            .values_list('pk', flat=True)[:limit]
+        )
+        return [SearchHit(post_id=pk, rank=0.0) for pk in ids]
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """جستجو با جدول مجازی FTS5 در SQLite و رتبه‌بندی bm25"""
+
+    create_sql = (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} "
+        "USING fts5(title, text, author, tokenize='unicode61 remove_diacritics 2')"
+    )
+    # وزن ستون‌ها در bm25: عنوان مهم‌تر از نام نویسنده و نام نویسنده مهم‌تر از متن است
+    search_sql = (
+        f"SELECT rowid, bm25({INDEX_TABLE}, 10.0, 1.0, 4.0) AS rank "
+        f"FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s ORDER BY rank LIMIT %s"
+    )
+
+    def is_available(self):
+        return self.table_exists()
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.create_sql)
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {INDEX_TABLE}')
+
+    def match_expression(self, query):
+        # هر کلمه به صورت رشته نقل‌قول شده با جستجوی پیشوندی؛ عملگرهای FTS5 خنثی می‌شوند
+        return ' '.join(f'"{term}"*' for term in query_terms(query))
+
+    def search(self, query, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.search_sql, [expression, limit])
+            rows = cursor.fetchall()
+        return [SearchHit(post_id=post_id, rank=-rank) for post_id, rank in rows]
+
+    def upsert(self, post_id, title, text, author):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {INDEX_TABLE} WHERE rowid = %s', [post_id])
+            cursor.execute(
+                f'INSERT INTO {INDEX_TABLE} (rowid, title, text, author) VALUES (%s, %s, %s, %s)',
+                [post_id, normalize_text(title), normalize_text(text), normalize_text(author)],
+            )
+
+    def remove_post(self, post_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {INDEX_TABLE} WHERE rowid = %s', [post_id])
+
+    def rebuild(self, rows, batch_size=1000):
+        indexed = 0
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {INDEX_TABLE}')
+            batch = []
+            for post_id, title, text, author in rows:
+                batch.append((post_id, normalize_text(title), normalize_text(text), normalize_text(author)))
+                if len(batch) >= batch_size:
+                    indexed += self._insert_many(cursor, batch)
+                    batch = []
+            if batch:
+                indexed += self._insert_many(cursor, batch)
+        return indexed
+
+    def _insert_many(self, cursor, batch):
+        cursor.executemany(
+            f'INSERT INTO {INDEX_TABLE} (rowid, title, text, author) VALUES (%s, %s, %s, %s)', batch
+        )
+        return len(batch)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """جستجو با ستون tsvector و ایندکس GIN در PostgreSQL و رتبه‌بندی ts_rank"""
+
+    create_sql = [
+        f"CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ("
+        " post_id bigint PRIMARY KEY REFERENCES myblog_post_blog (id) ON DELETE CASCADE"
+        " DEFERRABLE INITIALLY DEFERRED,"
+        " document tsvector NOT NULL)",
+        f"CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_document ON {INDEX_TABLE} USING GIN (document)",
+    ]
+    # پیکربندی simple چون PostgreSQL دیکشنری فارسی ندارد؛ نرمال‌سازی در پایتون انجام می‌شود
+    document_sql = (
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'D')"
+    )
+    search_sql = (
+        f"SELECT post_id, ts_rank(document, query) AS rank"
+        f" FROM {INDEX_TABLE}, to_tsquery('simple', %s) AS query"
+        " WHERE document @@ query ORDER BY rank DESC LIMIT %s"
+    )
+
+    def is_available(self):
+        return self.table_exists()
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            for statement in self.create_sql:
+                cursor.execute(statement)
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {INDEX_TABLE}')
+
+    def tsquery(self, query):
+        return ' & '.join(f'{term}:*' for term in query_terms(query))
+
+    def search(self, query, limit):
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return []
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.search_sql, [tsquery, limit])
+            rows = cursor.fetchall()
+        return [SearchHit(post_id=post_id, rank=rank) for post_id, rank in rows]
+
+    def _row(self, post_id, title, text, author):
+        title, text, author = normalize_text(title), normalize_text(text), normalize_text(author)
+        return [post_id, title, text, author]
+
+    def upsert(self, post_id, title, text, author):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {INDEX_TABLE} (post_id, document) '
+                f'VALUES (%s, {self.document_sql}) '
+                'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+                self._row(post_id, title, text, author),
+            )
+
+    def remove_post(self, post_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {INDEX_TABLE} WHERE post_id = %s', [post_id])
+
+    def rebuild(self, rows, batch_size=1000):
+        indexed = 0
+        insert_sql = (
+            f'INSERT INTO {INDEX_TABLE} (post_id, document) '
+            f'VALUES (%s, {self.document_sql})'
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {INDEX_TABLE}')
+            batch = []
+            for row in rows:
+                batch.append(self._row(*row))
+                if len(batch) >= batch_size:
+                    cursor.executemany(insert_sql, batch)
+                    indexed += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(insert_sql, batch)
+                indexed += len(batch)
+        return indexed
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+# فقط در دسترس بودن ایندکس تا پایان عمر پردازه کش می‌شود؛ نتیجه منفی (مثلا پیش از
+# ساخته شدن جدول) پس از این مدت دوباره بررسی می‌شود (ثانیه)
+UNAVAILABLE_RECHECK_SECONDS = 60
+
+_availability = {}
+
+
+def get_backend_class(db_connection=None):
+    db_connection = db_connection or connection
+    if getattr(settings, 'SEARCH_BACKEND', None):
+        return import_string(settings.SEARCH_BACKEND)
+    return BACKENDS.get(db_connection.vendor, ContainsSearchBackend)
+
+
+def get_search_backend(db_connection=None):
+    """
+    بک‌اند جستجوی متناسب با پایگاه داده؛ اگر جدول ایندکس ساخته نشده باشد
+    (مثلا SQLite بدون FTS5) به جستجوی icontains برمی‌گردد.
+    """
+    db_connection = db_connection or connection
+    backend_class = get_backend_class(db_connection)
+    key = (db_connection.alias, backend_class)
+    if key not in _availability:
+        available = backend_class(db_connection).is_available()
+        _availability[key] = None if available else time.monotonic() + UNAVAILABLE_RECHECK_SECONDS
+    recheck_at = _availability[key]
+    if recheck_at is not None:
+        if time.monotonic() >= recheck_at:
+            del _availability[key]
+        return ContainsSearchBackend(db_connection)
+    return backend_class(db_connection)
+
+
+def reset_availability_cache():
+    _availability.clear()
+
+
+def indexable_rows(queryset):
+    """ردیف‌های لازم برای ساخت ایندکس از روی پست‌های منتشر شده"""
+    return (
+        queryset.filter(status='pub')
+        .order_by()
+        .values_list('pk', 'title', 'text', 'author__username')
+        .iterator(chunk_size=1000)
+    )
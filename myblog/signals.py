@@ -0,0 +1,162 @@
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import counters
+from .caching import bump_activity, bump_list_structure, forget_activity
+from .images import schedule_variants
+from .metrics import install_query_recorder
+from .models import Comment, EmojiReaction, EmojiReactionCount, Post_blog
+from .realtime import publish_counts
+from .search import get_search_backend
+
+
+def _bump_emoji_counts(post_id, using, deltas):
+    # در حالت write-behind شمارنده‌ها پس از commit در کش جمع و با flush_counters نوشته می‌شوند
+    if counters.enabled():
+        counters.buffer(post_id, using, emoji=deltas)
+    else:
+        for emoji_type, delta in deltas.items():
+            EmojiReactionCount.bump(post_id, emoji_type, delta)
+    publish_counts(post_id, using, emoji=deltas)
+
+
+@receiver(post_save, sender=EmojiReaction)
+def update_emoji_counts_on_save(sender, instance, created, using=None, **kwargs):
+    """به‌روزرسانی شمارنده ایموجی پس از ثبت یا تغییر واکنش"""
+    if created:
+        _bump_emoji_counts(instance.post_id, using, {instance.emoji_type: 1})
+    else:
+        previous = getattr(instance, '_loaded_emoji_type', None)
+        if previous is None:
+            # شیء بدون from_db ساخته شده است؛ شمارنده‌های این پست از نو ساخته می‌شوند
+            # (تغییر آن مشخص نیست و به stream ها ارسال نمی‌شود)
+            if counters.enabled():
+                # پس از commit تا تغییرهای بافر شده همین تراکنش هم در کش باشند و کم شوند
+                post_id = instance.post_id
+                transaction.on_commit(lambda: counters.recount([post_id]), using=using, robust=True)
+            else:
+                EmojiReactionCount.rebuild(post_ids=[instance.post_id])
+        elif previous != instance.emoji_type:
+            _bump_emoji_counts(instance.post_id, using, {previous: -1, instance.emoji_type: 1})
+    instance._loaded_emoji_type = instance.emoji_type
+
+
+@receiver(post_delete, sender=EmojiReaction)
+def update_emoji_counts_on_delete(sender, instance, using=None, **kwargs):
+    """کاهش شمارنده ایموجی پس از حذف واکنش (داخل تراکنش حذف)"""
+    _bump_emoji_counts(instance.post_id, using, {instance.emoji_type: -1})
+
+
+@receiver(post_save, sender=Comment)
+def update_comments_count_on_save(sender, instance, created, raw=False, using=None, **kwargs):
+    """به‌روزرسانی شمارنده نظرات فعال پست پس از ثبت یا تغییر نظر (داخل تراکنش ذخیره)"""
+    if raw:
+        return
+    current = (instance.post_id, instance.is_active)
+    previous = getattr(instance, '_loaded_state', None)
+    if created:
+        if instance.is_active:
+            Post_blog.bump_comments_count(instance.post_id, 1)
+            publish_counts(instance.post_id, using, comments=1)
+    elif previous is None:
+        # شیء بدون from_db ساخته شده است؛ شمارنده این پست از نو محاسبه می‌شود
+        Post_blog.refresh_comments_count([instance.post_id])
+    elif previous[0] != current[0]:
+        # نظر به پست دیگری منتقل شده است
+        Post_blog.refresh_comments_count([previous[0], current[0]])
+    elif previous[1] != current[1]:
+        delta = 1 if instance.is_active else -1
+        Post_blog.bump_comments_count(instance.post_id, delta)
+        publish_counts(instance.post_id, using, comments=delta)
+    instance._loaded_state = current
+
+
+@receiver(post_delete, sender=Comment)
+def update_comments_count_on_delete(sender, instance, using=None, **kwargs):
+    # وضعیت ذخیره شده در پایگاه داده ملاک است، نه تغییرات ذخیره نشده شیء
+    was_active = getattr(instance, '_loaded_state', (None, instance.is_active))[1]
+    if was_active:
+        Post_blog.bump_comments_count(instance.post_id, -1)
+        publish_counts(instance.post_id, using, comments=-1)
+
+
+@receiver(post_save, sender=Post_blog)
+def index_post_on_save(sender, instance, raw=False, using=None, **kwargs):
+    """به‌روزرسانی ایندکس جستجو پس از ذخیره پست (در همان تراکنش ذخیره)"""
+    if not raw:
+        get_search_backend(connections[using]).index_post(instance)
+
+
+@receiver(post_delete, sender=Post_blog)
+def remove_post_from_index(sender, instance, using=None, **kwargs):
+    get_search_backend(connections[using]).remove_post(instance.pk)
+
+
+def _bump_after_commit(post_id, using=None):
+    # پس از commit تا درخواست همزمان داده قدیمی را با نسخه جدید کش نکند
+    transaction.on_commit(lambda: bump_activity(post_id), using=using)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=EmojiReaction)
+@receiver(post_delete, sender=EmojiReaction)
+def invalidate_post_fragments(sender, instance, using=None, **kwargs):
+    """تغییر نسخه فعالیت پست پس از تغییر نظرات و واکنش‌ها"""
+    _bump_after_commit(instance.post_id, using)
+
+
+@receiver(post_save, sender=Post_blog)
+def invalidate_saved_post(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        _bump_after_commit(instance.pk, using)
+
+
+@receiver(post_save, sender=Post_blog)
+@receiver(post_delete, sender=Post_blog)
+def invalidate_post_lists(sender, instance, raw=False, using=None, **kwargs):
+    """ایجاد، حذف و ویرایش پست ترکیب یا ترتیب صفحات فهرست را تغییر می‌دهد"""
+    if not raw:
+        transaction.on_commit(bump_list_structure, using=using)
+
+
+@receiver(post_save, sender=Post_blog)
+def build_image_variants(sender, instance, created, raw=False, using=None, **kwargs):
+    """ساخت نسخه‌های تصویر پس از آپلود یا تغییر تصویر پست"""
+    image = instance.image.name or ''
+    if raw:
+        return
+    if hasattr(instance, '_loaded_image'):
+        changed = image != (instance._loaded_image or '')
+    else:
+        changed = bool(image) or (not created and bool(instance.image_variants))
+    if changed:
+        schedule_variants(instance.pk, using)
+    instance._loaded_image = image
+
+
+@receiver(post_delete, sender=Post_blog)
+def forget_deleted_post(sender, instance, using=None, **kwargs):
+    post_id = instance.pk
+    transaction.on_commit(lambda: forget_activity(post_id), using=using)
+
+
+@receiver(m2m_changed, sender=Post_blog.liked_by.through)
+def invalidate_liked_posts(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    """تغییر لایک‌ها از طریق ادمین یا liked_by.add/remove"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _bump_after_commit(instance.pk, using)
+    elif pk_set:
+        for post_id in pk_set:
+            _bump_after_commit(post_id, using)
+    # post_clear از سمت کاربر pk_set ندارد؛ نسخه پست‌ها با ویرایش بعدی تغییر می‌کند
+
+
+@receiver(connection_created, dispatch_uid='metrics_query_recorder')
+def record_request_queries(sender, connection, **kwargs):
+    """ثبت تعداد و زمان کوئری‌های هر اتصال جدید در متریک‌های درخواست جاری"""
+    install_query_recorder(connection)
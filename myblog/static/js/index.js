@@ -79,3 +79,13 @@ document.addEventListener("DOMContentLoaded", function() {
         postCards.forEach(card => observer.observe(card));
     };
 });
+
+// ===== شمارنده‌های زنده (Server-Sent Events) =====
+// onCounts برای هر تغییر و onSnapshot برای مقادیر کامل هر پست در شروع هر اتصال صدا زده می‌شود
+window.subscribePostCounts = function(url, postIds, onCounts, onSnapshot) {
+    if (!('EventSource' in window) || !postIds.length) return null;
+    const source = new EventSource(url + '?ids=' + postIds.join(','));
+    source.addEventListener('counts', event => onCounts(JSON.parse(event.data)));
+    source.addEventListener('snapshot', event => JSON.parse(event.data).forEach(onSnapshot));
+    return source;
+};
@@ -0,0 +1,50 @@
+from django import template
+
+from ..images import VARIANT_WIDTHS
+
+register = template.Library()
+
+
+def _variants(post):
+    # نسخه‌های با عرض تکراری (تصویر کوچک‌تر از اندازه‌ها) یک بار در srcset می‌آیند
+    variants = {}
+    for name in VARIANT_WIDTHS:
+        entry = (post.image_variants or {}).get(name)
+        if entry:
+            variants.setdefault(entry['width'], entry)
+    return [variants[width] for width in sorted(variants)]
+
+
+@register.simple_tag
+def image_srcset(post, extension='webp'):
+    """مقدار srcset نسخه‌های تصویر پست در یک قالب (webp یا jpeg)"""
+    storage = post.image.storage
+    return ', '.join(
+        f"{storage.url(entry[extension])} {entry['width']}w" for entry in _variants(post)
+    )
+
+
+@register.inclusion_tag('myblog/_post_picture.html')
+def post_picture(post, size='card', sizes='100vw', css_class='', loading='lazy'):
+    """
+    تصویر واکنش‌گرای پست: <picture> با منبع WebP و JPEG و ابعاد مشخص برای جلوگیری از
+    جابجایی صفحه. تا زمان ساخت نسخه‌ها تصویر اصلی نمایش داده می‌شود.
+    """
+    context = {
+        'post': post,
+        'sizes': sizes,
+        'css_class': css_class,
+        'loading': loading,
+        'variant': (post.image_variants or {}).get(size),
+        'width': post.image_width,
+        'height': post.image_height,
+    }
+    if context['variant']:
+        context.update(
+            webp_srcset=image_srcset(post, 'webp'),
+            jpeg_srcset=image_srcset(post, 'jpeg'),
+            src=post.image.storage.url(context['variant']['jpeg']),
+            width=context['variant']['width'],
+            height=context['variant']['height'],
+        )
+    return context
@@ -1,11 +1,42 @@
-from django.test import TestCase
+import gzip
+import json
+import pstats
+import re
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
-from django.contrib.auth.models import User
-from .models import Post_blog
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.db import OperationalError, connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.template import Context, Template
+from django.utils import timezone
+from PIL import Image
+from prometheus_client import REGISTRY
+from . import counters, pagecache, prerender, profiling, search
+from .caching import attach_cache_versions
+from .models import Post_blog, Comment, EmojiReaction, EmojiReactionCount
+from .middleware import REPLICA_PIN_COOKIE
+from .pagination import InvalidCursor, decode_cursor, keyset_page
+from .realtime import Broker, get_broker, post_channel
+from .routers import PrimaryReplicaRouter, use_primary
+from .search import ContainsSearchBackend, SQLiteFTS5Backend, get_search_backend, normalize_text
 
 class PostBlogTests(TestCase):
 
     def setUp(self):
+        cache.clear()
         # ایجاد کاربر تستی
         self.user = User.objects.create_user(username='testuser', password='12345')
 
@@ -49,3 +80,1511 @@ class PostBlogTests(TestCase):
         self.assertTemplateUsed(response, 'myblog/post_detail.html')
         self.assertContains(response, self.post.title)
         self.assertContains(response, self.post.text)
+
+
+class PostUserStateTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='12345')
+        self.author = User.objects.create_user(username='author', password='12345')
+        self.client.login(username='reader', password='12345')
+
+    def _create_posts(self, count):
+        return [
+            Post_blog.objects.create(
+                title=f'پست شماره {i}', text='متن آزمایشی پست', status='pub', author=self.author
+            )
+            for i in range(count)
+        ]
+
+    def _react(self, posts):
+        for post in posts:
+            post.liked_by.add(self.user)
+            EmojiReaction.objects.create(post=post, user=self.user, emoji_type='love')
+            Comment.objects.create(post=post, author=self.author, text='نظر فعال')
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_with_user_state_annotations(self):
+        post, other = self._create_posts(2)
+        self._react([post])
+        EmojiReaction.objects.create(post=post, user=self.author, emoji_type='wow')
+        Comment.objects.create(post=post, author=self.author, text='نظر غیرفعال', is_active=False)
+
+        annotated = Post_blog.objects.with_user_state(self.user).get(pk=post.pk)
+        self.assertTrue(annotated.user_has_liked)
+        self.assertEqual(annotated.user_emoji, 'love')
+        self.assertEqual(annotated.comments_count, 1)
+        self.assertEqual(annotated.get_emojis_summary(), {'love': 1, 'wow': 1})
+
+        annotated_other = Post_blog.objects.with_user_state(self.user).get(pk=other.pk)
+        self.assertFalse(annotated_other.user_has_liked)
+        self.assertIsNone(annotated_other.user_emoji)
+        self.assertEqual(annotated_other.get_emojis_summary(), {})
+
+    def test_with_user_state_anonymous(self):
+        post, = self._create_posts(1)
+        self._react([post])
+        annotated = Post_blog.objects.with_user_state(AnonymousUser()).get(pk=post.pk)
+        self.assertFalse(annotated.user_has_liked)
+        self.assertIsNone(annotated.user_emoji)
+        self.assertEqual(annotated.comments_count, 1)
+
+    def test_post_list_query_count_independent_of_page_size(self):
+        url = reverse('post_list')
+        self._react(self._create_posts(1))
+        small_page = self._count_queries(url)
+        self._react(self._create_posts(5))
+        full_page = self._count_queries(url)
+        self.assertEqual(small_page, full_page)
+
+    def test_post_detail_query_count_independent_of_reactions(self):
+        post, = self._create_posts(1)
+        url = reverse('blog_detail', args=[post.pk])
+        baseline = self._count_queries(url)
+        self._react([post])
+        for i in range(5):
+            reader = User.objects.create_user(username=f'reader{i}', password='12345')
+            post.liked_by.add(reader)
+            EmojiReaction.objects.create(post=post, user=reader, emoji_type='laugh')
+        self.assertEqual(self._count_queries(url), baseline)
+
+    def test_admin_changelist_query_count_independent_of_rows(self):
+        self.user.is_staff = True
+        self.user.is_superuser = True
+        self.user.save()
+        url = reverse('admin:myblog_post_blog_changelist')
+        self._react(self._create_posts(1))
+        few_rows = self._count_queries(url)
+        self._react(self._create_posts(5))
+        self.assertEqual(self._count_queries(url), few_rows)
+
+
+class AdminScalabilityTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='boss', password='12345')
+        self.client.force_login(self.admin)
+        self.post = Post_blog.objects.create(title='پست ادمین', text='متن', status='pub', author=self.admin)
+
+    def _add_rows(self, count):
+        for _ in range(count):
+            user = User.objects.create(username=f'admin-row-{User.objects.count()}')
+            post = Post_blog.objects.create(title='پست', text='متن', status='pub', author=user)
+            Comment.objects.create(post=post, author=user, text='نظر')
+            EmojiReaction.objects.create(post=post, user=user, emoji_type='like')
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_changelists_query_count_independent_of_rows(self):
+        urls = [
+            reverse(f'admin:myblog_{model}_changelist')
+            for model in ('post_blog', 'comment', 'emojireaction')
+        ]
+        self._add_rows(1)
+        few_rows = [self._count_queries(url) for url in urls]
+        self._add_rows(5)
+        self.assertEqual([self._count_queries(url) for url in urls], few_rows)
+
+    def test_change_form_uses_autocomplete_and_likers_link(self):
+        response = self.client.get(reverse('admin:myblog_post_blog_change', args=[self.post.pk]))
+        self.assertNotContains(response, 'name="liked_by"')
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(response, reverse('admin:myblog_post_blog_likers', args=[self.post.pk]))
+
+    def test_likers_view_pages_through_likes(self):
+        for i in range(3):
+            self.post.toggle_like(User.objects.create(username=f'liker-{i}'))
+        url = reverse('admin:myblog_post_blog_likers', args=[self.post.pk])
+        with mock.patch('myblog.admin.LIKERS_PAGE_SIZE', 2):
+            first = self.client.get(url)
+            self.assertEqual([u.username for u in first.context['likers']], ['liker-2', 'liker-1'])
+            second = self.client.get(url, {'before': first.context['next_before']})
+        self.assertEqual([u.username for u in second.context['likers']], ['liker-0'])
+        self.assertIsNone(second.context['next_before'])
+
+    def test_unfiltered_changelist_uses_estimated_count(self):
+        self._add_rows(2)
+        url = reverse('admin:myblog_comment_changelist')
+        with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1), CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+        with override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=10 ** 9), CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertTrue(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+
+class ToggleLikeTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='liker', password='12345')
+        self.post = Post_blog.objects.create(
+            title='پست محبوب', text='متن پست محبوب', status='pub', author=self.user
+        )
+
+    def test_toggle_like_updates_membership_and_counter(self):
+        self.assertEqual(self.post.toggle_like(self.user), (True, 1))
+        self.assertTrue(self.post.liked_by.filter(pk=self.user.pk).exists())
+        self.assertEqual(self.post.toggle_like(self.user), (False, 0))
+        self.assertFalse(self.post.liked_by.filter(pk=self.user.pk).exists())
+
+    def test_toggle_like_touches_only_counter_column(self):
+        modified = self.post.datetime_modified
+        Post_blog.objects.filter(pk=self.post.pk).update(title='عنوان جدید')
+        self.post.toggle_like(self.user)
+        self.post.refresh_from_db()
+        # نسخه قدیمی شیء در حافظه نباید عنوان جدید را بازنویسی کند
+        self.assertEqual(self.post.title, 'عنوان جدید')
+        self.assertEqual(self.post.datetime_modified, modified)
+
+    def test_toggle_like_query_count_independent_of_likers(self):
+        for i in range(20):
+            self.post.liked_by.add(User.objects.create(username=f'fan{i}'))
+        with self.assertNumQueries(8):
+            self.post.toggle_like(self.user)
+        with self.assertNumQueries(5):
+            self.post.toggle_like(self.user)
+
+    def test_reconcile_like_counts_command(self):
+        self.post.liked_by.add(self.user)
+        drifted = Post_blog.objects.create(
+            title='پست دیگر', text='متن پست دیگر', status='pub', author=self.user
+        )
+        Post_blog.objects.filter(pk=self.post.pk).update(likes_count=7)
+        Post_blog.objects.filter(pk=drifted.pk).update(likes_count=3)
+        out = StringIO()
+        call_command('reconcile_like_counts', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.post.refresh_from_db()
+        drifted.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(drifted.likes_count, 0)
+
+
+class ConcurrentToggleLikeTests(TransactionTestCase):
+
+    def test_concurrent_likes_do_not_lose_updates(self):
+        author = User.objects.create(username='author')
+        post = Post_blog.objects.create(
+            title='پست پربازدید', text='متن پست پربازدید', status='pub', author=author
+        )
+        users = User.objects.bulk_create(User(username=f'hammer{i}') for i in range(24))
+        errors = []
+
+        def hammer(chunk):
+            try:
+                for user in chunk:
+                    for _ in range(3):  # لایک، برداشتن لایک، لایک دوباره
+                        _retry_locked(lambda: post.toggle_like(user))
+            except Exception as exc:  # pragma: no cover - فقط برای گزارش در تست
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=hammer, args=(users[i::8],)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        post.refresh_from_db()
+        self.assertEqual(post.liked_by.count(), len(users))
+        self.assertEqual(post.likes_count, len(users))
+
+
+def _retry_locked(operation, attempts=50):
+    """تکرار عملیات در صورت قفل بودن پایگاه داده SQLite حافظه‌ای در تست‌های همزمانی"""
+    for attempt in range(attempts):
+        try:
+            return operation()
+        except OperationalError as exc:
+            if 'locked' not in str(exc) or attempt == attempts - 1:
+                raise
+            time.sleep(0.005)
+
+
+# رپلیکای آزمایشی: پایگاه داده SQLite حافظه‌ای دوم که test runner آن را مانند default
+# می‌سازد و migrate می‌کند، ولی هیچ replication ای از default به آن وجود ندارد
+REPLICA = 'replica_test'
+connections.settings.setdefault(REPLICA, {**connections.settings['default'], 'NAME': ':memory:'})
+
+
+@override_settings(REPLICA_DATABASES=[REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    """رپلیکا هیچ‌گاه به‌روز نمی‌شود؛ هر خواندنی که به primary نرود داده جدید را نمی‌بیند"""
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='replica-reader')
+        self.post = Post_blog.objects.create(
+            title='پست تازه', text='متن', status='pub', author=self.user
+        )
+
+    def test_writes_go_to_primary_and_reads_to_replica(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_write(Post_blog), 'default')
+        self.assertEqual(router.db_for_read(Post_blog), REPLICA)
+        self.assertFalse(Post_blog.objects.using(REPLICA).exists())
+
+        with CaptureQueriesContext(connections[REPLICA]) as replica_queries:
+            response = self.client.get(reverse('post_list'))
+        self.assertNotContains(response, 'پست تازه')
+        self.assertTrue(replica_queries.captured_queries)
+        self.assertEqual(self.client.get(reverse('blog_detail', args=[self.post.pk])).status_code, 404)
+
+    def test_primary_reads_inside_transaction_and_use_primary(self):
+        with transaction.atomic():
+            self.assertTrue(Post_blog.objects.filter(pk=self.post.pk).exists())
+        with use_primary():
+            self.assertTrue(Post_blog.objects.filter(pk=self.post.pk).exists())
+        self.assertFalse(Post_blog.objects.filter(pk=self.post.pk).exists())
+
+    def test_user_reads_own_write_until_pin_expires(self):
+        self.client.force_login(self.user)
+        # خود درخواست نوشتن نشست و پست را از primary می‌خواند
+        response = self.client.post(reverse('toggle_like', args=[self.post.pk]))
+        self.assertEqual(response.json()['likes_count'], 1)
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+        detail = reverse('blog_detail', args=[self.post.pk])
+        response = self.client.get(detail)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['post'].likes_count, 1)
+
+        self.client.cookies[REPLICA_PIN_COOKIE] = str(int(time.time()) - 1)
+        self.assertEqual(self.client.get(detail).status_code, 404)
+
+
+class EmojiReactionCountTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='reactor')
+        self.other = User.objects.create(username='other')
+        self.post = Post_blog.objects.create(
+            title='پست واکنش‌ها', text='متن پست واکنش‌ها', status='pub', author=self.user
+        )
+
+    def test_counters_follow_reaction_changes(self):
+        self.post.set_emoji_reaction(self.user, 'love')
+        self.post.set_emoji_reaction(self.other, 'love')
+        self.assertEqual(self.post.get_emojis_summary(), {'love': 2})
+
+        self.post.set_emoji_reaction(self.user, 'wow')
+        self.assertEqual(self.post.get_emojis_summary(), {'love': 1, 'wow': 1})
+
+        self.assertTrue(self.post.remove_emoji_reaction(self.other))
+        self.assertFalse(self.post.remove_emoji_reaction(self.other))
+        self.assertEqual(self.post.get_emojis_summary(), {'wow': 1})
+
+    def test_concurrent_first_reaction_updates_existing_row(self):
+        def concurrent_insert(queryset):
+            # درخواست همزمان بعد از select_for_update و قبل از create ثبت می‌کند
+            EmojiReaction.objects.create(post=self.post, user=self.user, emoji_type='love')
+            return None
+
+        with mock.patch('django.db.models.query.QuerySet.first', concurrent_insert):
+            self.post.set_emoji_reaction(self.user, 'wow')
+        self.assertEqual(EmojiReaction.objects.get(post=self.post, user=self.user).emoji_type, 'wow')
+        self.assertEqual(self.post.get_emojis_summary(), {'wow': 1})
+
+    def test_counters_follow_queryset_and_cascade_deletes(self):
+        self.post.set_emoji_reaction(self.user, 'sad')
+        self.post.set_emoji_reaction(self.other, 'sad')
+        EmojiReaction.objects.filter(user=self.other).delete()
+        self.assertEqual(self.post.get_emojis_summary(), {'sad': 1})
+        self.user.delete()
+        self.assertFalse(EmojiReactionCount.objects.filter(count__gt=0).exists())
+
+    def test_summary_is_single_query(self):
+        self.post.set_emoji_reaction(self.user, 'laugh')
+        with self.assertNumQueries(1):
+            self.post.get_emojis_summary()
+
+    def test_rebuild_emoji_counts_command(self):
+        self.post.set_emoji_reaction(self.user, 'angry')
+        EmojiReactionCount.objects.update(count=42)
+        call_command('rebuild_emoji_counts', str(self.post.pk), stdout=StringIO())
+        self.assertEqual(self.post.get_emojis_summary(), {'angry': 1})
+
+    def test_emoji_views_return_counter_summary(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('add_emoji_reaction', args=[self.post.pk]), {'emoji_type': 'like'}
+        )
+        self.assertEqual(response.json()['emojis_summary'], {'like': 1})
+        response = self.client.post(reverse('remove_emoji_reaction', args=[self.post.pk]))
+        self.assertEqual(response.json()['emojis_summary'], {})
+
+
+class AsyncReactionViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='async-reader')
+        self.post = Post_blog.objects.create(
+            title='پست ناهمزمان', text='متن', status='pub', author=self.user
+        )
+
+    async def test_like_and_reaction_over_async_client(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse('toggle_like', args=[self.post.pk]))
+        self.assertEqual(response.json(), {
+            'success': True, 'likes_count': 1, 'is_liked': True, 'post_id': self.post.pk,
+        })
+
+        response = await self.async_client.post(
+            reverse('add_emoji_reaction', args=[self.post.pk]), {'emoji_type': 'wow'}
+        )
+        self.assertEqual(response.json()['emojis_summary'], {'wow': 1})
+        self.assertEqual(await self.post.aget_emojis_summary(), {'wow': 1})
+
+    async def test_async_views_keep_auth_and_404(self):
+        url = reverse('toggle_like', args=[self.post.pk])
+        self.assertEqual((await self.async_client.post(url)).status_code, 302)
+        await self.async_client.aforce_login(self.user)
+        missing = reverse('toggle_like', args=[self.post.pk + 100])
+        self.assertEqual((await self.async_client.post(missing)).status_code, 404)
+        self.assertEqual((await self.async_client.get(url)).status_code, 405)
+
+
+class ReactionBatchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='batch-reader')
+        self.first = Post_blog.objects.create(title='اول', text='متن', status='pub', author=self.user)
+        self.second = Post_blog.objects.create(title='دوم', text='متن', status='pub', author=self.user)
+        self.url = reverse('reactions_batch')
+        self.client.force_login(self.user)
+
+    def _post(self, operations):
+        return self.client.post(self.url, json.dumps({'operations': operations}), content_type='application/json')
+
+    def test_applies_operations_in_order_with_final_state(self):
+        response = self._post([
+            {'post': self.first.pk, 'action': 'like'},
+            {'post': self.first.pk, 'action': 'like'},
+            {'post': self.second.pk, 'action': 'toggle_like'},
+            {'post': self.second.pk, 'action': 'emoji', 'emoji_type': 'love'},
+            {'post': self.second.pk, 'action': 'emoji', 'emoji_type': 'sad'},
+        ])
+        data = response.json()
+        self.assertTrue(all(result['ok'] for result in data['results']))
+        self.assertEqual(data['posts'][str(self.first.pk)]['likes_count'], 1)
+        self.assertEqual(data['posts'][str(self.second.pk)], {
+            'likes_count': 1, 'is_liked': True, 'user_emoji': 'sad', 'emojis_summary': {'sad': 1},
+        })
+
+        data = self._post([{'post': self.first.pk, 'action': 'unlike'}]).json()
+        self.assertEqual(data['posts'][str(self.first.pk)]['likes_count'], 0)
+        self.assertFalse(data['posts'][str(self.first.pk)]['is_liked'])
+
+    def test_invalid_items_do_not_roll_back_the_rest(self):
+        data = self._post([
+            {'post': self.first.pk + 100, 'action': 'like'},
+            {'post': self.first.pk, 'action': 'emoji', 'emoji_type': 'fire'},
+            {'post': [1], 'action': 'like'},
+            'like',
+            {'post': self.first.pk, 'action': 'like'},
+        ]).json()
+        self.assertEqual([result['ok'] for result in data['results']], [False, False, False, False, True])
+        self.assertEqual(list(data['posts']), [str(self.first.pk)])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.likes_count, 1)
+
+    def test_rejects_malformed_and_oversized_batches(self):
+        self.assertEqual(self.client.post(self.url, 'nope', content_type='application/json').status_code, 400)
+        self.assertEqual(self._post([]).status_code, 400)
+        with override_settings(REACTION_BATCH_LIMIT=2):
+            self.assertEqual(self._post([{'post': self.first.pk, 'action': 'like'}] * 3).status_code, 400)
+
+
+class CommentsCountTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create(username='comment-author')
+        self.post = Post_blog.objects.create(title='پست', text='متن', status='pub', author=self.author)
+        self.other = Post_blog.objects.create(title='دیگری', text='متن', status='pub', author=self.author)
+
+    def _count(self, post=None):
+        return Post_blog.objects.values_list('comments_count', flat=True).get(pk=(post or self.post).pk)
+
+    def test_counter_follows_create_update_move_and_delete(self):
+        first = Comment.objects.create(post=self.post, author=self.author, text='یک')
+        Comment.objects.create(post=self.post, author=self.author, text='غیرفعال', is_active=False)
+        self.assertEqual(self._count(), 1)
+
+        first = Comment.objects.get(pk=first.pk)
+        first.is_active = False
+        first.save()
+        self.assertEqual(self._count(), 0)
+        first.is_active = True
+        first.save()
+        first.post = self.other
+        first.save()
+        self.assertEqual((self._count(), self._count(self.other)), (0, 1))
+
+        Comment.objects.filter(pk=first.pk).delete()
+        self.assertEqual(self._count(self.other), 0)
+
+    def test_admin_actions_update_counter(self):
+        comments = [Comment.objects.create(post=self.post, author=self.author, text=str(i)) for i in range(3)]
+        Comment.objects.filter(pk__in=[c.pk for c in comments[:2]]).set_active(False)
+        self.assertEqual(self._count(), 1)
+        self.assertEqual(Comment.objects.all().set_active(True), 2)
+        self.assertEqual(self._count(), 3)
+
+    def test_detail_pages_comments_with_cursor(self):
+        for i in range(25):
+            Comment.objects.create(post=self.post, author=self.author, text=f'نظر شماره {i:02d}')
+        response = self.client.get(reverse('blog_detail', args=[self.post.pk]))
+        self.assertContains(response, 'نظرات (<span data-live-count="comments">25</span>)')
+        self.assertContains(response, 'class="comment-item', count=10)
+        self.assertContains(response, 'نظر شماره 24')
+        self.assertNotContains(response, 'نظر شماره 14')
+
+        url = reverse('post_comments', args=[self.post.pk])
+        cursor, seen = response.context['comments_cursor'], 10
+        while cursor:
+            data = self.client.get(url, {'cursor': cursor}).json()
+            seen += data['count']
+            cursor = data['next_cursor']
+        self.assertEqual(seen, 25)
+        self.assertEqual(self.client.get(url, {'cursor': 'bad'}).status_code, 400)
+
+
+class PostSearchTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create(username='nevisande')
+        self.title_match = Post_blog.objects.create(
+            title='آموزش کتابخانه پایتون', text='متنی درباره برنامه‌نویسی وب', status='pub', author=self.author
+        )
+        self.text_match = Post_blog.objects.create(
+            title='یادداشت روزانه', text='امروز کمی درباره کتابخانه‌ها خواندم', status='pub', author=self.author
+        )
+        self.draft = Post_blog.objects.create(
+            title='پیش‌نویس کتابخانه', text='این پست هنوز منتشر نشده است', status='drf', author=self.author
+        )
+
+    def _search(self, query):
+        return [hit.post_id for hit in get_search_backend().search(query, 50)]
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text('كتاب‌هاي عَرَبي'), 'کتابهای عربی')
+        self.assertEqual(normalize_text('۱۴۰۲ و ١٢'), '1402 و 12')
+
+    def test_uses_full_text_backend(self):
+        self.assertIsInstance(get_search_backend(), SQLiteFTS5Backend)
+
+    def test_unavailable_index_is_rechecked(self):
+        search.reset_availability_cache()
+        self.addCleanup(search.reset_availability_cache)
+        with mock.patch.object(SQLiteFTS5Backend, 'is_available', return_value=False):
+            self.assertIsInstance(get_search_backend(), ContainsSearchBackend)
+        # جدول ایندکس بعدا ساخته شده است؛ نتیجه منفی تا پایان مهلتش کش می‌ماند
+        self.assertIsInstance(get_search_backend(), ContainsSearchBackend)
+        recheck = time.monotonic() + search.UNAVAILABLE_RECHECK_SECONDS
+        with mock.patch('myblog.search.time.monotonic', return_value=recheck):
+            get_search_backend()
+        self.assertIsInstance(get_search_backend(), SQLiteFTS5Backend)
+
+    def test_ranking_and_arabic_characters(self):
+        # «ك» و «ي» عربی باید با «ک» و «ی» فارسی یکسان در نظر گرفته شوند
+        self.assertEqual(self._search('كتابخانه'), [self.title_match.pk, self.text_match.pk])
+
+    def test_zwnj_is_ignored(self):
+        self.assertEqual(self._search('برنامه‌نویسی'), [self.title_match.pk])
+        self.assertEqual(self._search('برنامهنویسی'), [self.title_match.pk])
+
+    def test_drafts_are_not_indexed(self):
+        self.assertNotIn(self.draft.pk, self._search('پیش‌نویس'))
+        self.draft.status = 'pub'
+        self.draft.save()
+        self.assertIn(self.draft.pk, self._search('پیش‌نویس'))
+
+    def test_index_follows_updates_and_deletes(self):
+        self.text_match.text = 'موضوع کاملا متفاوت'
+        self.text_match.save()
+        self.assertEqual(self._search('کتابخانه'), [self.title_match.pk])
+        self.title_match.delete()
+        self.assertEqual(self._search('کتابخانه'), [])
+
+    def test_snippets_are_highlighted_and_escaped(self):
+        post = Post_blog.objects.create(
+            title='امنیت', text='<script>alert(1)</script> درباره امنیت وب', status='pub', author=self.author
+        )
+        snippet = get_search_backend().snippets('امنیت', [post.pk])[post.pk]
+        self.assertIn('<mark>امنیت</mark>', snippet)
+        self.assertNotIn('<script>', snippet)
+
+    def test_snippet_keeps_original_text(self):
+        text = 'آموزش Django برای وب‌سایت‌ها كه سریع‌تر اجرا می‌شود. ' + 'متن ' * 80 + 'پایان'
+        post = Post_blog.objects.create(title='چارچوب', text=text, status='pub', author=self.author)
+        snippet = get_search_backend().snippets('django میشود', [post.pk])[post.pk]
+        self.assertIn('آموزش <mark>Django</mark> برای وب‌سایت‌ها كه', snippet)
+        self.assertIn('<mark>می‌شود</mark>', snippet)
+        self.assertTrue(snippet.endswith('…'))
+        self.assertNotIn('پایان', snippet)
+
+    def test_post_list_search(self):
+        response = self.client.get(reverse('post_list'), {'q': 'کتابخانه'})
+        self.assertEqual(list(response.context['post_list']), [self.title_match, self.text_match])
+        self.assertContains(response, '<mark>')
+
+    def test_rebuild_search_index_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM myblog_post_search')
+        self.assertEqual(self._search('کتابخانه'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self._search('کتابخانه'), [self.title_match.pk, self.text_match.pk])
+
+
+class PerfBudgetTests(TestCase):
+    """بودجه تعداد کوئری همه مسیرها روی داده کوچک؛ زمان‌ها فقط در اجرای دستی بررسی می‌شوند"""
+    small_dataset = [
+        '--users', '40', '--posts', '60', '--comments', '200', '--likes', '200',
+        '--reactions', '100', '--repeat', '2',
+    ]
+
+    def test_every_route_within_query_budget(self):
+        output = Path(tempfile.mkdtemp()) / 'perf.json'
+        call_command('perf_budget', *self.small_dataset, '--queries-only', '--json', str(output), stdout=StringIO())
+        report = json.loads(output.read_text(encoding='utf-8'))
+        self.assertEqual(report['regressions'], [])
+        self.assertIn('blog_detail', report['views'])
+        self.assertEqual(report['views']['post_list']['status'], 200)
+
+    def test_query_regression_fails(self):
+        budgets = json.loads(Path(__file__).with_name('perf_budgets.json').read_text(encoding='utf-8'))
+        budgets['views']['blog_detail']['queries'] -= 1
+        path = Path(tempfile.mkdtemp()) / 'budgets.json'
+        path.write_text(json.dumps(budgets), encoding='utf-8')
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command(
+                'perf_budget', *self.small_dataset, '--queries-only', '--only', 'blog_detail',
+                '--budgets', str(path), stdout=out,
+            )
+        self.assertIn('blog_detail: queries', out.getvalue())
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create(username='writer')
+        Post_blog.objects.bulk_create(
+            Post_blog(title=f'پست {i}', text='متن پست', status='pub', author=self.author)
+            for i in range(14)
+        )
+        Post_blog.objects.create(title='پیش‌نویس', text='متن پست', status='drf', author=self.author)
+        # چند پست با زمان ویرایش یکسان تا ترتیب ثانویه بر اساس id بررسی شود
+        same_time = timezone.now()
+        Post_blog.objects.filter(pk__lte=5).update(datetime_modified=same_time)
+        self.expected = list(
+            Post_blog.objects.filter(status='pub').order_by('-datetime_modified', '-id')
+            .values_list('pk', flat=True)
+        )
+
+    def test_keyset_pages_cover_every_post_once(self):
+        seen, cursor = [], None
+        while True:
+            posts, cursor = keyset_page(Post_blog.objects.filter(status='pub'), cursor, page_size=4)
+            seen.extend(post.pk for post in posts)
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+
+    def test_keyset_page_does_not_count(self):
+        with self.assertNumQueries(1):
+            keyset_page(Post_blog.objects.all(), None, page_size=6)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not-a-cursor')
+        response = self.client.get(reverse('post_feed'), {'cursor': '%%%'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_feed_endpoint_continues_list_page(self):
+        response = self.client.get(reverse('post_list'))
+        cursor = response.context['next_cursor']
+        seen = [post.pk for post in response.context['post_list']]
+        while cursor:
+            data = self.client.get(reverse('post_feed'), {'cursor': cursor}).json()
+            self.assertTrue(data['success'])
+            ids = [int(pk) for pk in re.findall(r'data-post-id="(\d+)"', data['html'])]
+            self.assertEqual(len(ids), data['count'])
+            seen.extend(ids)
+            cursor = data['next_cursor']
+        self.assertEqual(seen, self.expected)
+
+    def test_page_number_urls_still_work(self):
+        response = self.client.get(reverse('post_list'), {'page': 3})
+        self.assertEqual(
+            [post.pk for post in response.context['post_list']], self.expected[12:]
+        )
+        self.assertNotIn('next_cursor', response.context)
+
+
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='cached-author')
+        self.reader = User.objects.create(username='cached-reader')
+        self.post = Post_blog.objects.create(
+            title='عنوان اولیه', text='متن پست کش شده', status='pub', author=self.author
+        )
+
+    def _rename_without_signals(self, title):
+        Post_blog.objects.filter(pk=self.post.pk).update(title=title)
+
+    def test_list_card_is_served_from_cache_until_activity(self):
+        self.assertContains(self.client.get(reverse('post_list')), 'عنوان اولیه')
+        self._rename_without_signals('عنوان پنهان')
+        self.assertNotContains(self.client.get(reverse('post_list')), '>عنوان پنهان</a>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.reader, text='نظر تازه')
+        self.assertContains(self.client.get(reverse('post_list')), '>عنوان پنهان</a>')
+
+    def test_detail_body_invalidated_by_post_save_and_reactions(self):
+        url = reverse('blog_detail', args=[self.post.pk])
+        self.client.get(url)
+        self._rename_without_signals('عنوان دوم')
+        self.assertNotContains(self.client.get(url), 'عنوان دوم</h1>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.set_emoji_reaction(self.reader, 'love')
+        self.assertContains(self.client.get(url), 'عنوان دوم</h1>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.refresh_from_db()
+            self.post.title = 'عنوان سوم'
+            self.post.save()
+        self.assertContains(self.client.get(url), 'عنوان سوم</h1>')
+
+    def test_liked_state_is_not_shared_between_users(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.toggle_like(self.reader)
+        self.client.force_login(self.reader)
+        self.assertContains(self.client.get(reverse('post_list')), 'like-btn liked')
+        self.client.force_login(self.author)
+        self.assertNotContains(self.client.get(reverse('post_list')), 'like-btn liked')
+
+    def test_list_versions_use_single_cache_lookup(self):
+        posts = [self.post] + [
+            Post_blog.objects.create(title=f'پست {i}', text='متن', status='pub', author=self.author)
+            for i in range(3)
+        ]
+        with mock.patch('myblog.caching.cache.get_many', wraps=cache.get_many) as get_many:
+            attach_cache_versions(posts)
+        self.assertEqual(get_many.call_count, 1)
+        self.assertEqual(len({post.cache_version for post in posts}), len(posts))
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='metrics-reader')
+        self.post = Post_blog.objects.create(title='پست متریک', text='متن', status='pub', author=self.user)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_latency_queries_render_and_size_per_view(self):
+        labels = {'view': 'blog_detail'}
+        before = {
+            name: self.sample(name, **labels)
+            for name in (
+                'django_db_queries_per_request_sum', 'django_template_render_seconds_count',
+                'django_response_size_bytes_sum',
+            )
+        }
+        requests_before = self.sample('django_requests_total', method='GET', status='200', **labels)
+        latency_before = self.sample('django_request_latency_seconds_count', method='GET', **labels)
+
+        response = self.client.get(reverse('blog_detail', args=[self.post.pk]))
+
+        self.assertEqual(self.sample('django_requests_total', method='GET', status='200', **labels), requests_before + 1)
+        self.assertEqual(self.sample('django_request_latency_seconds_count', method='GET', **labels), latency_before + 1)
+        self.assertGreater(self.sample('django_db_queries_per_request_sum', **labels), before['django_db_queries_per_request_sum'])
+        self.assertEqual(self.sample('django_template_render_seconds_count', **labels), before['django_template_render_seconds_count'] + 1)
+        self.assertEqual(
+            self.sample('django_response_size_bytes_sum', **labels),
+            before['django_response_size_bytes_sum'] + len(response.content),
+        )
+
+    def test_handled_like_error_is_logged_and_counted_as_500(self):
+        self.client.force_login(self.user)
+        labels = {'view': 'toggle_like', 'method': 'POST', 'status': '500'}
+        before = self.sample('django_requests_total', **labels)
+        with mock.patch.object(Post_blog, 'atoggle_like', side_effect=RuntimeError('boom')), \
+                self.assertLogs('myblog.views', 'ERROR') as logs:
+            response = self.client.post(reverse('toggle_like', args=[self.post.pk]))
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('boom', logs.output[0])
+        self.assertEqual(self.sample('django_requests_total', **labels), before + 1)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_requires_token(self):
+        self.client.get(reverse('post_list'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'django_request_latency_seconds_bucket{', response.content)
+        self.assertIn(b'view="post_list"', response.content)
+
+
+def _with_server_timing():
+    middleware = list(settings.MIDDLEWARE)
+    middleware.insert(middleware.index('myblog.metrics.metrics_middleware') + 1, 'myblog.timing.server_timing_middleware')
+    return override_settings(MIDDLEWARE=middleware, SLOW_REQUEST_MS=10_000)
+
+
+@_with_server_timing()
+class ServerTimingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='timing-reader')
+        self.post = Post_blog.objects.create(title='پست زمان‌سنجی', text='متن', status='pub', author=self.user)
+
+    def timings(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_pages_and_reaction_endpoints_get_server_timing(self):
+        self.client.force_login(self.user)
+        detail = self.timings(self.client.get(reverse('blog_detail', args=[self.post.pk])))
+        self.assertEqual(set(detail), {'db', 'tpl', 'cache', 'view', 'total'})
+        self.assertNotEqual(detail['db']['desc'], '"0 queries"')
+        self.assertGreater(float(detail['tpl']['dur']), 0)
+        self.assertNotEqual(detail['cache']['desc'], '"0 calls"')
+
+        self.assertIn('db', self.timings(self.client.get(reverse('post_list'))))
+        for name, data in (('toggle_like', {}), ('add_emoji_reaction', {'emoji_type': 'wow'})):
+            response = self.client.post(reverse(name, args=[self.post.pk]), data)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(self.timings(response)['db']['desc'], '"0 queries"')
+
+    def test_slow_request_logs_view_and_sql(self):
+        url = reverse('blog_detail', args=[self.post.pk])
+        with self.assertNoLogs('myblog.slow_requests'):
+            self.client.get(url)
+        with override_settings(SLOW_REQUEST_MS=0), self.assertLogs('myblog.slow_requests', 'WARNING') as logs:
+            self.client.get(url)
+        entry = logs.records[0].slow_request
+        self.assertEqual(entry['view'], 'blog_detail')
+        self.assertEqual(entry['queries'], len(entry['sql']))
+        self.assertTrue(any('myblog_post_blog' in query['sql'] for query in entry['sql']))
+        self.assertEqual(json.loads(logs.records[0].getMessage())['status'], 200)
+
+
+class RequestProfilingTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.override = override_settings(PROFILE_ROOT=self.root, PROFILE_KEEP=2)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+        self.staff = User.objects.create(username='profiler', is_staff=True)
+        self.post = Post_blog.objects.create(title='پست پروفایل', text='متن', status='pub', author=self.staff)
+        self.detail = reverse('blog_detail', args=[self.post.pk])
+
+    def test_only_staff_requests_are_profiled(self):
+        self.assertNotIn('X-Profile-Id', self.client.get(self.detail + '?_profile=1'))
+        self.client.force_login(User.objects.create(username='reader'))
+        self.assertNotIn('X-Profile-Id', self.client.get(self.detail + '?_profile=1'))
+        self.client.force_login(self.staff)
+        self.assertNotIn('X-Profile-Id', self.client.get(self.detail))
+        self.assertEqual(list(Path(self.root).iterdir()), [])
+
+        response = self.client.get(self.detail + '?_profile=1')
+        name = response['X-Profile-Id']
+        self.assertIn('blog_detail', name)
+        functions = {function for _, _, function in pstats.Stats(str(Path(self.root) / name)).stats}
+        self.assertIn('post_detail_view', functions)
+
+        # فقط PROFILE_KEEP پروفایل آخر نگهداری می‌شود
+        for _ in range(2):
+            self.client.get(self.detail, HTTP_X_PROFILE='1')
+        self.assertEqual(len(list(Path(self.root).iterdir())), 2)
+
+    async def test_async_reaction_view_profiled_under_asgi(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.post(
+            reverse('toggle_like', args=[self.post.pk]), headers={'X-Profile': '1'},
+        )
+        self.assertEqual(response.json()['likes_count'], 1)
+        stats = pstats.Stats(str(Path(self.root) / response['X-Profile-Id']))
+        functions = {function for _, _, function in stats.stats}
+        self.assertIn('toggle_like', functions)
+        # ORM در thread همزمان همان درخواست اجرا شده و در پروفایل ادغام شده است
+        self.assertIn('_add_like', functions)
+
+    async def test_async_path_falls_back_when_profiler_is_busy(self):
+        await self.async_client.aforce_login(self.staff)
+        url = reverse('toggle_like', args=[self.post.pk])
+        # درخواست پروفایل شده دیگری در همین پردازه در حال اجراست
+        with profiling._profile_lock:
+            busy = await self.async_client.post(url, headers={'X-Profile': '1'})
+        self.assertEqual(busy.status_code, 200)
+        self.assertNotIn('X-Profile-Id', busy)
+
+        # ابزار پروفایل دیگری فعال است (ValueError از 3.12 به بعد)
+        with mock.patch.object(profiling.cProfile, 'Profile') as profile:
+            profile.return_value.enable.side_effect = ValueError('Another profiling tool is already active')
+            blocked = await self.async_client.post(url, headers={'X-Profile': '1'})
+        self.assertEqual(blocked.status_code, 200)
+        self.assertNotIn('X-Profile-Id', blocked)
+        self.assertFalse(profiling._profile_lock.locked())
+
+        # پروفایلرها و قفل آزاد شده‌اند و درخواست بعدی پروفایل می‌شود
+        response = await self.async_client.post(url, headers={'X-Profile': '1'})
+        self.assertIn('X-Profile-Id', response)
+        self.assertFalse(profiling._profile_lock.locked())
+
+    def test_admin_lists_and_downloads_profiles(self):
+        self.assertEqual(self.client.get(reverse('request_profiles')).status_code, 302)
+        self.client.force_login(self.staff)
+        name = self.client.get(self.detail + '?_profile=1')['X-Profile-Id']
+
+        self.assertContains(self.client.get(reverse('request_profiles')), name)
+        summary = reverse('request_profile_summary', args=[name])
+        self.assertContains(self.client.get(summary), 'post_detail_view')
+        self.assertContains(self.client.get(summary, {'sort': 'tottime'}), '<strong>tottime</strong>')
+        download = self.client.get(reverse('request_profile_download', args=[name]))
+        self.assertEqual(b''.join(download.streaming_content), (Path(self.root) / name).read_bytes())
+        self.assertEqual(self.client.get(reverse('request_profile_download', args=['..secret'])).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='etag-author')
+        self.reader = User.objects.create(username='etag-reader')
+        self.post = Post_blog.objects.create(
+            title='پست شرطی', text='متن', status='pub', author=self.author
+        )
+        self.url = reverse('blog_detail', args=[self.post.pk])
+
+    def test_detail_revalidation_skips_page_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        # نسخه ناشناس نباید کوکی بگذارد تا پراکسی بتواند آن را کش کند
+        self.assertNotIn('csrftoken', response.cookies)
+
+        with self.assertNumQueries(1):
+            revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        since = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+    def test_pending_message_bypasses_revalidation(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.post(self.url, {'comment_submit': '1', 'text': 'نظر'})
+        self.assertIn('messages', self.client.cookies)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)],
+            ['برای ثبت نظر باید وارد حساب کاربری خود شوید.'],
+        )
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_activity_changes_detail_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.reader, text='نظر')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_user_variant_is_private(self):
+        anonymous_etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.reader)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_list_revalidation_without_queries(self):
+        url = reverse('post_list') + '?page=1'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.toggle_like(self.reader)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_post_still_404(self):
+        self.assertEqual(self.client.get(reverse('blog_detail', args=[self.post.pk + 100])).status_code, 404)
+
+
+class PrerenderedPagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        override = override_settings(PRERENDER_ROOT=self.root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        prerender._manifest_cache.update(mtime=None, pages={})
+        self.url = reverse('projects')
+
+    def test_falls_back_to_view_without_manifest(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertTemplateUsed(response, 'myblog/projects.html')
+
+    def test_serves_prerendered_page_with_etag_and_304(self):
+        call_command('prerender_pages', stdout=StringIO())
+        rendered = self.client.get(self.url, HTTP_ACCEPT_ENCODING='identity')
+        self.assertEqual(rendered.status_code, 200)
+        self.assertFalse(rendered.templates)
+        self.assertNotIn('Content-Encoding', rendered)
+        self.assertIn('Accept-Encoding', rendered['Vary'])
+
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=rendered['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+
+    def test_prefers_brotli_then_gzip(self):
+        call_command('prerender_pages', stdout=StringIO())
+        identity = self.client.get(self.url).content
+
+        gzipped = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.content), identity)
+
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(compressed['Content-Encoding'], 'br')
+        self.assertNotEqual(compressed['ETag'], gzipped['ETag'])
+
+        refused = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(refused['Content-Encoding'], 'gzip')
+
+    def test_authenticated_user_gets_normal_render(self):
+        call_command('prerender_pages', stdout=StringIO())
+        user = User.objects.create_user(username='reader', password='pass')
+        self.client.force_login(user)
+        response = self.client.get(self.url)
+        self.assertTemplateUsed(response, 'myblog/projects.html')
+        self.assertContains(response, 'reader')
+
+
+def _jpeg_upload(size, name='photo.jpg'):
+    buffer = BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = 'TestCamera'
+    Image.new('RGB', size, (200, 80, 40)).save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageVariantTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name, IMAGE_VARIANT_WORKERS=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.author = User.objects.create(username='photographer')
+
+    def _create_post(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post_blog.objects.create(
+                title='پست تصویری', text='متن', status='pub', author=self.author, image=image
+            )
+
+    def test_upload_builds_stripped_variants_with_dimensions(self):
+        post = self._create_post(_jpeg_upload((2000, 1000)))
+        post.refresh_from_db()
+
+        self.assertEqual((post.image_width, post.image_height), (2000, 1000))
+        self.assertEqual(
+            {name: (v['width'], v['height']) for name, v in post.image_variants.items()},
+            {'thumb': (320, 160), 'card': (640, 320), 'full': (1280, 640)},
+        )
+        card = Path(self.media.name, post.image_variants['card']['webp'])
+        with Image.open(card) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertNotIn('exif', image.info)
+        with Image.open(Path(self.media.name, post.image_variants['card']['jpeg'])) as image:
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_small_image_is_not_upscaled(self):
+        post = self._create_post(_jpeg_upload((300, 200)))
+        post.refresh_from_db()
+        self.assertEqual({v['width'] for v in post.image_variants.values()}, {300})
+        html = Template("{% load post_images %}{% image_srcset post 'webp' %}").render(Context({'post': post}))
+        self.assertEqual(html.count(' 300w'), 1)
+
+    def test_picture_tag_renders_srcset_and_size(self):
+        post = self._create_post(_jpeg_upload((2000, 1000)))
+        post.refresh_from_db()
+        html = Template("{% load post_images %}{% post_picture post 'card' %}").render(Context({'post': post}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('-full.webp 1280w', html)
+        self.assertIn('width="640" height="320"', html)
+
+    def test_saving_without_image_change_does_not_rebuild(self):
+        post = self._create_post(_jpeg_upload((800, 600)))
+        post = Post_blog.objects.get(pk=post.pk)
+        with mock.patch('myblog.signals.schedule_variants') as schedule:
+            post.title = 'عنوان جدید'
+            post.save()
+        schedule.assert_not_called()
+
+    def test_backfill_command_builds_missing_variants(self):
+        with mock.patch('myblog.signals.schedule_variants'):
+            post = self._create_post(_jpeg_upload((1600, 900)))
+        self.assertEqual(post.image_variants, {})
+
+        out = StringIO()
+        call_command('build_image_variants', stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants['card']['width'], 640)
+        self.assertIn('1 ', out.getvalue())
+
+
+class ServiceWorkerTests(TestCase):
+    def _write_manifest(self, root, paths):
+        manifest = {'paths': paths, 'version': '1.1', 'hash': 'test'}
+        (Path(root) / 'staticfiles.json').write_text(json.dumps(manifest))
+
+    def _manifest_storage(self, root):
+        return override_settings(STATIC_ROOT=root, STORAGES={
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+        })
+
+    def test_served_from_site_root_with_versioned_precache(self):
+        response = self.client.get(reverse('sw.js'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/javascript')
+        self.assertIn('no-cache', response['Cache-Control'])
+        body = response.content.decode()
+        # بدون collectstatic hash محتوا به صورت ?v= اضافه می‌شود
+        self.assertRegex(body, r'"/static/images/favicon\.ico\?v=[0-9a-f]{12}"')
+        self.assertIn(f'"/offline/?v={settings.PAGE_CACHE_VERSION}"', body)
+        version = response['ETag'].strip('"')
+        self.assertIn(f"const VERSION = '{version}';", body)
+
+        revalidated = self.client.get(reverse('sw.js'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_only_public_pages_are_cached_by_worker(self):
+        body = self.client.get(reverse('sw.js')).content.decode()
+        self.assertIn("directives.includes('public') && !directives.includes('private')", body)
+        patterns = json.loads(re.search(r'const UNCACHED_PAGES = (\[.*?\])\.map', body).group(1))
+        for path in (reverse('login'), reverse('admin:index'), reverse('post_create'), reverse('post_update', args=[7])):
+            self.assertTrue(any(re.search(pattern, path) for pattern in patterns), path)
+        self.assertFalse([pattern for pattern in patterns if re.search(pattern, reverse('blog_detail', args=[7]))])
+
+        # صفحات نمایشی هم برای کاربر وارد شده private هستند و ذخیره نمی‌شوند
+        self.assertIn('public', self.client.get(reverse('about_me'))['Cache-Control'])
+        self.client.force_login(User.objects.create(username='sw-reader'))
+        for name in ('about_me', 'projects', 'post_list'):
+            self.assertIn('private', self.client.get(reverse(name))['Cache-Control'])
+
+    def test_precache_uses_hashed_names_from_manifest(self):
+        from .pwa import precache_manifest
+
+        with tempfile.TemporaryDirectory() as root, self._manifest_storage(root):
+            paths = {
+                'css/style.css': 'css/style.aaa111.css',
+                'images/favicon.ico': 'images/favicon.bbb222.ico',
+                'admin/css/base.css': 'admin/css/base.ccc333.css',
+            }
+            self._write_manifest(root, paths)
+            first = precache_manifest()
+            self.assertIn('/static/css/style.aaa111.css', first['urls'])
+            self.assertIn('/static/images/favicon.bbb222.ico', first['urls'])
+            self.assertFalse([url for url in first['urls'] if '/admin/' in url])
+
+            # تغییر یک فایل فقط آدرس همان فایل و نسخه sw.js را عوض می‌کند
+            self._write_manifest(root, {**paths, 'css/style.css': 'css/style.ddd444.css'})
+            with self._manifest_storage(root):
+                second = precache_manifest()
+        self.assertNotEqual(first['version'], second['version'])
+        self.assertEqual(set(first['urls']) - set(second['urls']), {'/static/css/style.aaa111.css'})
+        self.assertIn('/static/images/favicon.bbb222.ico', second['urls'])
+
+
+class OfflineFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='12345')
+        self.posts = [
+            Post_blog.objects.create(title=f'پست {i}', text=f'متن {i}', status='pub', author=self.user)
+            for i in range(3)
+        ]
+        Post_blog.objects.create(title='پیش‌نویس', text='متن', status='drf', author=self.user)
+        self.url = reverse('offline_feed')
+
+    def test_full_feed_has_rendered_published_posts(self):
+        data = self.client.get(self.url).json()
+        self.assertTrue(data['reset'])
+        self.assertEqual(data['ids'], [post.pk for post in reversed(self.posts)])
+        first = data['posts'][0]
+        self.assertEqual(first['url'], self.posts[-1].get_absolute_url())
+        self.assertIn('<p>متن 2</p>', first['html'])
+        self.assertIsNone(first['thumbnail'])
+
+    def test_delta_contains_only_changes_since_version(self):
+        version = self.client.get(self.url).json()['version']
+        unchanged = self.client.get(self.url, {'since': version}).json()
+        self.assertEqual((unchanged['posts'], unchanged['removed']), ([], []))
+        self.assertEqual(unchanged['version'], version)
+
+        edited, deleted = self.posts[0], self.posts[1]
+        deleted_pk = deleted.pk
+        edited.text = 'متن ویرایش شده'
+        edited.save()
+        deleted.delete()
+        with self.assertNumQueries(2):
+            delta = self.client.get(self.url, {'since': version}).json()
+        self.assertFalse(delta['reset'])
+        self.assertEqual([post['id'] for post in delta['posts']], [edited.pk])
+        self.assertEqual(delta['removed'], [deleted_pk])
+
+    def test_etag_ignores_likes_and_follows_edits(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[0].set_like(self.user, True)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[0].text = 'متن ویرایش شده'
+            self.posts[0].save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalid_version_resets_client(self):
+        data = self.client.get(self.url, {'since': 'not-a-version'}).json()
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['posts']), 3)
+
+
+class RealtimeCountsTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='12345')
+        self.reader = User.objects.create_user(username='reader', password='12345')
+        self.post = Post_blog.objects.create(title='پست زنده', text='متن', status='pub', author=self.author)
+        self.url = reverse('post_events')
+
+    def test_write_paths_publish_deltas_after_commit(self):
+        channel = post_channel(self.post.pk)
+        with mock.patch.object(Broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.set_like(self.reader, True)
+                self.post.set_emoji_reaction(self.reader, 'love')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.set_emoji_reaction(self.reader, 'wow')
+                Comment.objects.create(post=self.post, author=self.reader, text='نظر')
+        self.assertEqual([call.args for call in publish.call_args_list], [
+            (channel, {'post': self.post.pk, 'likes': 1, 'likes_total': 1}),
+            (channel, {'post': self.post.pk, 'emoji': {'love': 1}}),
+            (channel, {'post': self.post.pk, 'emoji': {'love': -1, 'wow': 1}}),
+            (channel, {'post': self.post.pk, 'comments': 1}),
+        ])
+
+    def test_nothing_published_when_transaction_rolls_back(self):
+        with mock.patch.object(Broker, 'publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.post.set_like(self.reader, True)
+                transaction.set_rollback(True)
+        publish.assert_not_called()
+
+    async def test_stream_fans_out_published_events(self):
+        response = await self.async_client.get(self.url, {'ids': str(self.post.pk)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        try:
+            self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+            self.assertIn(b'event: snapshot\n', await anext(stream))
+            get_broker().publish(post_channel(self.post.pk), {'post': self.post.pk, 'likes': 1})
+            get_broker().publish(post_channel(self.post.pk + 1), {'post': self.post.pk + 1, 'likes': 1})
+            chunk = (await anext(stream)).decode()
+        finally:
+            await stream.aclose()
+        self.assertIn('event: counts\n', chunk)
+        self.assertIn(f'data: {{"post":{self.post.pk},"likes":1}}', chunk)
+
+    async def test_every_connection_starts_with_snapshot(self):
+        await EmojiReactionCount.objects.acreate(post=self.post, emoji_type='love', count=2)
+        response = await self.async_client.get(self.url, {'ids': str(self.post.pk)})
+        stream = response.streaming_content
+        try:
+            await anext(stream)
+            snapshot = (await anext(stream)).decode()
+        finally:
+            await stream.aclose()
+        self.assertIn('event: snapshot\n', snapshot)
+        data = json.loads(snapshot.split('data: ', 1)[1])
+        self.assertEqual(data, [{'post': self.post.pk, 'likes': 0, 'comments': 0, 'emoji': {'love': 2}}])
+
+    def test_invalid_ids_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'ids': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+@override_settings(COUNTER_WRITE_BEHIND=True)
+class CounterWriteBehindTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='12345')
+        self.readers = [User.objects.create_user(username=f'reader{i}', password='12345') for i in range(3)]
+        self.post = Post_blog.objects.create(title='پست پرطرفدار', text='متن', status='pub', author=self.author)
+
+    def stored(self):
+        self.post.refresh_from_db()
+        return self.post.likes_count, dict(self.post.emoji_counts.values_list('emoji_type', 'count'))
+
+    def test_counts_buffered_and_merged_until_flush(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for reader in self.readers:
+                self.post.set_like(reader, True)
+            self.post.set_emoji_reaction(self.readers[0], 'love')
+        # ردیف‌های لایک همزمان نوشته می‌شوند و فقط شمارنده‌ها بافر می‌شوند
+        self.assertEqual(self.post.liked_by.count(), 3)
+        self.assertEqual(self.stored(), (0, {}))
+
+        self.client.force_login(self.readers[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('toggle_like', args=[self.post.pk]))
+        self.assertEqual(response.json()['likes_count'], 2)
+        response = self.client.get(reverse('blog_detail', args=[self.post.pk]))
+        self.assertContains(response, '<strong data-live-count="likes">2</strong>')
+        self.assertEqual(response.context['emojis_summary'], {'love': 1})
+
+        self.assertEqual(counters.flush(), 1)
+        self.assertEqual(self.stored(), (2, {'love': 1}))
+        self.assertEqual(counters.pending([self.post.pk]), {})
+        # flush بعدی چیزی برای نوشتن ندارد
+        self.assertEqual(counters.flush(), 0)
+        self.assertEqual(self.stored(), (2, {'love': 1}))
+
+    def test_failed_flush_keeps_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.set_like(self.readers[0], True)
+        with mock.patch('myblog.counters._write', side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                counters.flush()
+        self.assertEqual(counters.pending([self.post.pk])[self.post.pk]['likes'], 1)
+        self.assertEqual(counters.flush(), 1)
+        self.assertEqual(self.stored(), (1, {}))
+
+    def test_reconcile_rebuilds_lost_deltas_from_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.set_like(self.readers[0], True)
+            self.post.set_emoji_reaction(self.readers[0], 'wow')
+        # از دست رفتن کش (راه‌اندازی مجدد Redis) تغییرهای بافر شده را حذف می‌کند
+        cache.clear()
+        self.assertEqual(counters.reconcile(), (1, 1))
+        self.assertEqual(self.stored(), (1, {'wow': 1}))
+        with self.assertRaises(CommandError):
+            call_command('reconcile_like_counts', stdout=StringIO())
+
+    def test_resaving_unloaded_reaction_keeps_buffered_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.set_emoji_reaction(self.readers[0], 'love')
+        reaction = EmojiReaction.objects.get(post=self.post)
+        with self.captureOnCommitCallbacks(execute=True):
+            # شیء بدون from_db: نوع قبلی واکنش مشخص نیست
+            EmojiReaction(
+                pk=reaction.pk, post=self.post, user=self.readers[0], emoji_type='love',
+                datetime_create=reaction.datetime_create,
+            ).save()
+        counters.flush()
+        self.assertEqual(self.stored(), (0, {'love': 1}))
+
+    def test_reconcile_does_not_double_count_changes_buffered_during_recount(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.set_like(self.readers[0], True)
+        cache.clear()
+        recount = Post_blog.reconcile_like_counts
+
+        def racing_recount(*args, **kwargs):
+            # ردیف‌ها پیش از شمارش commit و تغییرها پس از آن در کش اضافه می‌شوند
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.set_like(self.readers[1], True)
+                self.post.set_emoji_reaction(self.readers[1], 'love')
+                return recount(*args, **kwargs)
+
+        with mock.patch.object(Post_blog, 'reconcile_like_counts', racing_recount):
+            counters.reconcile()
+        counters.flush()
+        self.assertEqual(self.stored(), (2, {'love': 1}))
+
+
+class SessionFreeReadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='12345')
+        self.post = Post_blog.objects.create(title='پست', text='متن', status='pub', author=self.author)
+        self.pages = [reverse('post_list'), reverse('blog_detail', args=[self.post.pk]), reverse('about_me')]
+
+    def session_queries(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return [query['sql'] for query in queries.captured_queries if 'django_session' in query['sql']]
+
+    def test_anonymous_messages_and_reads_never_touch_sessions(self):
+        detail = self.pages[1]
+        response = self.client.post(detail, {'comment_submit': '1', 'text': 'نظر'})
+        self.assertRedirects(response, f"{reverse('login')}?next={detail}", fetch_redirect_response=False)
+        self.client.post(reverse('login'), {'username': 'nobody', 'password': 'wrong'})
+        # پیام‌ها فقط در کوکی ذخیره می‌شوند
+        self.assertIn('messages', self.client.cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+        for path in self.pages:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.cookies)
+            self.assertEqual(
+                [q['sql'] for q in queries.captured_queries if not q['sql'].startswith('SELECT')], [],
+            )
+            self.assertFalse([q for q in queries.captured_queries if 'django_session' in q['sql']])
+        self.assertFalse(Session.objects.exists())
+
+    def test_logged_in_session_read_from_cache(self):
+        self.client.force_login(self.author)
+        self.client.get(self.pages[0])
+        self.assertEqual(self.session_queries(lambda: self.client.get(self.pages[1])), [])
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='page-author')
+        self.reader = User.objects.create(username='page-reader')
+        self.post, self.other = Post_blog.objects.bulk_create(
+            Post_blog(title=title, text='متن', status='pub', author=self.author) for title in ('اول', 'دوم')
+        )
+        self.list_url = reverse('post_list')
+        self.detail_url = reverse('blog_detail', args=[self.post.pk])
+        self.other_url = reverse('blog_detail', args=[self.other.pk])
+
+    def fetch(self, url):
+        return self.client.get(url)[pagecache.CACHE_HEADER]
+
+    def test_anonymous_hit_without_queries(self):
+        first = self.client.get(self.detail_url)
+        self.assertEqual(first[pagecache.CACHE_HEADER], 'miss')
+        # فقط کوئری Last-Modified در conditional_page
+        with self.assertNumQueries(1):
+            second = self.client.get(self.detail_url)
+        self.assertEqual(second[pagecache.CACHE_HEADER], 'hit')
+        self.assertEqual(second.content, first.content)
+        self.assertIn('public', second['Cache-Control'])
+
+        self.client.force_login(self.reader)
+        self.assertNotIn(pagecache.CACHE_HEADER, self.client.get(self.detail_url))
+
+    def test_activity_purges_only_pages_showing_the_post(self):
+        for url in (self.list_url, self.detail_url, self.other_url):
+            self.fetch(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.reader, text='نظر')
+        self.assertEqual(self.fetch(self.other_url), 'hit')
+        self.assertEqual(self.fetch(self.detail_url), 'miss')
+        self.assertEqual(self.fetch(self.list_url), 'miss')
+        self.assertContains(self.client.get(self.detail_url), 'نظر')
+
+    def test_new_post_purges_lists(self):
+        self.fetch(self.list_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post_blog.objects.create(title='پست تازه', text='متن', status='pub', author=self.author)
+        self.assertEqual(self.fetch(self.detail_url), 'miss')
+        response = self.client.get(self.list_url)
+        self.assertEqual(response[pagecache.CACHE_HEADER], 'miss')
+        self.assertContains(response, 'پست تازه')
+
+    def test_concurrent_rebuild_serves_stale_copy(self):
+        self.fetch(self.detail_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.toggle_like(self.reader)
+        # درخواست دیگری قفل بازسازی همین صفحه را گرفته است
+        key = pagecache.page_key(RequestFactory().get(self.detail_url))
+        cache.add(pagecache.LOCK_KEY.format(key), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.fetch(self.detail_url), 'stale')
+
+
+class BlogTransferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='transfer-author', password='12345', first_name='علی')
+        self.reader = User.objects.create(username='transfer-reader')
+        self.post = Post_blog.objects.create(title='پست قدیمی کتابخانه', text='متن', status='pub', author=self.author)
+        self.draft = Post_blog.objects.create(title='پیش‌نویس', text='متن', status='drf', author=self.author)
+        self.old = timezone.now() - timezone.timedelta(days=400)
+        Post_blog.objects.filter(pk=self.post.pk).update(datetime_create=self.old, datetime_modified=self.old)
+        Comment.objects.create(post=self.post, author=self.reader, text='نظر اول')
+        Comment.objects.create(post=self.post, author=self.reader, text='نظر مخفی', is_active=False)
+        self.post.set_like(self.reader, True)
+        self.post.set_emoji_reaction(self.reader, 'love')
+        self.path = Path(tempfile.mkdtemp()) / 'blog.jsonl.gz'
+        call_command('export_blog', str(self.path), stdout=StringIO())
+
+    def read_lines(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as file:
+            return file.readlines()
+
+    def imported_post(self):
+        return Post_blog.objects.exclude(pk__in=[self.post.pk, self.draft.pk]).get(title=self.post.title)
+
+    def test_round_trip_remaps_ids_and_preserves_timestamps(self):
+        call_command('import_blog', str(self.path), '--batch-size', '2', stdout=StringIO())
+        copy = self.imported_post()
+        self.assertNotEqual(copy.pk, self.post.pk)
+        self.assertEqual(copy.datetime_create, self.old)
+        self.assertEqual(copy.datetime_modified, self.old)
+        self.assertEqual((copy.likes_count, copy.comments_count), (1, 1))
+        self.assertEqual(copy.comments.count(), 2)
+        self.assertEqual(copy.get_emojis_summary(), {'love': 1})
+        self.assertTrue(copy.liked_by.filter(pk=self.reader.pk).exists())
+        self.assertEqual(Post_blog.objects.filter(title='پیش‌نویس').count(), 2)
+        # کاربران موجود با username پیدا می‌شوند و دوباره ساخته نمی‌شوند
+        self.assertEqual(User.objects.count(), 2)
+        self.assertIn(copy.pk, [hit.post_id for hit in get_search_backend().search('کتابخانه', 10)])
+
+        out = StringIO()
+        call_command('import_blog', str(self.path), stdout=out)
+        self.assertIn('قبلا کامل وارد شده', out.getvalue())
+        self.assertEqual(Post_blog.objects.count(), 4)
+
+    def test_resumes_after_interruption(self):
+        lines = self.read_lines()
+        # قطع شدن پس از نوشتن بخشی از فایل (رکورد ناقص در خط آخر)
+        broken = self.path.with_name('broken.jsonl')
+        broken.write_text(''.join(lines[:-2]) + '{"type": "reac', encoding='utf-8')
+        with self.assertRaises(CommandError):
+            call_command('import_blog', str(broken), '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(Post_blog.objects.count(), 4)
+
+        broken.write_text(''.join(lines), encoding='utf-8')
+        out = StringIO()
+        call_command('import_blog', str(broken), '--batch-size', '1', stdout=out)
+        self.assertIn(f'ادامه ورود از خط {len(lines) - 1}', out.getvalue())
+        self.assertEqual(Post_blog.objects.count(), 4)
+        copy = self.imported_post()
+        self.assertEqual(copy.comments.count(), 2)
+        self.assertEqual((copy.likes_count, copy.get_emojis_summary()), (1, {'love': 1}))
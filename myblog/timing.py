@@ -0,0 +1,79 @@
+"""
+سربرگ Server-Timing و لاگ درخواست‌های کند.
+
+با SERVER_TIMING=1 این middleware به MIDDLEWARE اضافه می‌شود و در هر پاسخ زمان پایگاه
+داده، رندر قالب، کش و باقی کد ویو را برای devtools مرورگر می‌نویسد. درخواست‌هایی که از
+SLOW_REQUEST_MS طولانی‌تر شوند با متن و زمان کوئری‌هایشان به صورت JSON در logger
+myblog.slow_requests ثبت می‌شوند.
+"""
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import request_stats, view_name
+
+slow_logger = logging.getLogger('myblog.slow_requests')
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def server_timing_header(stats, total):
+    # view زمان کد پایتون ویو و middlewareها بدون پایگاه داده، قالب و کش است
+    view = max(0.0, total - stats.db_time - stats.render_time - stats.cache_time)
+    return ', '.join((
+        f'db;dur={_ms(stats.db_time)};desc="{stats.queries} queries"',
+        f'tpl;dur={_ms(stats.render_time)};desc="template"',
+        f'cache;dur={_ms(stats.cache_time)};desc="{stats.cache_calls} calls"',
+        f'view;dur={_ms(view)};desc="view"',
+        f'total;dur={_ms(total)}',
+    ))
+
+
+def log_slow_request(request, response, stats, total):
+    entry = {
+        'view': view_name(request),
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': _ms(total),
+        'db_ms': _ms(stats.db_time),
+        'template_ms': _ms(stats.render_time),
+        'cache_ms': _ms(stats.cache_time),
+        'queries': stats.queries,
+        # فقط متن کوئری بدون پارامترها تا داده کاربران در لاگ نوشته نشود
+        'sql': [{'sql': sql, 'ms': _ms(duration)} for sql, duration in stats.sql],
+    }
+    slow_logger.warning(json.dumps(entry, ensure_ascii=False), extra={'slow_request': entry})
+
+
+def _finish(request, response, stats, started):
+    total = time.perf_counter() - started
+    response['Server-Timing'] = server_timing_header(stats, total)
+    if total * 1000 >= settings.SLOW_REQUEST_MS:
+        log_slow_request(request, response, stats, total)
+    return response
+
+
+@sync_and_async_middleware
+def server_timing_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            with request_stats() as stats:
+                stats.sql, stats.max_sql = [], settings.SLOW_REQUEST_MAX_QUERIES
+                response = await get_response(request)
+            return _finish(request, response, stats, started)
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            with request_stats() as stats:
+                stats.sql, stats.max_sql = [], settings.SLOW_REQUEST_MAX_QUERIES
+                response = get_response(request)
+            return _finish(request, response, stats, started)
+    return middleware
@@ -0,0 +1,356 @@
+"""
+خروجی و ورودی JSONL محتوای وبلاگ (دستورات export_blog و import_blog).
+
+هر خط یک رکورد JSON با کلید type است. فایل با یک header (شناسه یکتای خروجی) شروع می‌شود
+و بعد از آن کاربران، پست‌ها، نظرات، واکنش‌ها و لایک‌ها به همین ترتیب می‌آیند تا هر رکورد
+فقط به رکوردهای قبل از خود نیاز داشته باشد. شناسه پست‌ها شناسه پایگاه داده مبدا است و
+هنگام ورود به شناسه‌های جدید نگاشت می‌شود؛ کاربران با username شناخته می‌شوند. رمز عبور
+خروجی گرفته نمی‌شود و کاربران جدید رمز غیرقابل استفاده دارند.
+
+خروجی با values_list و iterator خوانده می‌شود و حافظه آن به تعداد ردیف‌ها بستگی ندارد.
+ورود در دسته‌های bulk_create انجام می‌شود و هر دسته همراه یک ImportCheckpoint (شماره آخرین
+خط و نگاشت شناسه پست‌های همان دسته) در یک تراکنش commit می‌شود؛ اجرای دوباره همان فایل
+پس از قطع شدن از اولین خط commit نشده ادامه می‌دهد. فقط نگاشت شناسه پست‌ها و کاربران در
+حافظه نگه داشته می‌شود. bulk_create سیگنال ندارد، پس شمارنده‌ها و ایندکس جستجوی پست‌های
+وارد شده در پایان یک‌جا ساخته می‌شوند.
+"""
+import contextlib
+import gzip
+import json
+import sys
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import bump_list_structure
+from .models import Comment, EmojiReaction, EmojiReactionCount, ImportCheckpoint, Post_blog
+from .search import get_search_backend, indexable_rows
+
+FORMAT = 'myblog-jsonl'
+FORMAT_VERSION = 1
+
+# فیلدهای لازم هر نوع رکورد
+REQUIRED_FIELDS = {
+    'user': ('username',),
+    'post': ('id', 'author', 'title', 'text', 'status'),
+    'comment': ('post', 'author', 'text'),
+    'reaction': ('post', 'user', 'emoji'),
+    'like': ('post', 'user'),
+}
+
+
+class InvalidExport(ValueError):
+    pass
+
+
+def open_jsonl(path, mode):
+    """فایل JSONL؛ '-' یعنی stdin یا stdout و پسوند .gz یعنی فشرده با gzip"""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def dump_record(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def _iso(moment):
+    return moment.isoformat() if moment is not None else None
+
+
+def _datetime(value, default=None):
+    if not value:
+        return default or timezone.now()
+    moment = datetime.fromisoformat(value)
+    if settings.USE_TZ and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_records(batch_size=5000):
+    """رکوردهای خروجی به ترتیب فایل؛ هر نوع با یک کوئری iterator خوانده می‌شود"""
+    yield {
+        'type': 'header',
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        'export_id': uuid.uuid4().hex,
+        'exported_at': timezone.now().isoformat(),
+    }
+    users = User.objects.order_by('pk').values_list('username', 'first_name', 'last_name', 'email', 'date_joined')
+    for username, first_name, last_name, email, joined in users.iterator(chunk_size=batch_size):
+        yield {
+            'type': 'user', 'username': username, 'first_name': first_name,
+            'last_name': last_name, 'email': email, 'date_joined': _iso(joined),
+        }
+
+    posts = Post_blog.objects.order_by('pk').values_list(
+        'pk', 'author__username', 'title', 'text', 'image', 'image_width', 'image_height',
+        'status', 'datetime_create', 'datetime_modified',
+    )
+    for pk, author, title, text, image, width, height, status, created, modified in posts.iterator(
+        chunk_size=batch_size,
+    ):
+        yield {
+            'type': 'post', 'id': pk, 'author': author, 'title': title, 'text': text,
+            'image': image or None, 'image_width': width, 'image_height': height,
+            'status': status, 'created': _iso(created), 'modified': _iso(modified),
+        }
+
+    comments = Comment.objects.order_by('pk').values_list(
+        'post_id', 'author__username', 'text', 'is_active', 'datetime_create', 'datetime_modified',
+    )
+    for post_id, author, text, is_active, created, modified in comments.iterator(chunk_size=batch_size):
+        yield {
+            'type': 'comment', 'post': post_id, 'author': author, 'text': text,
+            'is_active': is_active, 'created': _iso(created), 'modified': _iso(modified),
+        }
+
+    reactions = EmojiReaction.objects.order_by('pk').values_list(
+        'post_id', 'user__username', 'emoji_type', 'datetime_create',
+    )
+    for post_id, username, emoji_type, created in reactions.iterator(chunk_size=batch_size):
+        yield {'type': 'reaction', 'post': post_id, 'user': username, 'emoji': emoji_type, 'created': _iso(created)}
+
+    likes = Post_blog.liked_by.through.objects.order_by('pk').values_list('post_blog_id', 'user__username')
+    for post_id, username in likes.iterator(chunk_size=batch_size):
+        yield {'type': 'like', 'post': post_id, 'user': username}
+
+
+@contextlib.contextmanager
+def preserved_timestamps():
+    """
+    غیرفعال کردن موقت auto_now و auto_now_add تا bulk_create زمان‌های فایل را به جای
+    زمان فعلی ذخیره کند (فقط در پردازه دستور import_blog)
+    """
+    fields = [
+        field
+        for model in (Post_blog, Comment, EmojiReaction)
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class BlogImporter:
+    """ورود خطوط یک فایل JSONL در دسته‌های batch_size رکوردی با امکان ادامه پس از قطع شدن"""
+
+    def __init__(self, batch_size=5000):
+        self.batch_size = batch_size
+        self.export_id = None
+        # شناسه پست در فایل -> شناسه جدید؛ username -> شناسه کاربر
+        self.post_ids = {}
+        self.user_ids = {}
+        self.counts = Counter()
+        self.resumed_after = 0
+
+    def run(self, lines):
+        """
+        ورود همه خطوط؛ Counter تعداد رکوردهای خوانده شده هر نوع در این اجرا یا None برای
+        فایلی که قبلا کامل وارد شده است برگردانده می‌شود
+        """
+        numbered = enumerate(lines, start=1)
+        self.export_id = self._read_header(numbered)
+        checkpoints = ImportCheckpoint.objects.filter(export_id=self.export_id)
+        if checkpoints.filter(finished=True).exists():
+            return None
+        for line, post_ids in checkpoints.values_list('line', 'post_ids').iterator():
+            self.resumed_after = max(self.resumed_after, line)
+            self.post_ids.update((int(old), new) for old, new in post_ids.items())
+
+        kind, batch, last_line = None, [], self.resumed_after
+        for number, raw in numbered:
+            if number <= self.resumed_after or not raw.strip():
+                continue
+            record = self._parse(number, raw)
+            if batch and record['type'] != kind:
+                self._commit(kind, batch, last_line)
+                batch = []
+            kind = record['type']
+            batch.append(record)
+            last_line = number
+            if len(batch) >= self.batch_size:
+                self._commit(kind, batch, last_line)
+                batch = []
+        if batch:
+            self._commit(kind, batch, last_line)
+        self._finish(last_line)
+        return self.counts
+
+    def _read_header(self, numbered):
+        for number, raw in numbered:
+            if not raw.strip():
+                continue
+            header = self._parse(number, raw, header=True)
+            if header.get('format') != FORMAT or header.get('version') != FORMAT_VERSION:
+                raise InvalidExport(f'خط {number}: قالب فایل پشتیبانی نمی‌شود')
+            if not isinstance(header.get('export_id'), str) or not header['export_id']:
+                raise InvalidExport(f'خط {number}: export_id ندارد')
+            return header['export_id']
+        raise InvalidExport('فایل خالی است')
+
+    def _parse(self, number, raw, header=False):
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            raise InvalidExport(f'خط {number}: JSON نامعتبر') from None
+        if not isinstance(record, dict):
+            raise InvalidExport(f'خط {number}: رکورد باید یک شیء JSON باشد')
+        if header:
+            if record.get('type') != 'header':
+                raise InvalidExport(f'خط {number}: فایل باید با header شروع شود')
+            return record
+        required = REQUIRED_FIELDS.get(record.get('type'))
+        if required is None:
+            raise InvalidExport(f"خط {number}: نوع رکورد نامعتبر {record.get('type')!r}")
+        missing = [field for field in required if record.get(field) is None]
+        if missing:
+            raise InvalidExport(f"خط {number}: فیلدهای {', '.join(missing)} وجود ندارند")
+        return record
+
+    def _commit(self, kind, records, line):
+        with transaction.atomic(), preserved_timestamps():
+            created = getattr(self, f'_import_{kind}s')(records)
+            ImportCheckpoint.objects.create(
+                export_id=self.export_id, line=line, post_ids={str(old): new for old, new in created.items()},
+            )
+        # نگاشت فقط پس از commit دسته به کار می‌رود
+        self.post_ids.update(created)
+        self.counts[kind] += len(records)
+
+    def _users(self, usernames):
+        """شناسه کاربران؛ کاربرانی که در بخش user فایل نبوده‌اند با رمز غیرقابل استفاده ساخته می‌شوند"""
+        missing = set(usernames).difference(self.user_ids)
+        if missing:
+            found = dict(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+            absent = missing.difference(found)
+            if absent:
+                User.objects.bulk_create(
+                    (User(username=username, password=make_password(None)) for username in absent),
+                    ignore_conflicts=True,
+                )
+                found.update(User.objects.filter(username__in=absent).values_list('username', 'pk'))
+            self.user_ids.update(found)
+        return self.user_ids
+
+    def _post(self, old_id):
+        try:
+            return self.post_ids[old_id]
+        except KeyError:
+            raise InvalidExport(f'پست {old_id} پیش از رکوردهای وابسته به آن تعریف نشده است') from None
+
+    def _import_users(self, records):
+        existing = set(
+            User.objects.filter(username__in=[record['username'] for record in records])
+            .values_list('username', flat=True)
+        )
+        User.objects.bulk_create(
+            (
+                User(
+                    username=record['username'],
+                    first_name=record.get('first_name') or '',
+                    last_name=record.get('last_name') or '',
+                    email=record.get('email') or '',
+                    date_joined=_datetime(record.get('date_joined')),
+                    password=make_password(None),
+                )
+                for record in records if record['username'] not in existing
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        return {}
+
+    def _import_posts(self, records):
+        users = self._users(record['author'] for record in records)
+        posts = []
+        for record in records:
+            created = _datetime(record.get('created'))
+            posts.append(Post_blog(
+                title=record['title'],
+                text=record['text'],
+                image=record.get('image') or None,
+                image_width=record.get('image_width'),
+                image_height=record.get('image_height'),
+                status=record['status'],
+                author_id=users[record['author']],
+                datetime_create=created,
+                datetime_modified=_datetime(record.get('modified'), created),
+            ))
+        Post_blog.objects.bulk_create(posts, batch_size=self.batch_size)
+        return {record['id']: post.pk for record, post in zip(records, posts)}
+
+    def _import_comments(self, records):
+        users = self._users(record['author'] for record in records)
+        comments = []
+        for record in records:
+            created = _datetime(record.get('created'))
+            comments.append(Comment(
+                post_id=self._post(record['post']),
+                author_id=users[record['author']],
+                text=record['text'],
+                is_active=record.get('is_active', True),
+                datetime_create=created,
+                datetime_modified=_datetime(record.get('modified'), created),
+            ))
+        Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        return {}
+
+    def _import_reactions(self, records):
+        users = self._users(record['user'] for record in records)
+        choices = dict(EmojiReaction.EMOJI_CHOICES)
+        reactions = []
+        for record in records:
+            if record['emoji'] not in choices:
+                raise InvalidExport(f"ایموجی نامعتبر {record['emoji']!r}")
+            reactions.append(EmojiReaction(
+                post_id=self._post(record['post']),
+                user_id=users[record['user']],
+                emoji_type=record['emoji'],
+                datetime_create=_datetime(record.get('created')),
+            ))
+        # هر کاربر فقط یک واکنش در هر پست؛ رکوردهای تکراری نادیده گرفته می‌شوند
+        EmojiReaction.objects.bulk_create(reactions, batch_size=self.batch_size, ignore_conflicts=True)
+        return {}
+
+    def _import_likes(self, records):
+        users = self._users(record['user'] for record in records)
+        through = Post_blog.liked_by.through
+        through.objects.bulk_create(
+            (
+                through(post_blog_id=self._post(record['post']), user_id=users[record['user']])
+                for record in records
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        return {}
+
+    def _finish(self, line):
+        """شمارنده‌ها و ایندکس جستجوی پست‌های وارد شده و ثبت پایان ورود"""
+        post_ids = sorted(self.post_ids.values())
+        backend = get_search_backend()
+        for start in range(0, len(post_ids), self.batch_size):
+            batch = post_ids[start:start + self.batch_size]
+            with transaction.atomic():
+                Post_blog.refresh_like_counts(batch)
+                Post_blog.refresh_comments_count(batch)
+                EmojiReactionCount.rebuild(batch)
+                for post_id, title, text, author in indexable_rows(Post_blog.objects.filter(pk__in=batch)):
+                    backend.upsert(post_id, title, text, author)
+        ImportCheckpoint.objects.create(export_id=self.export_id, line=line, finished=True)
+        bump_list_structure()
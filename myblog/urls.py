@@ -1,12 +1,17 @@
 from django.urls import path
-from . import views
+from . import pwa, realtime, views
 from django.views.generic import TemplateView
 urlpatterns = [
     path('', views.PostListView.as_view(), name='post_list'),
+    path('posts/feed/', views.post_feed_view, name='post_feed'),
+    path('posts/offline/', pwa.offline_feed_view, name='offline_feed'),
     path('post/<int:pk>/', views.post_detail_view, name='blog_detail'),
+    path('post/<int:pk>/comments/', views.post_comments_view, name='post_comments'),
     path('post/<int:pk>/like/', views.toggle_like, name='toggle_like'),
     path('post/<int:pk>/emoji/', views.add_emoji_reaction, name='add_emoji_reaction'),
     path('post/<int:pk>/emoji/remove/', views.remove_emoji_reaction, name='remove_emoji_reaction'),
+    path('reactions/batch/', views.reactions_batch_view, name='reactions_batch'),
+    path('posts/events/', realtime.post_events_view, name='post_events'),
     path('post/new/', views.post_create_view, name='post_create'),
     path('post/<int:pk>/edit/', views.post_update_view, name='post_update'),
     path('post/<int:pk>/delete/', views.post_delete_view, name='post_delete'),
@@ -17,6 +22,6 @@ urlpatterns = [
     path('computer-vision-codes/', views.computer_vision_code_view, name='computer_vision_codes'),
     path('python/',views.computer_python_view,name='computer_python'),
     path('django/',views.coputer_djngo,name='coputer_djngo'),
-    path('offline/', TemplateView.as_view(template_name='offline.html'), name='offline'),
+    path('offline/', TemplateView.as_view(template_name='myblog/offline.html'), name='offline'),
 
 ]
\ No newline at end of file
@@ -1,72 +1,159 @@
-from django.shortcuts import render, get_object_or_404, redirect
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.views.generic import ListView
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic.edit import UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import Case, When
 from django.core.paginator import Paginator
+from django.utils.decorators import method_decorator
 from .models import Post_blog, Comment, EmojiReaction
+from . import counters
 from .forms import NewPostForm, CommentForm, EmojiReactionForm, PostSearchForm, ContactForm
+from .caching import attach_cache_versions
+from .conditional import (
+    conditional_page, list_etag, list_last_modified, page_cache_headers, post_etag, post_last_modified,
+)
+from .pagecache import anonymous_page_cache, depends_on
+from .prerender import static_page
+from .pagination import ORDERING, InvalidCursor, encode_cursor, keyset_page
+from .search import get_search_backend
+
+logger = logging.getLogger(__name__)
+
+# تعداد نظرات هر صفحه در صفحه جزئیات پست
+COMMENTS_PAGE_SIZE = 10
 
 # دکوراتور اصلاح شده برای چک کردن اینکه کاربر ادمین است
 def admin_required(function):
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             messages.warning(request, 'برای دسترسی به این صفحه باید وارد شوید!')
-            return redirect('login') + '?next=' + request.path
+            return redirect_to_login(request.get_full_path())
         elif not request.user.is_staff:
             messages.error(request, 'شما دسترسی لازم برای ایجاد پست جدید را ندارید!')
             return redirect('access_denied')
         return function(request, *args, **kwargs)
     return wrapper
 
+@method_decorator(conditional_page(list_etag, list_last_modified), name='get')
+@method_decorator(anonymous_page_cache, name='get')
 class PostListView(ListView):
     model = Post_blog
     template_name = 'myblog/posts_list.html'
     context_object_name = 'post_list'
     paginate_by = 6
-    ordering = ['-datetime_modified']
+    ordering = list(ORDERING)
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('author').with_user_state(self.request.user)
         search_query = self.request.GET.get('q')
         
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) | 
-                Q(text__icontains=search_query) |
-                Q(author__username__icontains=search_query)
-            )
+            # جستجو در ایندکس متن کامل و مرتب‌سازی بر اساس میزان ارتباط
+            hits = get_search_backend().search(search_query, settings.SEARCH_RESULTS_LIMIT)
+            ranking = [When(pk=hit.post_id, then=position) for position, hit in enumerate(hits)]
+            queryset = queryset.filter(pk__in=[hit.post_id for hit in hits])
+            if ranking:
+                queryset = queryset.order_by(Case(*ranking), '-datetime_modified')
         
         return queryset.filter(status='pub')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # بررسی لایک شدن هر پست توسط کاربر جاری
-        if self.request.user.is_authenticated:
-            for post in context['post_list']:
-                post.user_has_liked = post.is_liked_by_user(self.request.user)
-                post.user_emoji = post.get_user_emoji(self.request.user)
+        # وضعیت لایک و ایموجی کاربر جاری از قبل در get_queryset محاسبه شده است
+        # نسخه کش کارت‌های صفحه با یک درخواست به کش خوانده می‌شود
+        attach_cache_versions(context['post_list'])
+        # تغییرهای flush نشده شمارنده‌ها در حالت write-behind
+        counters.apply_pending(context['post_list'])
+        depends_on(self.request, [post.pk for post in context['post_list']], listing=True)
+        search_query = self.request.GET.get('q')
+        if search_query:
+            # snippet فقط برای پست‌های همین صفحه ساخته می‌شود
+            posts = context['post_list']
+            snippets = get_search_backend().snippets(
+                search_query, [post.pk for post in posts], texts={post.pk: post.text for post in posts},
+            )
+            for post in posts:
+                post.search_snippet = snippets.get(post.pk, '')
+        
+        # cursor صفحه بعد برای اسکرول بی‌نهایت (فقط در لیست زمانی، نه نتایج جستجو)
+        page_obj = context['page_obj']
+        if not search_query and page_obj.has_next() and context['post_list']:
+            context['next_cursor'] = encode_cursor(list(context['post_list'])[-1])
         
         context['search_form'] = PostSearchForm(self.request.GET or None)
         context['search_query'] = self.request.GET.get('q', '')
         return context
 
-def post_detail_view(request, pk):
-    post = get_object_or_404(Post_blog, pk=pk)
+def post_feed_view(request):
+    """صفحه بعدی پست‌ها با cursor به صورت JSON شامل HTML کارت‌ها برای اسکرول بی‌نهایت"""
+    queryset = (
+        Post_blog.objects.filter(status='pub')
+        .select_related('author')
+        .with_user_state(request.user)
+    )
+    try:
+        posts, next_cursor = keyset_page(
+            queryset, request.GET.get('cursor'), page_size=PostListView.paginate_by
+        )
+    except InvalidCursor:
+        return JsonResponse({'success': False, 'error': 'cursor نامعتبر'}, status=400)
     
-    # دریافت نظرات فعال این پست
-    comments = post.get_active_comments()
+    attach_cache_versions(posts)
+    counters.apply_pending(posts)
+    html = ''.join(
+        render_to_string('myblog/_post_card.html', {'post': post}, request=request)
+        for post in posts
+    )
+    return JsonResponse({
+        'success': True,
+        'html': html,
+        'count': len(posts),
+        'next_cursor': next_cursor,
+    })
+
+def post_comments_view(request, pk):
+    """صفحه بعدی نظرات فعال یک پست با cursor به صورت JSON شامل HTML نظرات"""
+    queryset = Comment.objects.filter(post_id=pk, is_active=True).select_related('author')
+    try:
+        comments, next_cursor = keyset_page(
+            queryset, request.GET.get('cursor'), page_size=COMMENTS_PAGE_SIZE, field='datetime_create'
+        )
+    except InvalidCursor:
+        return JsonResponse({'success': False, 'error': 'cursor نامعتبر'}, status=400)
     
-    # بررسی لایک شدن توسط کاربر جاری
-    if request.user.is_authenticated:
-        post.user_has_liked = post.is_liked_by_user(request.user)
-        # دریافت ایموجی کاربر برای این پست
-        post.user_emoji = post.get_user_emoji(request.user)
+    html = ''.join(
+        render_to_string('myblog/_comment.html', {'comment': comment}, request=request)
+        for comment in comments
+    )
+    return JsonResponse({
+        'success': True,
+        'html': html,
+        'count': len(comments),
+        'next_cursor': next_cursor,
+    })
+
+@conditional_page(post_etag, post_last_modified)
+@anonymous_page_cache
+def post_detail_view(request, pk):
+    # وضعیت لایک/ایموجی کاربر و شمارنده‌ها در همان کوئری پست دریافت می‌شوند
+    post = get_object_or_404(
+        Post_blog.objects.select_related('author').with_user_state(request.user),
+        pk=pk
+    )
+    counters.apply_pending([post])
+    depends_on(request, [post.pk])
     
     # دریافت خلاصه ایموجی‌های پست
     emojis_summary = post.get_emojis_summary()
@@ -77,7 +164,7 @@ def post_detail_view(request, pk):
         if 'comment_submit' in request.POST:
             if not request.user.is_authenticated:
                 messages.warning(request, 'برای ثبت نظر باید وارد حساب کاربری خود شوید.')
-                return redirect('login') + '?next=' + request.path
+                return redirect_to_login(request.path)
             
             comment_form = CommentForm(request.POST)
             if comment_form.is_valid():
@@ -88,9 +175,15 @@ def post_detail_view(request, pk):
                 messages.success(request, 'نظر شما با موفقیت ثبت شد!')
                 return redirect('blog_detail', pk=post.pk)
     
+    # فقط صفحه اول نظرات فعال؛ بقیه با دکمه «نظرات بیشتر» از post_comments_view خوانده می‌شوند
+    comments, comments_cursor = keyset_page(
+        post.get_active_comments(), page_size=COMMENTS_PAGE_SIZE, field='datetime_create'
+    )
+    
     context = {
         'post': post,
         'comments': comments,
+        'comments_cursor': comments_cursor,
         'comment_form': comment_form,
         'emojis_summary': emojis_summary,
         'emoji_choices': EmojiReaction.EMOJI_CHOICES,
@@ -101,15 +194,15 @@ def post_detail_view(request, pk):
 # ==========================================
 # ویوی اصلاح شده برای مدیریت خطا
 # ==========================================
+# ویوهای AJAX لایک و واکنش ناهمزمان هستند تا زیر ASGI درخواست‌های کوتاه و پرتکرار
+# یک worker کامل را اشغال نکنند
 @require_POST
 @login_required
-def toggle_like(request, pk):
+async def toggle_like(request, pk):
     """ویو برای تغییر وضعیت لایک با مدیریت خطا"""
+    post = await aget_object_or_404(Post_blog.objects.only('pk'), pk=pk)
     try:
-        post = get_object_or_404(Post_blog, pk=pk)
-        
-        # این خط ممکن است باعث خطا شود
-        is_liked, likes_count = post.toggle_like(request.user)
+        is_liked, likes_count = await post.atoggle_like(await request.auser())
         
         return JsonResponse({
             'success': True,
@@ -117,10 +210,9 @@ def toggle_like(request, pk):
             'is_liked': is_liked,
             'post_id': pk
         })
-    except Exception as e:
-        # اگر هر خطایی رخ داد، آن را در ترمینال چاپ کن
-        # این مهم‌ترین قسمت برای دیباگ کردن است!
-        print(f"Error in toggle_like view: {e}") 
+    except Exception:
+        # ثبت خطا همراه traceback در لاگ؛ پاسخ 500 در متریک‌های درخواست شمرده می‌شود
+        logger.exception('خطا در تغییر لایک پست %s', pk)
         
         # یک پاسخ خطا به جاوا اسکریپت بفرست
         return JsonResponse({
@@ -130,26 +222,19 @@ def toggle_like(request, pk):
 
 @require_POST
 @login_required
-def add_emoji_reaction(request, pk):
+async def add_emoji_reaction(request, pk):
     """ویو برای اضافه کردن واکنش ایموجی"""
-    post = get_object_or_404(Post_blog, pk=pk)
+    post = await aget_object_or_404(Post_blog.objects.only('pk'), pk=pk)
     emoji_type = request.POST.get('emoji_type')
     
     if emoji_type not in dict(EmojiReaction.EMOJI_CHOICES):
         return JsonResponse({'success': False, 'error': 'ایموجی نامعتبر'})
     
-    # حذف واکنش قبلی کاربر اگر وجود داشته باشد
-    EmojiReaction.objects.filter(post=post, user=request.user).delete()
-    
-    # اضافه کردن واکنش جدید
-    reaction = EmojiReaction.objects.create(
-        post=post,
-        user=request.user,
-        emoji_type=emoji_type
-    )
+    # ثبت یا تغییر واکنش کاربر؛ شمارنده‌ها در همان تراکنش به‌روز می‌شوند
+    await post.aset_emoji_reaction(await request.auser(), emoji_type)
     
     # دریافت خلاصه جدید ایموجی‌ها
-    emojis_summary = post.get_emojis_summary()
+    emojis_summary = await post.aget_emojis_summary()
     
     return JsonResponse({
         'success': True,
@@ -159,15 +244,13 @@ def add_emoji_reaction(request, pk):
 
 @require_POST
 @login_required
-def remove_emoji_reaction(request, pk):
+async def remove_emoji_reaction(request, pk):
     """ویو برای حذف واکنش ایموجی"""
-    post = get_object_or_404(Post_blog, pk=pk)
+    post = await aget_object_or_404(Post_blog.objects.only('pk'), pk=pk)
     
     # حذف واکنش کاربر
-    deleted_count = EmojiReaction.objects.filter(post=post, user=request.user).delete()[0]
-    
-    if deleted_count > 0:
-        emojis_summary = post.get_emojis_summary()
+    if await post.aremove_emoji_reaction(await request.auser()):
+        emojis_summary = await post.aget_emojis_summary()
         return JsonResponse({
             'success': True,
             'emojis_summary': emojis_summary,
@@ -176,6 +259,25 @@ def remove_emoji_reaction(request, pk):
     else:
         return JsonResponse({'success': False, 'error': 'واکنشی برای حذف یافت نشد'})
 
+@require_POST
+@login_required
+async def reactions_batch_view(request):
+    """
+    اجرای دسته‌ای لایک‌ها و واکنش‌های کاربر در یک درخواست و یک تراکنش.
+    بدنه: {"operations": [{"post": 1, "action": "like"}, {"post": 2, "action": "emoji", "emoji_type": "love"}]}
+    """
+    try:
+        operations = json.loads(request.body)['operations']
+    except (ValueError, KeyError, TypeError):
+        operations = None
+    if not isinstance(operations, list) or not operations:
+        return JsonResponse({'success': False, 'error': 'درخواست نامعتبر'}, status=400)
+    if len(operations) > settings.REACTION_BATCH_LIMIT:
+        return JsonResponse({'success': False, 'error': 'تعداد عملیات بیش از حد مجاز است'}, status=400)
+
+    results, states = await sync_to_async(Post_blog.apply_reactions)(await request.auser(), operations)
+    return JsonResponse({'success': True, 'results': results, 'posts': states})
+
 @login_required
 @admin_required
 def post_create_view(request):
@@ -236,6 +338,8 @@ def post_delete_view(request, pk):
 def access_denied(request):
     return render(request, 'myblog/access_denied.html', status=403)
 
+@page_cache_headers
+@anonymous_page_cache
 def about_me_view(request):
     if request.method == 'POST':
         form = ContactForm(request.POST)
@@ -253,6 +357,9 @@ def about_me_view(request):
     }
     return render(request, 'myblog/about_me.html', context)
 
+@static_page('projects')
+@page_cache_headers
+@anonymous_page_cache
 def projects_view(request):
     context = {
         'title': 'پروژه‌ها',
@@ -260,6 +367,9 @@ def projects_view(request):
     }
     return render(request, 'myblog/projects.html', context)
 
+@static_page('computer_vision_codes')
+@page_cache_headers
+@anonymous_page_cache
 def computer_vision_code_view(request):
     """صفحه نمایش نمونه کدهای بینایی کامپیوتر"""
     context = {
@@ -283,11 +393,17 @@ def delete_comment(request, pk):
     messages.success(request, 'نظر با موفقیت حذف شد!')
     return redirect('blog_detail', pk=post_pk)
 
+@static_page('computer_python')
+@page_cache_headers
+@anonymous_page_cache
 def computer_python_view(request):
     """ python  """
     
     return render(request, 'myblog/computer_python_view.html')
 
 
+@static_page('coputer_djngo')
+@page_cache_headers
+@anonymous_page_cache
 def coputer_djngo(request):
     return render (request,'myblog/coputer_djngo_view.html')
\ No newline at end of file
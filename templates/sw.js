@@ -0,0 +1,364 @@
+{% load static %}{% autoescape off %}// sw.js — از manifest دستور collectstatic ساخته می‌شود (myblog/pwa.py)
+
+// نسخه hash فهرست precache است؛ با تغییر هر فایل استاتیک عوض می‌شود و مرورگر
+// Service Worker جدید را نصب می‌کند
+const VERSION = '{{ version }}';
+const PRECACHE = 'myblog-precache';
+const PAGES_CACHE = 'myblog-pages';
+const RUNTIME_CACHE = 'myblog-static';
+// پست‌های فید آفلاین و تصاویر کوچک آن‌ها
+const OFFLINE_CACHE = 'myblog-offline';
+const CACHES = [PRECACHE, PAGES_CACHE, RUNTIME_CACHE, OFFLINE_CACHE];
+const STATIC_URL = {{ static_url }};
+const MEDIA_URL = {{ media_url }};
+const OFFLINE_URL = {{ offline_url }};
+const OFFLINE_FEED_URL = {{ offline_feed_url }};
+// صفحاتی که هرگز ذخیره نمی‌شوند: حساب کاربری، ادمین و فرم‌های ایجاد و ویرایش پست
+const UNCACHED_PAGES = {{ uncached_pages }}.map(pattern => new RegExp(pattern));
+// نسخه فید و فهرست پست‌های ذخیره شده؛ صفحه آفلاین هم آن را می‌خواند
+const OFFLINE_FEED_STATE = OFFLINE_FEED_URL + 'state.json';
+// فاصله حداقل بین دو همگام‌سازی فید (میلی‌ثانیه)
+const OFFLINE_FEED_INTERVAL = 5 * 60 * 1000;
+
+// آدرس‌ها hash محتوا را دارند؛ آدرسی که در کش هست هرگز دوباره دانلود نمی‌شود
+const PRECACHE_URLS = {{ precache_urls }};
+
+function absolute(url) {
+    return new URL(url, self.location).href;
+}
+
+const PRECACHE_SET = new Set(PRECACHE_URLS.map(absolute));
+
+// نصب Service Worker: فقط فایل‌هایی که در کش نیستند دانلود می‌شوند
+self.addEventListener('install', function(event) {
+    console.log('🔄 Service Worker installing...', VERSION);
+    event.waitUntil(
+        caches.open(PRECACHE)
+            .then(function(cache) {
+                return cache.keys().then(function(requests) {
+                    const cached = new Set(requests.map(request => request.url));
+                    const missing = PRECACHE_URLS.filter(url => !cached.has(absolute(url)));
+                    console.log('✅ Precaching ' + missing.length + ' of ' + PRECACHE_URLS.length + ' files');
+                    return cache.addAll(missing);
+                });
+            })
+            .then(() => self.skipWaiting())
+            .catch(error => {
+                // نصب شکست می‌خورد و Service Worker قبلی فعال می‌ماند
+                console.error('❌ Cache installation failed:', error);
+                throw error;
+            })
+    );
+});
+
+// فعال‌سازی Service Worker: فقط فایل‌هایی که در فهرست جدید نیستند حذف می‌شوند
+self.addEventListener('activate', function(event) {
+    console.log('🔄 Service Worker activating...', VERSION);
+    event.waitUntil(
+        caches.keys()
+            .then(function(cacheNames) {
+                // کش‌های نسخه‌های قدیمی (مثل myblog-v1.1) کامل حذف می‌شوند
+                return Promise.all(
+                    cacheNames
+                        .filter(cacheName => !CACHES.includes(cacheName))
+                        .map(cacheName => caches.delete(cacheName))
+                );
+            })
+            .then(() => caches.open(PRECACHE))
+            .then(function(cache) {
+                return cache.keys().then(function(requests) {
+                    return Promise.all(
+                        requests
+                            .filter(request => !PRECACHE_SET.has(request.url))
+                            .map(request => cache.delete(request))
+                    );
+                });
+            })
+            .then(() => caches.open(RUNTIME_CACHE))
+            // فایل‌های استاتیک بیرون از فهرست precache با هر نسخه دوباره گرفته می‌شوند
+            .then(cache => cache.keys().then(requests => Promise.all(requests.map(request => cache.delete(request)))))
+            .then(() => {
+                console.log('✅ Service Worker activated');
+                return self.clients.claim();
+            })
+            .then(() => syncOfflineFeed(true).catch(() => undefined))
+    );
+});
+
+function cacheable(response) {
+    if (!response || response.status !== 200 || response.type !== 'basic') {
+        return false;
+    }
+    const cacheControl = response.headers.get('Cache-Control') || '';
+    return !cacheControl.includes('no-store');
+}
+
+// فقط نسخه ناشناس صفحات (public) ذخیره می‌شود؛ صفحات کاربر وارد شده private و no-cache
+// هستند و نام کاربر و توکن CSRF همان نشست را دارند
+function cacheablePage(response) {
+    if (!cacheable(response)) {
+        return false;
+    }
+    const directives = (response.headers.get('Cache-Control') || '')
+        .toLowerCase().split(',').map(directive => directive.trim().split('=')[0]);
+    return directives.includes('public') && !directives.includes('private') && !directives.includes('no-cache');
+}
+
+function uncachedPage(url) {
+    return UNCACHED_PAGES.some(pattern => pattern.test(url.pathname));
+}
+
+function offlineFallback(request) {
+    // پست‌های فید آفلاین و در نهایت صفحه آفلاین
+    return caches.match(request, {cacheName: OFFLINE_CACHE}).then(function(post) {
+        return post || caches.match(OFFLINE_URL, {cacheName: PRECACHE});
+    });
+}
+
+// صفحات HTML: stale-while-revalidate. نسخه کش شده فورا نمایش داده می‌شود و همزمان
+// نسخه تازه (با ETag، معمولا پاسخ 304 چند بایتی) برای بازدید بعدی گرفته می‌شود
+function staleWhileRevalidate(event) {
+    const network = fetch(event.request, {cache: 'no-cache'})
+        .then(function(response) {
+            const responseToCache = cacheablePage(response) ? response.clone() : null;
+            caches.open(PAGES_CACHE).then(function(cache) {
+                // نسخه‌ای که دیگر قابل ذخیره نیست (مثلا پس از ورود) دوباره نمایش داده نمی‌شود
+                return responseToCache ? cache.put(event.request, responseToCache) : cache.delete(event.request);
+            });
+            return response;
+        });
+
+    return caches.open(PAGES_CACHE)
+        .then(cache => cache.match(event.request))
+        .then(function(cached) {
+            if (cached) {
+                event.waitUntil(network.catch(() => undefined));
+                return cached;
+            }
+            return network.catch(() => offlineFallback(event.request));
+        });
+}
+
+// فایل‌های استاتیک: ابتدا کش. فایل‌های precache با hash نام‌گذاری شده‌اند و تغییر نمی‌کنند
+function cacheFirst(event) {
+    return caches.match(event.request).then(function(cached) {
+        if (cached) {
+            return cached;
+        }
+        return fetch(event.request).then(function(response) {
+            if (cacheable(response)) {
+                const cacheName = PRECACHE_SET.has(event.request.url) ? PRECACHE : RUNTIME_CACHE;
+                const responseToCache = response.clone();
+                caches.open(cacheName).then(cache => cache.put(event.request, responseToCache));
+            }
+            return response;
+        });
+    });
+}
+
+// مدیریت درخواست‌ها
+self.addEventListener('fetch', function(event) {
+    // فقط درخواست‌های GET همین سایت را مدیریت کن
+    if (event.request.method !== 'GET') return;
+    const url = new URL(event.request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (event.request.mode === 'navigate') {
+        if (uncachedPage(url)) {
+            event.respondWith(fetch(event.request).catch(() => offlineFallback(event.request)));
+        } else {
+            event.respondWith(staleWhileRevalidate(event));
+        }
+        return;
+    }
+
+    if (PRECACHE_SET.has(event.request.url) || url.pathname.startsWith(STATIC_URL)) {
+        event.respondWith(cacheFirst(event));
+        return;
+    }
+
+    // تصاویر کوچک پست‌های فید آفلاین فقط وقتی شبکه در دسترس نیست از کش خوانده می‌شوند
+    if (url.pathname.startsWith(MEDIA_URL)) {
+        event.respondWith(
+            fetch(event.request).catch(function() {
+                return caches.match(event.request, {cacheName: OFFLINE_CACHE});
+            })
+        );
+    }
+    // بقیه درخواست‌ها (API ها و ...) مستقیما به شبکه می‌روند
+});
+
+// ===================================
+// فید آفلاین پست‌های اخیر
+// ===================================
+
+function escapeHtml(text) {
+    return String(text).replace(/[&<>"']/g, char => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[char]);
+}
+
+function offlinePostPage(post) {
+    return '<!DOCTYPE html><html lang="fa" dir="rtl"><head><meta charset="UTF-8">' +
+        '<meta name="viewport" content="width=device-width, initial-scale=1.0">' +
+        '<title>' + escapeHtml(post.title) + '</title></head><body>' +
+        (post.thumbnail ? '<img src="' + escapeHtml(post.thumbnail) + '" alt="" style="max-width:100%">' : '') +
+        post.html + '<p><a href="' + escapeHtml(OFFLINE_URL) + '">پست‌های دیگر</a></p></body></html>';
+}
+
+function readFeedState(cache) {
+    return cache.match(OFFLINE_FEED_STATE)
+        .then(response => response ? response.json() : null)
+        .then(state => state || {version: '', syncedAt: 0, posts: []});
+}
+
+// اعمال تغییرات فید: فقط پست‌های جدید یا ویرایش شده ذخیره و پست‌های حذف شده پاک می‌شوند
+function applyOfflineFeed(cache, state, feed) {
+    const posts = new Map(state.posts.map(post => [post.id, post]));
+    const work = [];
+    const current = new Set(feed.ids);
+    for (const [id, post] of posts) {
+        if (feed.reset || !current.has(id)) {
+            work.push(cache.delete(post.url));
+            if (post.thumbnail) work.push(cache.delete(post.thumbnail));
+            posts.delete(id);
+        }
+    }
+    for (const post of feed.posts) {
+        const previous = posts.get(post.id);
+        if (previous && previous.thumbnail && previous.thumbnail !== post.thumbnail) {
+            work.push(cache.delete(previous.thumbnail));
+        }
+        if (post.thumbnail && (!previous || previous.thumbnail !== post.thumbnail)) {
+            work.push(cache.add(post.thumbnail).catch(() => undefined));
+        }
+        work.push(cache.put(post.url, new Response(offlinePostPage(post), {
+            headers: {'Content-Type': 'text/html; charset=utf-8'}
+        })));
+        posts.set(post.id, {id: post.id, title: post.title, url: post.url, thumbnail: post.thumbnail});
+    }
+    const newState = {
+        version: feed.version,
+        syncedAt: Date.now(),
+        posts: feed.ids.map(id => posts.get(id)).filter(Boolean)
+    };
+    work.push(cache.put(OFFLINE_FEED_STATE, new Response(JSON.stringify(newState), {
+        headers: {'Content-Type': 'application/json'}
+    })));
+    return Promise.all(work);
+}
+
+// همگام‌سازی فید؛ بدون force در فاصله OFFLINE_FEED_INTERVAL از همگام‌سازی قبلی کاری انجام نمی‌شود
+function syncOfflineFeed(force) {
+    return caches.open(OFFLINE_CACHE).then(function(cache) {
+        return readFeedState(cache).then(function(state) {
+            if (!force && Date.now() - state.syncedAt < OFFLINE_FEED_INTERVAL) {
+                return;
+            }
+            const url = state.version
+                ? OFFLINE_FEED_URL + '?since=' + encodeURIComponent(state.version)
+                : OFFLINE_FEED_URL;
+            return fetch(url, {cache: 'no-cache'})
+                .then(function(response) {
+                    if (!response.ok) throw new Error('Offline feed failed: ' + response.status);
+                    return response.json();
+                })
+                .then(feed => applyOfflineFeed(cache, state, feed));
+        });
+    });
+}
+
+// وضعیت ورود آخرین صفحه بارگذاری شده (null پس از شروع دوباره Service Worker)
+let lastAuthenticated = null;
+
+// صفحات کش شده نسخه ناشناس هستند؛ با تغییر وضعیت ورود کل کش صفحات کنار گذاشته می‌شود
+function updateAuthState(authenticated) {
+    const changed = lastAuthenticated === null ? authenticated : lastAuthenticated !== authenticated;
+    lastAuthenticated = authenticated;
+    return changed ? caches.delete(PAGES_CACHE) : Promise.resolve();
+}
+
+// صفحات سایت پس از بارگذاری وضعیت ورود و درخواست همگام‌سازی می‌فرستند
+self.addEventListener('message', function(event) {
+    if (event.data && event.data.type === 'auth-state') {
+        event.waitUntil(updateAuthState(event.data.authenticated === true));
+    }
+    if (event.data && event.data.type === 'sync-offline-feed') {
+        event.waitUntil(syncOfflineFeed(false).catch(error => console.log('⚠️ Offline feed sync failed:', error)));
+    }
+});
+
+self.addEventListener('periodicsync', function(event) {
+    if (event.tag === 'offline-feed') {
+        event.waitUntil(syncOfflineFeed(true));
+    }
+});
+
+// مدیریت push notifications
+self.addEventListener('push', function(event) {
+    if (!event.data) return;
+
+    const data = event.data.json();
+    const options = {
+        body: data.body || 'مطلب جدیدی در وبلاگ منتشر شده است!',
+        icon: '{% static "images/favicon.ico" %}',
+        badge: '{% static "images/favicon.ico" %}',
+        vibrate: [200, 100, 200],
+        data: {
+            url: data.url || '/'
+        }
+    };
+
+    event.waitUntil(
+        self.registration.showNotification(data.title || 'وبلاگ امیرمحمد', options)
+    );
+});
+
+// کلیک روی notification
+self.addEventListener('notificationclick', function(event) {
+    event.notification.close();
+    
+    event.waitUntil(
+        clients.matchAll({type: 'window'})
+            .then(function(clientList) {
+                // اگر یک تب باز از سایت داریم، آن را فعال کن
+                for (const client of clientList) {
+                    if (client.url === event.notification.data.url && 'focus' in client) {
+                        return client.focus();
+                    }
+                }
+                
+                // در غیر این صورت، یک تب جدید باز کن
+                if (clients.openWindow) {
+                    return clients.openWindow(event.notification.data.url);
+                }
+            })
+    );
+});
+
+// همگام‌سازی background
+self.addEventListener('sync', function(event) {
+    if (event.tag === 'offline-feed') {
+        event.waitUntil(syncOfflineFeed(true));
+    }
+    if (event.tag === 'background-sync') {
+        console.log('🔄 Background sync started');
+        // اینجا می‌توانید داده‌های آفلاین را همگام کنید
+    }
+});
+
+// مدیریت وضعیت آفلاین
+function isOnline() {
+    return self.navigator.onLine;
+}
+
+// گوش دادن به تغییرات وضعیت آنلاین/آفلاین
+self.addEventListener('online', function() {
+    console.log('✅ Application is online');
+    // می‌توانید نوتیفیکیشن بفرستید یا داده‌ها را همگام کنید
+});
+
+self.addEventListener('offline', function() {
+    console.log('⚠️ Application is offline');
+});
+{% endautoescape %}